@@ -0,0 +1,22 @@
+from django_filters import rest_framework as filters
+
+from .models import HorariosAsignados
+
+
+class HorariosAsignadosFilter(filters.FilterSet):
+    """
+    Filtros de HorariosAsignadosViewSet. Con ?periodo= y ?grupo__materia= o ?grupo__carrera= se filtra también el
+    periodo del grupo (siempre es el del horario): así la base de datos llega a los grupos por los índices
+    (periodo, materia) y (periodo, carrera) de grupos, sin recorrer los de otros periodos.
+    """
+
+    class Meta:
+        model = HorariosAsignados
+        fields = ['periodo', 'docente', 'espacio', 'grupo', 'grupo__materia', 'grupo__carrera', 'dia_semana']
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        datos = self.form.cleaned_data
+        if datos.get('periodo') is not None and any(datos.get(campo) is not None for campo in ('grupo__materia', 'grupo__carrera')):
+            queryset = queryset.filter(grupo__periodo=datos['periodo'])
+        return queryset
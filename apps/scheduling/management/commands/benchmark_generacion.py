@@ -0,0 +1,184 @@
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from apps.scheduling.models import Grupos
+from apps.scheduling.service.instrumentation import ContadorConsultas
+from apps.scheduling.service.schedule_generator import ScheduleGeneratorService, MOTORES_DISPONIBLES
+from apps.scheduling.service.synthetic_data import crear_periodo_sintetico
+
+# Escenarios predefinidos: docentes, grupos, espacios y bloques
+ESCALAS = {
+    "pequena": {"docentes": 50, "grupos": 100, "espacios": 200, "bloques": 60},
+    "mediana": {"docentes": 200, "grupos": 1000, "espacios": 200, "bloques": 60},
+    "grande": {"docentes": 1000, "grupos": 5000, "espacios": 200, "bloques": 60},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la generación de horarios sobre periodos sintéticos (tiempo, consultas SQL, memoria pico y tasa de "
+        "asignación) y escribe los resultados en JSON. Usa una base de datos temporal de pruebas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', action='append', choices=list(ESCALAS),
+                            help="Escenario predefinido; se puede repetir (por defecto: pequena).")
+        parser.add_argument('--docentes', type=int, help="Cantidad de docentes (reemplaza la de la escala).")
+        parser.add_argument('--grupos', type=int, help="Cantidad de grupos (reemplaza la de la escala).")
+        parser.add_argument('--espacios', type=int, help="Cantidad de espacios (reemplaza la de la escala).")
+        parser.add_argument('--bloques', type=int, help="Cantidad de bloques horarios (reemplaza la de la escala).")
+        parser.add_argument('--densidad', type=float, default=0.6,
+                            help="Proporción de bloques en los que cada docente está disponible (0-1).")
+        parser.add_argument('--motor', action='append', choices=MOTORES_DISPONIBLES,
+                            help="Motor a medir; se puede repetir (por defecto: referencia).")
+        parser.add_argument('--procesos', type=int, default=1)
+        parser.add_argument('--segundos-mejora', type=float, default=0)
+        parser.add_argument('--time-budget-seconds', type=float)
+        parser.add_argument('--repeticiones', type=int, default=1, help="Corridas medidas por motor y escala.")
+        parser.add_argument('--semilla', type=int, default=1, help="Semilla de los datos sintéticos.")
+        parser.add_argument('--sin-memoria', action='store_true',
+                            help="No medir la memoria pico (evita una corrida extra con tracemalloc).")
+        parser.add_argument('--salida', help="Archivo JSON de resultados (por defecto se escribe en la salida estándar).")
+        parser.add_argument('--comparar', help="JSON de una corrida anterior; falla si hay regresiones mayores a la tolerancia.")
+        parser.add_argument('--tolerancia', type=float, default=0.2,
+                            help="Empeoramiento relativo permitido al comparar (0.2 = 20%%).")
+
+    def handle(self, *args, **options):
+        if options['repeticiones'] < 1:
+            raise CommandError("--repeticiones debe ser al menos 1.")
+        escalas = options['escala'] or ['pequena']
+        motores = options['motor'] or ['referencia']
+
+        # Los datos sintéticos nunca tocan la base de datos real
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            resultados = [
+                resultado
+                for escala in escalas
+                for resultado in self._medir_escala(escala, motores, options)
+            ]
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+        informe = {
+            "fecha": timezone.now().isoformat(),
+            "entorno": {
+                "python": platform.python_version(), "django": django.get_version(),
+                "base_datos": connection.vendor, "cpus": os.cpu_count(), "plataforma": platform.platform(),
+            },
+            "resultados": resultados,
+        }
+        contenido = json.dumps(informe, indent=2, ensure_ascii=False, default=str)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(contenido)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+        else:
+            self.stdout.write(contenido)
+
+        if options['comparar']:
+            self._comparar(resultados, options['comparar'], options['tolerancia'])
+
+    def _comparar(self, resultados, archivo_base, tolerancia):
+        """Compara con una corrida anterior por escala, dimensiones, motor y procesos."""
+        def clave(r):
+            return (r["escala"], json.dumps(r["dimensiones"], sort_keys=True), r["motor"], r["procesos"])
+
+        with open(archivo_base, encoding='utf-8') as archivo:
+            base = {clave(r): r for r in json.load(archivo)["resultados"]}
+        regresiones = []
+        for resultado in resultados:
+            anterior = base.get(clave(resultado))
+            if anterior is None:
+                continue
+            # (métrica, mayor es peor)
+            for metrica, mayor_es_peor in (("segundos_mediana", True), ("consultas_sql", True), ("tasa_asignacion", False)):
+                antes, ahora = anterior.get(metrica), resultado.get(metrica)
+                if not antes or ahora is None:
+                    continue
+                cambio = (ahora - antes) / antes
+                if (cambio if mayor_es_peor else -cambio) > tolerancia:
+                    regresiones.append(f"{resultado['escala']}/{resultado['motor']}: {metrica} {antes} -> {ahora} ({cambio:+.0%})")
+        if regresiones:
+            raise CommandError("Regresiones detectadas:\n" + "\n".join(regresiones))
+        self.stdout.write(self.style.SUCCESS("Sin regresiones respecto a " + archivo_base))
+
+    def _medir_escala(self, escala, motores, options):
+        dimensiones = dict(ESCALAS[escala])
+        for clave in dimensiones:
+            if options[clave] is not None:
+                dimensiones[clave] = options[clave]
+
+        # Cada escala parte de una base vacía: el generador carga todos los docentes, espacios y bloques
+        call_command('flush', interactive=False, verbosity=0)
+        inicio = time.perf_counter()
+        periodo = crear_periodo_sintetico(densidad_disponibilidad=options['densidad'], semilla=options['semilla'], **dimensiones)
+        segundos_datos = time.perf_counter() - inicio
+        sesiones_requeridas = sum(
+            g.materia.horas_totales for g in Grupos.objects.filter(periodo=periodo).select_related('materia')
+        )
+        self.stderr.write(f"[{escala}] datos sintéticos creados en {segundos_datos:.1f} s ({dimensiones})")
+
+        parametros_servicio = {
+            "procesos": options['procesos'], "segundos_mejora": options['segundos_mejora'],
+            "time_budget_seconds": options['time_budget_seconds'],
+        }
+        for motor in motores:
+            corridas = [self._medir_corrida(periodo, motor, parametros_servicio) for _ in range(options['repeticiones'])]
+            memoria_pico = None
+            if not options['sin_memoria']:
+                # tracemalloc hace más lenta la ejecución: la memoria se mide en una corrida aparte
+                tracemalloc.start()
+                try:
+                    ScheduleGeneratorService(periodo=periodo, motor=motor, **parametros_servicio).generar_horarios_automaticos()
+                    memoria_pico = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+
+            ultima = corridas[-1]
+            stats = ultima["stats"]
+            resultado = {
+                "escala": escala,
+                "dimensiones": dimensiones,
+                "densidad_disponibilidad": options['densidad'],
+                "semilla": options['semilla'],
+                "motor": motor,
+                **parametros_servicio,
+                "segundos_datos_sinteticos": round(segundos_datos, 3),
+                "segundos": [round(c["segundos"], 4) for c in corridas],
+                "segundos_mediana": round(statistics.median(c["segundos"] for c in corridas), 4),
+                "consultas_sql": ultima["consultas"],
+                "segundos_sql": round(ultima["segundos_sql"], 4),
+                "memoria_pico_mb": None if memoria_pico is None else round(memoria_pico / 2 ** 20, 2),
+                "sesiones_requeridas": sesiones_requeridas,
+                "asignaciones": stats.get("asignaciones_exitosas", 0),
+                "tasa_asignacion": round(stats.get("asignaciones_exitosas", 0) / max(sesiones_requeridas, 1), 4),
+                "grupos_programados": stats.get("grupos_programados", 0),
+                "grupos_no_programados": stats.get("grupos_no_programados", 0),
+                "stats": stats,
+            }
+            self.stderr.write(
+                f"[{escala}] {motor}: {resultado['segundos_mediana']} s, {resultado['consultas_sql']} consultas, "
+                f"{resultado['memoria_pico_mb']} MB, tasa {resultado['tasa_asignacion']:.1%}"
+            )
+            yield resultado
+
+    def _medir_corrida(self, periodo, motor, parametros_servicio):
+        contador = ContadorConsultas()
+        servicio = ScheduleGeneratorService(periodo=periodo, motor=motor, **parametros_servicio)
+        with connection.execute_wrapper(contador):
+            inicio = time.perf_counter()
+            resultado = servicio.generar_horarios_automaticos()
+            segundos = time.perf_counter() - inicio
+        return {"segundos": segundos, "consultas": contador.consultas, "segundos_sql": contador.segundos, "stats": resultado["stats"]}
@@ -0,0 +1,162 @@
+import json
+import os
+import platform
+import statistics
+import time
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from apps.scheduling.models import Grupos, HorariosAsignados, DisponibilidadDocentes, TrabajosGeneracionHorario
+from apps.scheduling.service.generation_jobs import ESTADOS_ACTIVOS
+from apps.scheduling.service.schedule_generator import ScheduleGeneratorService
+from apps.scheduling.service.synthetic_data import crear_periodo_sintetico
+
+# Última migración sin los índices de 0004_indices_consultas ni de 0008_grupos_periodo_materia_carrera: estado "antes"
+MIGRACION_SIN_INDICES = '0003_trabajosgeneracionhorario_diagnosticos'
+
+
+def consultas_medidas(periodo):
+    """Consultas con la forma de las que hacen la API y la generación, sobre el periodo indicado."""
+    grupo = Grupos.objects.filter(periodo=periodo).order_by('grupo_id').first()
+    columnas = ('grupo_id', 'docente_id', 'espacio_id', 'dia_semana', 'bloque_horario_id')
+    return {
+        # Generación: ocupación, diferencia con el horario actual y borrado por periodo
+        "horarios_periodo": HorariosAsignados.objects.filter(periodo=periodo).values_list(*columnas),
+        # Grilla semanal del periodo, ordenada por día y bloque
+        "horarios_periodo_ordenados": HorariosAsignados.objects.filter(periodo=periodo).order_by(
+            'dia_semana', 'bloque_horario_id'
+        ).values_list(*columnas),
+        # HorariosAsignadosViewSet: ?periodo=&dia_semana=, ?periodo=&grupo__materia=, ?periodo=&grupo__carrera=
+        # (HorariosAsignadosFilter agrega el periodo del grupo a los dos últimos, que se resuelven con los índices
+        # (periodo, materia/carrera) de grupos y el único de horarios que empieza por grupo)
+        "horarios_periodo_dia": HorariosAsignados.objects.filter(periodo=periodo, dia_semana=3).values_list(*columnas),
+        "horarios_periodo_materia": HorariosAsignados.objects.filter(
+            periodo=periodo, grupo__materia=grupo.materia_id, grupo__periodo=periodo
+        ).values_list(*columnas),
+        "horarios_periodo_carrera": HorariosAsignados.objects.filter(
+            periodo=periodo, grupo__carrera=grupo.carrera_id, grupo__periodo=periodo
+        ).values_list(*columnas),
+        # ScheduleGeneratorService._map_docente_disponibilidad
+        "disponibilidad_activa_periodo": DisponibilidadDocentes.objects.filter(
+            periodo=periodo, esta_disponible=True
+        ).values_list('docente_id', 'dia_semana', 'bloque_horario_id', 'preferencia'),
+        # ScheduleGeneratorService._get_data_needed
+        "grupos_periodo": Grupos.objects.filter(periodo=periodo).select_related('materia', 'carrera'),
+        # generation_jobs.trabajo_activo (solo columnas que existen también sin las migraciones posteriores)
+        "trabajo_activo": TrabajosGeneracionHorario.objects.filter(
+            periodo=periodo, estado__in=ESTADOS_ACTIVOS
+        ).values_list('trabajo_id', 'estado'),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el plan y la latencia de las consultas principales de horarios sin y con los índices de "
+        "0004_indices_consultas y 0008_grupos_periodo_materia_carrera, sobre varios periodos sintéticos. Usa una "
+        "base de datos temporal de pruebas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--periodos', type=int, default=4, help="Periodos sintéticos a crear (se mide el último).")
+        parser.add_argument('--docentes', type=int, default=200)
+        parser.add_argument('--grupos', type=int, default=1000)
+        parser.add_argument('--espacios', type=int, default=200)
+        parser.add_argument('--bloques', type=int, default=60)
+        parser.add_argument('--trabajos', type=int, default=2000,
+                            help="Trabajos de generación terminados por periodo (historial de trabajo_activo).")
+        parser.add_argument('--repeticiones', type=int, default=20, help="Ejecuciones medidas por consulta.")
+        parser.add_argument('--semilla', type=int, default=1, help="Semilla de los datos sintéticos.")
+        parser.add_argument('--salida', help="Archivo JSON de resultados (por defecto se escribe en la salida estándar).")
+
+    def handle(self, *args, **options):
+        if options['repeticiones'] < 1 or options['periodos'] < 1:
+            raise CommandError("--repeticiones y --periodos deben ser al menos 1.")
+
+        # Los datos sintéticos nunca tocan la base de datos real
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            periodo = self._crear_datos(options)
+            filas = {
+                "horarios": HorariosAsignados.objects.count(),
+                "disponibilidad": DisponibilidadDocentes.objects.count(),
+                "grupos": Grupos.objects.count(),
+                "trabajos": TrabajosGeneracionHorario.objects.count(),
+            }
+            call_command('migrate', 'scheduling', MIGRACION_SIN_INDICES, verbosity=0)
+            antes = self._medir(periodo, options['repeticiones'])
+            call_command('migrate', 'scheduling', verbosity=0)
+            despues = self._medir(periodo, options['repeticiones'])
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+        resultados = []
+        for nombre in antes:
+            ms_antes, ms_despues = antes[nombre]["ms_mediana"], despues[nombre]["ms_mediana"]
+            resultados.append({
+                "consulta": nombre,
+                "filas": antes[nombre]["filas"],
+                "antes": antes[nombre],
+                "despues": despues[nombre],
+                "aceleracion": round(ms_antes / ms_despues, 2) if ms_despues else None,
+            })
+            self.stderr.write(f"{nombre}: {ms_antes} ms -> {ms_despues} ms ({antes[nombre]['filas']} filas)")
+
+        informe = {
+            "fecha": timezone.now().isoformat(),
+            "entorno": {
+                "python": platform.python_version(), "django": django.get_version(),
+                "base_datos": connection.vendor, "cpus": os.cpu_count(), "plataforma": platform.platform(),
+            },
+            "parametros": {clave: options[clave] for clave in (
+                'periodos', 'docentes', 'grupos', 'espacios', 'bloques', 'trabajos', 'repeticiones', 'semilla'
+            )},
+            "filas_totales": filas,
+            "resultados": resultados,
+        }
+        contenido = json.dumps(informe, indent=2, ensure_ascii=False, default=str)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(contenido)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+        else:
+            self.stdout.write(contenido)
+
+    def _crear_datos(self, options):
+        """Varios periodos con horario generado e historial de trabajos; devuelve el último."""
+        dimensiones = {clave: options[clave] for clave in ('docentes', 'grupos', 'espacios', 'bloques')}
+        for n in range(options['periodos']):
+            inicio = time.perf_counter()
+            periodo = crear_periodo_sintetico(semilla=options['semilla'] + n, **dimensiones)
+            ScheduleGeneratorService(periodo=periodo, motor="numpy").generar_horarios_automaticos()
+            TrabajosGeneracionHorario.objects.bulk_create([
+                TrabajosGeneracionHorario(periodo=periodo, estado='COMPLETADO', fase='completado', porcentaje=100)
+                for _ in range(options['trabajos'])
+            ], batch_size=2000)
+            self.stderr.write(f"Periodo {n + 1}/{options['periodos']} creado en {time.perf_counter() - inicio:.1f} s")
+        return periodo
+
+    def _medir(self, periodo, repeticiones):
+        if connection.vendor in ('postgresql', 'sqlite'):
+            # Estadísticas al día para que el planificador vea los índices recién creados o borrados
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+        resultados = {}
+        for nombre, consulta in consultas_medidas(periodo).items():
+            filas = len(list(consulta.all())) # Calentamiento
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                list(consulta.all())
+                tiempos.append(time.perf_counter() - inicio)
+            resultados[nombre] = {
+                "filas": filas,
+                "ms_mediana": round(1000 * statistics.median(tiempos), 3),
+                "ms_minimo": round(1000 * min(tiempos), 3),
+                "plan": consulta.explain(),
+            }
+        return resultados
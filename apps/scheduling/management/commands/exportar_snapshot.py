@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.academic_setup.models import PeriodoAcademico
+from apps.scheduling.service.snapshot import exportar_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta a un archivo (JSON comprimido) todo lo que la generación de horarios necesita de un periodo, "
+        "para resolverlo sin base de datos con resolver_snapshot."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('periodo_id', type=int)
+        parser.add_argument('archivo', help="Ruta del snapshot a crear (p. ej. periodo.snapshot.json.gz).")
+
+    def handle(self, *args, **options):
+        try:
+            periodo = PeriodoAcademico.objects.get(pk=options['periodo_id'])
+        except PeriodoAcademico.DoesNotExist:
+            raise CommandError(f"Período académico {options['periodo_id']} no encontrado.")
+        filas = exportar_snapshot(periodo, options['archivo'])
+        detalle = ", ".join(f"{nombre}: {n}" for nombre, n in filas.items())
+        self.stdout.write(self.style.SUCCESS(f"Snapshot de {periodo.nombre_periodo} guardado en {options['archivo']} ({detalle})"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.scheduling.service.snapshot import importar_resultado
+
+
+class Command(BaseCommand):
+    help = "Reemplaza los horarios del periodo por las asignaciones de un archivo creado con resolver_snapshot."
+
+    def add_arguments(self, parser):
+        parser.add_argument('resultado')
+
+    def handle(self, *args, **options):
+        try:
+            periodo, cantidad = importar_resultado(options['resultado'])
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"No se pudo importar el resultado: {e}")
+        self.stdout.write(self.style.SUCCESS(f"{cantidad} asignaciones importadas en {periodo.nombre_periodo}."))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.scheduling.service.generation_jobs import INTERVALO_CONSULTA_WORKER, procesar_siguiente_trabajo
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de la cola de generación: ejecuta los trabajos pendientes de TrabajosGeneracionHorario de a uno, "
+        "fuera del proceso web. Se pueden lanzar varios; cada uno toma trabajos distintos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true', help="Ejecuta los pendientes actuales y termina.")
+        parser.add_argument(
+            '--intervalo', type=float, default=INTERVALO_CONSULTA_WORKER,
+            help="Segundos de espera entre consultas cuando no hay trabajos pendientes."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            trabajo_id = procesar_siguiente_trabajo()
+            if trabajo_id is not None:
+                self.stdout.write(f"Trabajo de generación {trabajo_id} procesado.")
+                continue
+            if options['una_vez']:
+                return
+            time.sleep(options['intervalo'])
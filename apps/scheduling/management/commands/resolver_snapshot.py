@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.scheduling.service.schedule_generator import MOTORES_DISPONIBLES
+from apps.scheduling.service.snapshot import SnapshotGeneratorService, cargar_snapshot, escribir_resultado
+
+
+class Command(BaseCommand):
+    help = (
+        "Resuelve un snapshot creado con exportar_snapshot sin usar la base de datos y escribe las asignaciones "
+        "en un archivo de resultado (importable con importar_resultado_snapshot)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('snapshot')
+        parser.add_argument('resultado', help="Ruta del archivo JSON de resultado.")
+        parser.add_argument('--motor', choices=MOTORES_DISPONIBLES, default='referencia')
+        parser.add_argument('--procesos', type=int, default=1)
+        parser.add_argument('--segundos-mejora', type=float, default=0)
+        parser.add_argument('--semilla', type=int)
+        parser.add_argument('--time-budget-seconds', type=float)
+        parser.add_argument('--max-bloques-por-sesion', type=int, default=1)
+        parser.add_argument('--arranques', type=int, default=1, help="Búsquedas con órdenes aleatorios; se queda la mejor.")
+        parser.add_argument('--semillas', type=int, nargs='+', help="Semillas explícitas del multi-arranque.")
+
+    def handle(self, *args, **options):
+        try:
+            snapshot = cargar_snapshot(options['snapshot'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"No se pudo leer el snapshot: {e}")
+        parametros = {
+            "motor": options['motor'], "procesos": options['procesos'], "segundos_mejora": options['segundos_mejora'],
+            "semilla": options['semilla'], "time_budget_seconds": options['time_budget_seconds'],
+            "max_bloques_por_sesion": options['max_bloques_por_sesion'],
+            "arranques": options['arranques'], "semillas": options['semillas'],
+        }
+        try:
+            servicio = SnapshotGeneratorService(snapshot, **parametros)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        inicio = time.perf_counter()
+        resultado = servicio.generar_horarios_automaticos()
+        segundos = time.perf_counter() - inicio
+        escribir_resultado(options['resultado'], snapshot, parametros, resultado, servicio.asignaciones)
+
+        stats = resultado["stats"]
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(servicio.asignaciones)} asignaciones en {segundos:.2f} s "
+            f"({stats.get('grupos_programados', 0)} grupos programados, {stats.get('grupos_no_programados', 0)} sin programar); "
+            f"resultado en {options['resultado']}"
+        ))
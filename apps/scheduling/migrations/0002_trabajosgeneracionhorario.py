@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic_setup', '0001_initial'),
+        ('scheduling', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajosGeneracionHorario',
+            fields=[
+                ('trabajo_id', models.AutoField(primary_key=True, serialize=False)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En proceso'), ('COMPLETADO', 'Completado'), ('ERROR', 'Error')], default='PENDIENTE', max_length=20)),
+                ('fase', models.CharField(blank=True, help_text='Fase actual: carga_datos, busqueda, persistencia...', max_length=50, null=True)),
+                ('porcentaje', models.PositiveSmallIntegerField(default=0)),
+                ('parametros', models.JSONField(blank=True, default=dict, help_text='Opciones con las que se lanzó la generación')),
+                ('estadisticas', models.JSONField(blank=True, default=dict)),
+                ('conflictos_no_resueltos', models.JSONField(blank=True, default=list)),
+                ('mensaje_error', models.TextField(blank=True, null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('periodo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_generacion', to='academic_setup.periodoacademico')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Generación de Horario',
+                'verbose_name_plural': 'Trabajos de Generación de Horarios',
+                'ordering': ['-fecha_creacion'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0002_trabajosgeneracionhorario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajosgeneracionhorario',
+            name='diagnosticos',
+            field=models.JSONField(blank=True, default=list, help_text='Motivo estructurado por cada grupo sin programar'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic_setup', '0001_initial'),
+        ('scheduling', '0003_trabajosgeneracionhorario_diagnosticos'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='disponibilidaddocentes',
+            index=models.Index(condition=models.Q(('esta_disponible', True)), fields=['periodo', 'docente', 'dia_semana', 'bloque_horario'], include=('preferencia',), name='disp_periodo_activa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='horariosasignados',
+            index=models.Index(fields=['periodo', 'dia_semana', 'bloque_horario'], name='horario_periodo_dia_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trabajosgeneracionhorario',
+            index=models.Index(condition=models.Q(('estado__in', ['PENDIENTE', 'EN_PROCESO'])), fields=['periodo'], name='trabajo_activo_periodo_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:16
+
+import django.db.models.constraints
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic_setup', '0001_initial'),
+        ('scheduling', '0004_indices_consultas'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='horariosasignados',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='horariosasignados',
+            constraint=models.UniqueConstraint(deferrable=django.db.models.constraints.Deferrable['IMMEDIATE'], fields=('docente', 'periodo', 'dia_semana', 'bloque_horario'), name='horario_docente_bloque_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='horariosasignados',
+            constraint=models.UniqueConstraint(deferrable=django.db.models.constraints.Deferrable['IMMEDIATE'], fields=('espacio', 'periodo', 'dia_semana', 'bloque_horario'), name='horario_espacio_bloque_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='horariosasignados',
+            constraint=models.UniqueConstraint(deferrable=django.db.models.constraints.Deferrable['IMMEDIATE'], fields=('grupo', 'periodo', 'dia_semana', 'bloque_horario'), name='horario_grupo_bloque_uniq'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic_setup', '0001_initial'),
+        ('scheduling', '0005_horarios_restricciones_diferibles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionHorarioPeriodo',
+            fields=[
+                ('periodo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='version_horario', serialize=False, to='academic_setup.periodoacademico')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Versión de Horario del Período',
+                'verbose_name_plural': 'Versiones de Horarios de los Períodos',
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:33
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def cerrar_trabajos_duplicados(apps, schema_editor):
+    """Antes de la restricción única: deja activo solo el trabajo más reciente de cada periodo."""
+    Trabajos = apps.get_model('scheduling', 'TrabajosGeneracionHorario')
+    vistos = set()
+    duplicados = []
+    activos = Trabajos.objects.filter(estado__in=['PENDIENTE', 'EN_PROCESO']).order_by('periodo_id', '-fecha_creacion', '-trabajo_id')
+    for trabajo_id, periodo_id in activos.values_list('trabajo_id', 'periodo_id'):
+        if periodo_id in vistos:
+            duplicados.append(trabajo_id)
+        vistos.add(periodo_id)
+    Trabajos.objects.filter(trabajo_id__in=duplicados).update(
+        estado='ERROR', mensaje_error="Trabajo duplicado para el periodo; se conservó el más reciente.", fecha_fin=timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic_setup', '0001_initial'),
+        ('scheduling', '0006_versionhorarioperiodo'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='trabajosgeneracionhorario',
+            name='trabajo_activo_periodo_idx',
+        ),
+        migrations.AddField(
+            model_name='trabajosgeneracionhorario',
+            name='fecha_latido',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='trabajosgeneracionhorario',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En proceso'), ('COMPLETADO', 'Completado'), ('ERROR', 'Error'), ('CANCELADO', 'Cancelado')], default='PENDIENTE', max_length=20),
+        ),
+        migrations.RunPython(cerrar_trabajos_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='trabajosgeneracionhorario',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['PENDIENTE', 'EN_PROCESO'])), fields=('periodo',), name='trabajo_activo_periodo_uniq'),
+        ),
+    ]
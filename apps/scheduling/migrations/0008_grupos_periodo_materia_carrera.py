@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic_setup', '0001_initial'),
+        ('scheduling', '0007_trabajos_latido_activo_unico'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='grupos',
+            index=models.Index(fields=['periodo', 'materia'], name='grupo_periodo_materia_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grupos',
+            index=models.Index(fields=['periodo', 'carrera'], name='grupo_periodo_carrera_idx'),
+        ),
+    ]
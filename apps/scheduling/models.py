@@ -20,6 +20,12 @@ class Grupos(models.Model):
 
     class Meta:
         unique_together = ('codigo_grupo', 'periodo')
+        # Materias y carreras se repiten en todos los periodos: los filtros grupo__materia / grupo__carrera de
+        # horarios (y de la grilla por carrera) llegan a los grupos de un solo periodo sin recorrer los demás
+        indexes = [
+            models.Index(fields=['periodo', 'materia'], name='grupo_periodo_materia_idx'),
+            models.Index(fields=['periodo', 'carrera'], name='grupo_periodo_carrera_idx'),
+        ]
         verbose_name = "Grupo/Sección"
         verbose_name_plural = "Grupos/Secciones"
 
@@ -66,6 +72,13 @@ class DisponibilidadDocentes(models.Model):
 
     class Meta:
         unique_together = ('docente', 'periodo', 'dia_semana', 'bloque_horario')
+        indexes = [
+            # La generación lee solo la disponibilidad activa del periodo: índice parcial que la cubre entera
+            models.Index(
+                fields=['periodo', 'docente', 'dia_semana', 'bloque_horario'], include=['preferencia'],
+                condition=models.Q(esta_disponible=True), name='disp_periodo_activa_idx'
+            ),
+        ]
         verbose_name = "Disponibilidad de Docente"
         verbose_name_plural = "Disponibilidades de Docentes"
 
@@ -88,11 +101,27 @@ class HorariosAsignados(models.Model):
         return f"{self.grupo} en {self.espacio} con {self.docente} ({dict(self.DIA_SEMANA_CHOICES)[self.dia_semana]} {self.bloque_horario.hora_inicio})"
 
     class Meta:
-        # RD01, RD02: Cruces de horarios
-        unique_together = [
-            ('docente', 'periodo', 'dia_semana', 'bloque_horario'),
-            ('espacio', 'periodo', 'dia_semana', 'bloque_horario'),
-            ('grupo', 'periodo', 'dia_semana', 'bloque_horario'), # Un grupo no puede tener dos clases distintas al mismo tiempo
+        # RD01, RD02: Cruces de horarios. Diferibles (pero inmediatas por defecto) para que los movimientos e
+        # intercambios en bloque puedan verificarlas al final de la transacción (ver service/bulk_edit.py)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['docente', 'periodo', 'dia_semana', 'bloque_horario'], name='horario_docente_bloque_uniq',
+                deferrable=models.Deferrable.IMMEDIATE
+            ),
+            models.UniqueConstraint(
+                fields=['espacio', 'periodo', 'dia_semana', 'bloque_horario'], name='horario_espacio_bloque_uniq',
+                deferrable=models.Deferrable.IMMEDIATE
+            ),
+            # Un grupo no puede tener dos clases distintas al mismo tiempo
+            models.UniqueConstraint(
+                fields=['grupo', 'periodo', 'dia_semana', 'bloque_horario'], name='horario_grupo_bloque_uniq',
+                deferrable=models.Deferrable.IMMEDIATE
+            ),
+        ]
+        # Los índices únicos empiezan por docente, espacio o grupo; estos cubren los recorridos por periodo
+        # (generación, borrado y grilla semanal) y el filtro por día
+        indexes = [
+            models.Index(fields=['periodo', 'dia_semana', 'bloque_horario'], name='horario_periodo_dia_idx'),
         ]
         verbose_name = "Horario Asignado"
         verbose_name_plural = "Horarios Asignados"
@@ -119,3 +148,55 @@ class ConfiguracionRestricciones(models.Model):
     class Meta:
         verbose_name = "Configuración de Restricción"
         verbose_name_plural = "Configuraciones de Restricciones"
+
+
+class TrabajosGeneracionHorario(models.Model):
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En proceso'),
+        ('COMPLETADO', 'Completado'), ('ERROR', 'Error'), ('CANCELADO', 'Cancelado')
+    ]
+
+    trabajo_id = models.AutoField(primary_key=True)
+    periodo = models.ForeignKey(PeriodoAcademico, on_delete=models.CASCADE, related_name='trabajos_generacion')
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='PENDIENTE')
+    fase = models.CharField(max_length=50, blank=True, null=True, help_text="Fase actual: carga_datos, busqueda, persistencia...")
+    porcentaje = models.PositiveSmallIntegerField(default=0)
+    parametros = models.JSONField(default=dict, blank=True, help_text="Opciones con las que se lanzó la generación")
+    estadisticas = models.JSONField(default=dict, blank=True) # generation_stats parciales o finales
+    conflictos_no_resueltos = models.JSONField(default=list, blank=True)
+    diagnosticos = models.JSONField(default=list, blank=True, help_text="Motivo estructurado por cada grupo sin programar")
+    mensaje_error = models.TextField(blank=True, null=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(blank=True, null=True)
+    fecha_fin = models.DateTimeField(blank=True, null=True)
+    # El worker que ejecuta el trabajo la renueva mientras está en proceso; si deja de hacerlo, el trabajo quedó
+    # huérfano (reinicio o caída del worker) y deja de bloquear el periodo
+    fecha_latido = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Generación #{self.trabajo_id} - {self.periodo} ({self.estado})"
+
+    class Meta:
+        verbose_name = "Trabajo de Generación de Horario"
+        verbose_name_plural = "Trabajos de Generación de Horarios"
+        ordering = ['-fecha_creacion']
+        constraints = [
+            # A lo sumo un trabajo pendiente o en proceso por periodo; también es el índice de trabajo_activo()
+            models.UniqueConstraint(
+                fields=['periodo'], condition=models.Q(estado__in=['PENDIENTE', 'EN_PROCESO']), name='trabajo_activo_periodo_uniq'
+            ),
+        ]
+
+
+class VersionHorarioPeriodo(models.Model):
+    """Contador que sube con cada cambio en los horarios del periodo; las grillas en caché se indexan por él."""
+    periodo = models.OneToOneField(PeriodoAcademico, on_delete=models.CASCADE, primary_key=True, related_name='version_horario')
+    version = models.PositiveBigIntegerField(default=0)
+    fecha_modificacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.periodo} v{self.version}"
+
+    class Meta:
+        verbose_name = "Versión de Horario del Período"
+        verbose_name_plural = "Versiones de Horarios de los Períodos"
@@ -0,0 +1,17 @@
+from rest_framework.pagination import CursorPagination
+
+# Tope de ?page_size= para que un cliente no pida un periodo entero en una sola página
+MAX_PAGE_SIZE = 500
+
+
+class PaginacionCursorPK(CursorPagination):
+    """
+    Paginación por cursor (keyset) sobre la clave primaria, para listados de cientos de miles de filas por periodo
+    (horarios y disponibilidad). Cada página es WHERE pk > cursor ORDER BY pk LIMIT n sobre el índice de la PK: no
+    hay COUNT(*) ni OFFSET, así que el costo de una página no depende de cuán adentro esté. La respuesta trae
+    next/previous (cursores opacos) en lugar de count y número de página. El tamaño por defecto es PAGE_SIZE y el
+    cliente puede pedir otro con ?page_size= hasta MAX_PAGE_SIZE.
+    """
+    ordering = 'pk'
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
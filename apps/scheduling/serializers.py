@@ -1,8 +1,11 @@
+from django.db.models import F, Value, Case, When, CharField
+from django.db.models.functions import Coalesce, Concat, NullIf, Trim
 from rest_framework import serializers
-from .models import Grupos, BloquesHorariosDefinicion, DisponibilidadDocentes, HorariosAsignados, ConfiguracionRestricciones
+from .models import Grupos, BloquesHorariosDefinicion, DisponibilidadDocentes, HorariosAsignados, ConfiguracionRestricciones, TrabajosGeneracionHorario
 from apps.academic_setup.serializers import MateriasSerializer, CarreraSerializer, EspaciosFisicosSerializer
 from apps.users.serializers import DocentesSerializer
 from apps.academic_setup.models import PeriodoAcademico
+from .service.constraint_compiler import validar_restriccion
 
 class GruposSerializer(serializers.ModelSerializer):
     materia_detalle = MateriasSerializer(source='materia', read_only=True)
@@ -56,7 +59,116 @@ class HorariosAsignadosSerializer(serializers.ModelSerializer):
                   'espacio', 'espacio_detalle', 'periodo', 'periodo_nombre',
                   'dia_semana', 'dia_semana_display', 'bloque_horario', 'bloque_horario_detalle',
                   'estado', 'estado_display', 'observaciones']
-        # Validar unique_together en el serializador si es necesario, aunque el modelo ya lo hace.
+        # Los cruces de las restricciones únicas no se validan aquí (una consulta por restricción y solo el primer error):
+        # HorariosAsignadosViewSet los informa junto con el resto de conflictos vía ConflictValidatorService.
+        validators = []
+
+class HorariosAsignadosPlanoSerializer(serializers.ModelSerializer):
+    """
+    Representación plana y de solo lectura para listar horarios. Los nombres para mostrar son anotaciones de la
+    misma consulta (ver preparar_queryset) en lugar de serializadores anidados, así que un listado completo se
+    resuelve con un número fijo de consultas. Con ?fields=a,b solo se devuelven (y anotan) esos campos; con
+    ?expand=grupo,docente,espacio,bloque_horario se agregan los detalles anidados de HorariosAsignadosSerializer.
+    """
+    grupo_codigo = serializers.CharField(read_only=True)
+    materia = serializers.IntegerField(read_only=True)
+    materia_codigo = serializers.CharField(read_only=True)
+    materia_nombre = serializers.CharField(read_only=True)
+    carrera = serializers.IntegerField(read_only=True)
+    carrera_nombre = serializers.CharField(read_only=True)
+    docente_nombre = serializers.CharField(read_only=True)
+    espacio_nombre = serializers.CharField(read_only=True)
+    periodo_nombre = serializers.CharField(read_only=True)
+    dia_semana_display = serializers.CharField(source='get_dia_semana_display', read_only=True)
+    bloque_nombre = serializers.CharField(read_only=True)
+    hora_inicio = serializers.TimeField(read_only=True)
+    hora_fin = serializers.TimeField(read_only=True)
+    estado_display = serializers.CharField(source='get_estado_display', read_only=True)
+    # Solo con ?expand=
+    grupo_detalle = GruposSerializer(source='grupo', read_only=True)
+    docente_detalle = DocentesSerializer(source='docente', read_only=True)
+    espacio_detalle = EspaciosFisicosSerializer(source='espacio', read_only=True)
+    bloque_horario_detalle = BloquesHorariosDefinicionSerializer(source='bloque_horario', read_only=True)
+
+    # { campo: expresión anotada en la consulta }
+    ANOTACIONES = {
+        'grupo_codigo': F('grupo__codigo_grupo'),
+        'materia': F('grupo__materia_id'),
+        'materia_codigo': F('grupo__materia__codigo_materia'),
+        'materia_nombre': F('grupo__materia__nombre_materia'),
+        'carrera': F('grupo__carrera_id'),
+        'carrera_nombre': F('grupo__carrera__nombre_carrera'),
+        # Como Docentes.__str__: el nombre del usuario si tiene uno asociado, y el código del docente
+        'docente_nombre': Concat(
+            Case(
+                When(docente__usuario__isnull=False,
+                     then=Trim(Concat('docente__usuario__first_name', Value(' '), 'docente__usuario__last_name'))),
+                default=Concat('docente__nombres', Value(' '), 'docente__apellidos'),
+                output_field=CharField(),
+            ),
+            Value(' ('), Coalesce(NullIf('docente__codigo_docente', Value('')), Value('Sin código')), Value(')'),
+            output_field=CharField(),
+        ),
+        'espacio_nombre': F('espacio__nombre_espacio'),
+        'periodo_nombre': F('periodo__nombre_periodo'),
+        'bloque_nombre': F('bloque_horario__nombre_bloque'),
+        'hora_inicio': F('bloque_horario__hora_inicio'),
+        'hora_fin': F('bloque_horario__hora_fin'),
+    }
+    # { expand: (campo anidado, select_related, prefetch_related) } con lo que lee cada serializador anidado
+    EXPANSIONES = {
+        'grupo': ('grupo_detalle', (
+            'grupo__materia__requiere_tipo_espacio_especifico', 'grupo__carrera__unidad', 'grupo__periodo',
+            'grupo__docente_asignado_directamente__usuario',
+        ), ()),
+        'docente': ('docente_detalle', ('docente__usuario', 'docente__unidad_principal'), ('docente__especialidades',)),
+        'espacio': ('espacio_detalle', ('espacio__tipo_espacio', 'espacio__unidad'), ()),
+        'bloque_horario': ('bloque_horario_detalle', ('bloque_horario',), ()),
+    }
+
+    class Meta:
+        model = HorariosAsignados
+        fields = ['horario_id', 'grupo', 'grupo_codigo', 'materia', 'materia_codigo', 'materia_nombre',
+                  'carrera', 'carrera_nombre', 'docente', 'docente_nombre', 'espacio', 'espacio_nombre',
+                  'periodo', 'periodo_nombre', 'dia_semana', 'dia_semana_display', 'bloque_horario', 'bloque_nombre',
+                  'hora_inicio', 'hora_fin', 'estado', 'estado_display', 'observaciones',
+                  'grupo_detalle', 'docente_detalle', 'espacio_detalle', 'bloque_horario_detalle']
+        read_only_fields = fields
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        campos, expandir = self.opciones(request.query_params if request is not None else {})
+        visibles = campos | {self.EXPANSIONES[e][0] for e in expandir}
+        for nombre in list(self.fields):
+            if nombre not in visibles:
+                self.fields.pop(nombre)
+
+    @classmethod
+    def opciones(cls, query_params):
+        """(campos, expansiones) pedidos con ?fields= y ?expand=; lanza ValidationError si alguno no existe."""
+        planos = [campo for campo in cls.Meta.fields if not campo.endswith('_detalle')]
+        campos = cls._valores(query_params, 'fields', planos) or set(planos)
+        return campos, cls._valores(query_params, 'expand', list(cls.EXPANSIONES))
+
+    @staticmethod
+    def _valores(query_params, parametro, validos):
+        pedidos = {valor.strip() for valor in (query_params.get(parametro) or '').split(',') if valor.strip()}
+        desconocidos = pedidos - set(validos)
+        if desconocidos:
+            raise serializers.ValidationError({
+                parametro: f"Valores desconocidos: {', '.join(sorted(desconocidos))}. Válidos: {', '.join(validos)}."
+            })
+        return pedidos
+
+    @classmethod
+    def preparar_queryset(cls, queryset, campos, expandir):
+        """Anota solo los nombres de los campos pedidos y carga en la misma consulta lo que leen las expansiones."""
+        queryset = queryset.annotate(**{campo: expresion for campo, expresion in cls.ANOTACIONES.items() if campo in campos})
+        for expansion in expandir:
+            _, relacionados, prefetch = cls.EXPANSIONES[expansion]
+            queryset = queryset.select_related(*relacionados).prefetch_related(*prefetch)
+        return queryset
 
 class ConfiguracionRestriccionesSerializer(serializers.ModelSerializer):
     periodo_aplicable_nombre = serializers.CharField(source='periodo_aplicable.nombre_periodo', read_only=True, allow_null=True)
@@ -67,3 +179,24 @@ class ConfiguracionRestriccionesSerializer(serializers.ModelSerializer):
         fields = ['restriccion_id', 'codigo_restriccion', 'descripcion', 'tipo_aplicacion', 'tipo_aplicacion_display',
                   'entidad_id_1', 'entidad_id_2', 'valor_parametro',
                   'periodo_aplicable', 'periodo_aplicable_nombre', 'esta_activa']
+
+    def validate(self, attrs):
+        # La restricción debe poder compilarse (ver service/constraint_compiler.py)
+        datos = {campo: getattr(self.instance, campo, None) for campo in ('tipo_aplicacion', 'entidad_id_1', 'valor_parametro')}
+        datos.update({campo: valor for campo, valor in attrs.items() if campo in datos})
+        try:
+            validar_restriccion(datos['tipo_aplicacion'], datos['entidad_id_1'], datos['valor_parametro'])
+        except ValueError as e:
+            raise serializers.ValidationError({'valor_parametro': str(e)})
+        return attrs
+
+class TrabajosGeneracionHorarioSerializer(serializers.ModelSerializer):
+    periodo_nombre = serializers.CharField(source='periodo.nombre_periodo', read_only=True)
+    estado_display = serializers.CharField(source='get_estado_display', read_only=True)
+
+    class Meta:
+        model = TrabajosGeneracionHorario
+        fields = ['trabajo_id', 'periodo', 'periodo_nombre', 'estado', 'estado_display', 'fase', 'porcentaje',
+                  'parametros', 'estadisticas', 'conflictos_no_resueltos', 'diagnosticos', 'mensaje_error',
+                  'fecha_creacion', 'fecha_inicio', 'fecha_fin']
+        read_only_fields = fields
@@ -0,0 +1,382 @@
+import heapq
+import time
+
+# Retrocesos permitidos en toda la búsqueda y por cada grupo que se queda sin salida; agotados, el grupo se descarta
+LIMITE_RETROCESOS = 10000
+RETROCESOS_POR_CONFLICTO = 50
+# Cada cuántas asignaciones se informa el avance
+INTERVALO_PROGRESO = 500
+
+
+class BacktrackingSolver:
+    """
+    Motor de propagación de restricciones para ScheduleGeneratorService.
+
+    Cada grupo tiene un dominio de valores (docente, bloque) compartido por todas sus sesiones pendientes;
+    el espacio se elige al asignar (primer espacio candidato libre). En cada paso se programa la siguiente
+    sesión del grupo más restringido (MRV: menos bloques distintos en su dominio respecto a las sesiones
+    que le faltan) y el forward checking poda los dominios de los grupos que compartían el docente, el
+    espacio o el bloque tomado. Si una asignación deja a otro grupo sin salida se prueba el siguiente valor
+    y, si no quedan, se retrocede (con salto a la decisión que causó el conflicto) con un presupuesto acotado;
+    si no alcanza, el grupo sin salida se descarta y se liberan las sesiones que ya tenía.
+    """
+
+    def __init__(self, generador, limite_retrocesos=LIMITE_RETROCESOS, retrocesos_por_conflicto=RETROCESOS_POR_CONFLICTO):
+        self.generador = generador
+        self.limite_retrocesos = limite_retrocesos
+        self.retrocesos_por_conflicto = retrocesos_por_conflicto
+        self.bloques = generador.bloques_horarios
+        self.indice_slot = {(b.dia_semana, b.bloque_def_id): j for j, b in enumerate(self.bloques)}
+        self.stats = {"nodos_explorados": 0, "podas": 0, "retrocesos": 0}
+
+    def _ocupados(self, tipo):
+        """Slots (índices) ya ocupados por entidad según el validador (BD, bloqueos y sesión actual)."""
+        ocupados = {}
+        for indice in self.generador.validator.indices_ocupacion():
+            for entidad_id, slots in indice[tipo].items():
+                for slot in slots:
+                    if slot in self.indice_slot:
+                        ocupados.setdefault(entidad_id, set()).add(self.indice_slot[slot])
+        return ocupados
+
+    def _preparar(self, grupos):
+        gen = self.generador
+        docentes_ocupados = self._ocupados("docentes")
+        espacios_ocupados = self._ocupados("espacios")
+        grupos_ocupados = self._ocupados("grupos")
+
+        self.grupos = {g.grupo_id: g for g in grupos}
+        self.restantes = {}          # { grupo_id: sesiones por programar }
+        self.dominio = {}            # { grupo_id: { j: {docente_id, ...} } }
+        self.espacios = {}           # { grupo_id: [espacio, ...] } en orden de preferencia
+        self.orden_docente = {}      # { grupo_id: { docente_id: posición entre los candidatos } }
+        self.grupos_por_docente = {} # { docente_id: {grupo_id, ...} }
+        self.grupos_por_clase = {}   # { clase de espacios: {grupo_id, ...} }
+        self.clase_de_grupo = {}
+        self.espacio_ocupado = {(e, j) for e, slots in espacios_ocupados.items() for j in slots}
+        self.docente_ocupado = {(d, j) for d, slots in docentes_ocupados.items() for j in slots}
+
+        for grupo in grupos:
+            materia = grupo.materia
+            candidatos = gen._docentes_candidatos(grupo)
+            espacios = gen._espacios_candidatos(grupo, materia)
+            ocupados_grupo = grupos_ocupados.get(grupo.grupo_id, set())
+            dominio = {}
+            for d in candidatos:
+                for j, bloque in enumerate(self.bloques):
+                    if j in ocupados_grupo or (d.docente_id, j) in self.docente_ocupado:
+                        continue
+                    if not gen._es_docente_disponible(d.docente_id, bloque.dia_semana, bloque.bloque_def_id):
+                        continue
+                    if not gen._cumple_restricciones_docente(d, bloque.dia_semana, bloque, materia, grupo):
+                        continue
+                    dominio.setdefault(j, set()).add(d.docente_id)
+                self.grupos_por_docente.setdefault(d.docente_id, set()).add(grupo.grupo_id)
+
+            clase = tuple(e.espacio_id for e in espacios)
+            self.grupos_por_clase.setdefault(clase, set()).add(grupo.grupo_id)
+            self.clase_de_grupo[grupo.grupo_id] = clase
+            self.espacios[grupo.grupo_id] = espacios
+            self.orden_docente[grupo.grupo_id] = {d.docente_id: k for k, d in enumerate(candidatos)}
+            self.dominio[grupo.grupo_id] = dominio
+            self.restantes[grupo.grupo_id] = gen._sesiones_requeridas(grupo)
+        self.sesiones = dict(self.restantes)
+
+        # Espacios libres por clase y bloque: cuando llega a 0 el bloque deja de servir a toda la clase
+        self.clases_por_espacio = {}
+        self.libres = {}
+        for clase in self.grupos_por_clase:
+            self.libres[clase] = [0] * len(self.bloques)
+            for espacio_id in clase:
+                self.clases_por_espacio.setdefault(espacio_id, []).append(clase)
+                for j in range(len(self.bloques)):
+                    if (espacio_id, j) not in self.espacio_ocupado:
+                        self.libres[clase][j] += 1
+        for grupo_id, clase in self.clase_de_grupo.items():
+            for j in [j for j in self.dominio[grupo_id] if self.libres[clase][j] == 0]:
+                del self.dominio[grupo_id][j]
+
+    # --- Dominios y rastro para deshacer -------------------------------------------------------------
+
+    def _cuenta(self, grupo_id):
+        return self.restantes[grupo_id] > 0 and grupo_id in self.activos
+
+    def _ajustar_demanda(self, j, docentes, delta):
+        for docente_id in docentes:
+            self.demanda[(docente_id, j)] = self.demanda.get((docente_id, j), 0) + delta
+
+    def _ajustar_demanda_grupo(self, grupo_id, delta):
+        for j, docentes in self.dominio[grupo_id].items():
+            self._ajustar_demanda(j, docentes, delta)
+
+    def _retirar(self, grupo_id):
+        """Saca al grupo de la búsqueda; deja de contar en la demanda de sus docentes."""
+        if self._cuenta(grupo_id):
+            self._ajustar_demanda_grupo(grupo_id, -1)
+        self.activos.discard(grupo_id)
+
+    def _holgura(self, grupo_id):
+        return len(self.dominio[grupo_id]) - self.restantes[grupo_id]
+
+    def _encolar(self, grupo_id):
+        # Desempate: a igual holgura, primero los grupos ya iniciados para no dejar grupos a medias
+        iniciado = self.restantes[grupo_id] < self.sesiones[grupo_id]
+        heapq.heappush(self.cola, (self._holgura(grupo_id), not iniciado, -self.restantes[grupo_id], grupo_id))
+
+    def _quitar_docente(self, grupo_id, j, docente_id, rastro):
+        docentes = self.dominio[grupo_id].get(j)
+        if not docentes or docente_id not in docentes:
+            return
+        docentes.discard(docente_id)
+        if self._cuenta(grupo_id):
+            self._ajustar_demanda(j, (docente_id,), -1)
+        rastro.append(("docente", grupo_id, j, docente_id))
+        self.stats["podas"] += 1
+        if not docentes:
+            del self.dominio[grupo_id][j]
+            self.tocados.add(grupo_id)
+
+    def _quitar_slot(self, grupo_id, j, rastro):
+        docentes = self.dominio[grupo_id].pop(j, None)
+        if docentes is None:
+            return
+        if self._cuenta(grupo_id):
+            self._ajustar_demanda(j, docentes, -1)
+        rastro.append(("slot", grupo_id, j, docentes))
+        self.stats["podas"] += len(docentes)
+        self.tocados.add(grupo_id)
+
+    def _asignar(self, grupo_id, docente_id, espacio_id, j, rastro):
+        """Toma los recursos y aplica forward checking. Devuelve los grupos que quedaron sin salida."""
+        rastro.append(("asignacion", grupo_id, docente_id, espacio_id, j))
+        self.restantes[grupo_id] -= 1
+        if self.restantes[grupo_id] == 0 and grupo_id in self.activos:
+            self._ajustar_demanda_grupo(grupo_id, -1) # Grupo completo: ya no compite por sus docentes
+        self.docente_ocupado.add((docente_id, j))
+        self.espacio_ocupado.add((espacio_id, j))
+        afectados = {grupo_id}
+
+        self._quitar_slot(grupo_id, j, rastro) # El grupo no puede tener dos sesiones en el mismo bloque
+        for otro in self.grupos_por_docente.get(docente_id, ()):
+            if otro in self.activos and self.restantes[otro] > 0:
+                self._quitar_docente(otro, j, docente_id, rastro)
+                afectados.add(otro)
+        for clase in self.clases_por_espacio.get(espacio_id, ()):
+            self.libres[clase][j] -= 1
+            if self.libres[clase][j] == 0:
+                for otro in self.grupos_por_clase[clase]:
+                    if otro in self.activos and self.restantes[otro] > 0:
+                        self._quitar_slot(otro, j, rastro)
+                        afectados.add(otro)
+        self.tocados.add(grupo_id)
+        self._encolar_tocados()
+        return [g for g in afectados if self.restantes[g] > 0 and self._holgura(g) < 0]
+
+    def _encolar_tocados(self):
+        for grupo_id in self.tocados:
+            self._encolar(grupo_id)
+        self.tocados.clear()
+
+    def _deshacer(self, rastro, hasta):
+        while len(rastro) > hasta:
+            entrada = rastro.pop()
+            if entrada[0] == "docente":
+                _, grupo_id, j, docente_id = entrada
+                self.dominio[grupo_id].setdefault(j, set()).add(docente_id)
+                if self._cuenta(grupo_id):
+                    self._ajustar_demanda(j, (docente_id,), 1)
+                self.tocados.add(grupo_id)
+            elif entrada[0] == "slot":
+                _, grupo_id, j, docentes = entrada
+                self.dominio[grupo_id][j] = docentes
+                if self._cuenta(grupo_id):
+                    self._ajustar_demanda(j, docentes, 1)
+                self.tocados.add(grupo_id)
+            else:
+                _, grupo_id, docente_id, espacio_id, j = entrada
+                self.restantes[grupo_id] += 1
+                if self.restantes[grupo_id] == 1 and grupo_id in self.activos:
+                    self._ajustar_demanda_grupo(grupo_id, 1)
+                self.docente_ocupado.discard((docente_id, j))
+                self.espacio_ocupado.discard((espacio_id, j))
+                for clase in self.clases_por_espacio.get(espacio_id, ()):
+                    self.libres[clase][j] += 1
+                self.tocados.add(grupo_id)
+        self._encolar_tocados()
+
+    # --- Búsqueda ------------------------------------------------------------------------------------
+
+    def _valores(self, grupo_id):
+        """
+        Valores (docente, espacio, bloque) del grupo: mayor preferencia primero; a igual preferencia el valor
+        que menos restringe a los demás grupos, luego orden de candidatos y bloque.
+        """
+        preferencias = self.generador.docente_disponibilidad_map
+        orden = self.orden_docente[grupo_id]
+        pares = [(docente_id, j) for j, docentes in self.dominio[grupo_id].items() for docente_id in docentes]
+        pares.sort(key=lambda p: (
+            -preferencias.get((p[0], self.bloques[p[1]].dia_semana, self.bloques[p[1]].bloque_def_id), 0),
+            self.demanda.get(p, 0), orden[p[0]], p[1]
+        ))
+        valores = []
+        for docente_id, j in pares:
+            espacio = next((e for e in self.espacios[grupo_id] if (e.espacio_id, j) not in self.espacio_ocupado), None)
+            if espacio is not None:
+                valores.append((docente_id, espacio.espacio_id, j))
+        return valores
+
+    def _siguiente_grupo(self):
+        """Grupo activo más restringido (MRV); las entradas obsoletas de la cola se descartan al salir."""
+        while self.cola:
+            holgura, _, menos_restantes, grupo_id = heapq.heappop(self.cola)
+            if grupo_id not in self.activos or self.restantes[grupo_id] <= 0:
+                continue
+            if holgura != self._holgura(grupo_id) or -menos_restantes != self.restantes[grupo_id]:
+                continue
+            return grupo_id
+        return None
+
+    def _probar(self, grupo_id, valores, desde, rastro):
+        """
+        Prueba los valores desde `desde`; devuelve el índice del valor aplicado o None. Los grupos que cada valor
+        rechazado dejaba sin salida se acumulan en self.conflicto para decidir a dónde retroceder.
+        """
+        permitir_sin_salida = self.stats["retrocesos"] >= self.limite_retrocesos
+        for k in range(desde, len(valores)):
+            docente_id, espacio_id, j = valores[k]
+            marca = len(rastro)
+            self.stats["nodos_explorados"] += 1
+            sin_salida = self._asignar(grupo_id, docente_id, espacio_id, j, rastro)
+            if not sin_salida or permitir_sin_salida:
+                return k
+            self.conflicto.update(sin_salida)
+            self._deshacer(rastro, marca)
+        return None
+
+    def _descartar(self, grupo_id, rastro):
+        """
+        Saca al grupo de la búsqueda y libera las sesiones que ya tenía: se deshace el rastro hasta su primera
+        asignación y se vuelven a aplicar las asignaciones posteriores de los demás grupos (siguen siendo válidas).
+        """
+        inicio = next(
+            (i for i, entrada in enumerate(rastro) if entrada[0] == "asignacion" and entrada[1] == grupo_id), None
+        )
+        if inicio is None:
+            self._retirar(grupo_id)
+            return
+        posteriores = [e for e in rastro[inicio:] if e[0] == "asignacion" and e[1] != grupo_id]
+        self._deshacer(rastro, inicio)
+        self._retirar(grupo_id)
+        for _, otro, docente_id, espacio_id, j in posteriores:
+            self._asignar(otro, docente_id, espacio_id, j, rastro)
+
+    def _retroceder(self, pila, rastro, grupo_en_conflicto):
+        """
+        Retroceso con salto (backjumping): vuelve a la decisión más reciente que podó el dominio de algún grupo
+        del conjunto de conflicto, en lugar de deshacer decisiones que no tienen relación con el fallo.
+        """
+        conflicto = self.conflicto | {grupo_en_conflicto}
+        self.retrocesos_por_grupo[grupo_en_conflicto] = self.retrocesos_por_grupo.get(grupo_en_conflicto, 0) + 1
+        if self.retrocesos_por_grupo[grupo_en_conflicto] > self.retrocesos_por_conflicto:
+            return False # El grupo ya provocó demasiados retrocesos: se descarta para no caer en ciclos
+        presupuesto = min(self.retrocesos_por_conflicto, self.limite_retrocesos - self.stats["retrocesos"])
+        while pila and presupuesto > 0:
+            destino = None
+            fin = len(rastro)
+            for indice in range(len(pila) - 1, -1, -1):
+                anterior, _, _, marca = pila[indice]
+                # Cambiar otra sesión del mismo grupo solo intercambia bloques entre sesiones equivalentes
+                if anterior != grupo_en_conflicto and any(
+                    entrada[0] != "asignacion" and entrada[1] in conflicto for entrada in rastro[marca:fin]
+                ):
+                    destino = indice
+                    break
+                fin = marca
+            if destino is None:
+                return False
+
+            presupuesto -= 1
+            self.stats["retrocesos"] += 1
+            anterior, valores, k, marca = pila[destino]
+            del pila[destino:]
+            self._deshacer(rastro, marca)
+            conflicto.add(anterior)
+            self.conflicto = set()
+            k = self._probar(anterior, valores, k + 1, rastro)
+            if k is not None:
+                pila.append((anterior, valores, k, marca))
+                return True
+            conflicto |= self.conflicto
+        return False
+
+    def resolver(self, grupos, on_progress=None, fin=None):
+        """
+        Programa las sesiones de `grupos`. Devuelve (asignaciones, grupos_descartados) donde cada asignación es
+        (grupo_id, docente_id, espacio_id, dia_semana, bloque_id). Si se pasa `fin` (instante de time.perf_counter)
+        la búsqueda se detiene al alcanzarlo y devuelve lo asignado hasta ese momento; los grupos que quedaron
+        incompletos se informan como descartados pero conservan sus sesiones.
+        """
+        inicio = time.perf_counter()
+        self._preparar(grupos)
+        self.activos = set(self.grupos)
+        self.tocados = set() # Grupos cuyo dominio cambió y deben volver a la cola de prioridad
+        # Demanda por (docente, bloque): cuántos grupos pendientes lo tienen en su dominio (valor menos restrictivo)
+        self.demanda = {}
+        for grupo_id in self.activos:
+            if self.restantes[grupo_id] > 0:
+                self._ajustar_demanda_grupo(grupo_id, 1)
+        self.conflicto = set()
+        self.retrocesos_por_grupo = {}
+        self.cola = []
+        for grupo_id in self.activos:
+            self._encolar(grupo_id)
+        descartados = []
+        rastro = []
+        pila = [] # [(grupo_id, valores, índice del valor aplicado, marca del rastro)]
+        iteraciones = 0
+
+        # Grupos que ya no caben al inicio (sin docentes, bloques o espacios suficientes) se descartan sin buscar
+        for grupo_id in sorted(self.activos):
+            if self.restantes[grupo_id] > 0 and self._holgura(grupo_id) < 0:
+                self._retirar(grupo_id)
+                descartados.append(grupo_id)
+
+        while True:
+            if fin is not None and time.perf_counter() >= fin:
+                descartados.extend(sorted(g for g in self.activos if self.restantes[g] > 0))
+                break
+            grupo_id = self._siguiente_grupo()
+            if grupo_id is None:
+                break
+
+            self.conflicto = set()
+            if self._holgura(grupo_id) >= 0:
+                valores = self._valores(grupo_id)
+                marca = len(rastro)
+                k = self._probar(grupo_id, valores, 0, rastro)
+                if k is not None:
+                    pila.append((grupo_id, valores, k, marca))
+                    iteraciones += 1
+                    if on_progress is not None and iteraciones % INTERVALO_PROGRESO == 0:
+                        on_progress(self._porcentaje_resuelto(descartados))
+                    continue
+
+            # Sin valores viables: retroceder con presupuesto acotado; si no alcanza, descartar el grupo
+            if not self._retroceder(pila, rastro, grupo_id):
+                # Las decisiones previas a un descarte quedan fijas: ya no se retrocede sobre ellas
+                pila.clear()
+                self._descartar(grupo_id, rastro)
+                descartados.append(grupo_id)
+
+        self.stats["segundos"] = time.perf_counter() - inicio
+        asignaciones = []
+        for entrada in rastro:
+            if entrada[0] == "asignacion":
+                _, grupo_id, docente_id, espacio_id, j = entrada
+                bloque = self.bloques[j]
+                asignaciones.append((grupo_id, docente_id, espacio_id, bloque.dia_semana, bloque.bloque_def_id))
+        return asignaciones, descartados
+
+    def _porcentaje_resuelto(self, descartados):
+        completos = sum(1 for g in self.grupos if self.restantes[g] <= 0)
+        return 100 * (completos + len(descartados)) // max(len(self.grupos), 1)
@@ -0,0 +1,117 @@
+"""
+Movimientos e intercambios de clases aplicados en bloque sobre el horario guardado de un periodo.
+
+Cada movimiento es un dict:
+
+    {"tipo": "mover", "horario_id": id, "dia_semana"?, "bloque_horario"?, "docente"?, "espacio"?}
+        (los campos omitidos conservan su valor; el grupo de la clase no cambia)
+    {"tipo": "intercambiar", "horario_id": id, "con_horario_id": id}
+        (las dos clases intercambian día, bloque y espacio; cada una conserva su grupo y su docente)
+
+Todos se validan juntos con ConflictValidatorService.validar_propuestas, contra la ocupación del periodo sin las
+clases que se mueven y entre sí, y se aplican en una sola transacción: o se guardan todos o ninguno. Los estados
+intermedios (p. ej. la primera mitad de un intercambio) violan las restricciones únicas de HorariosAsignados, así
+que su verificación se difiere al final del lote (SET CONSTRAINTS ... DEFERRED).
+"""
+from django.db import connection, transaction
+
+from apps.scheduling.models import HorariosAsignados
+from .conflict_validator import ConflictValidatorService, CAMPOS_CAMBIO
+from .timetable_grid import registrar_cambio_horario
+
+TIPOS_MOVIMIENTO = ('mover', 'intercambiar')
+# Campos que puede cambiar un "mover" y los que intercambian dos clases
+CAMPOS_MOVER = ('docente', 'espacio', 'dia_semana', 'bloque_horario')
+CAMPOS_INTERCAMBIO = ('espacio', 'dia_semana', 'bloque_horario')
+
+
+def _entero(movimiento, campo, i):
+    try:
+        return int(movimiento.get(campo))
+    except (TypeError, ValueError):
+        raise ValueError(f"Movimiento {i}: '{campo}' debe ser un número entero.")
+
+
+def cambios_de_movimientos(periodo, movimientos):
+    """
+    Traduce los movimientos a cambios con horario_id para ConflictValidatorService.cargar_cambios (uno por clase
+    afectada) y devuelve (cambios, movimiento de origen de cada cambio). Bloquea las filas afectadas hasta el final
+    de la transacción en curso. Lanza ValueError si un movimiento está mal formado o su horario no es del periodo.
+    """
+    if not isinstance(movimientos, (list, tuple)) or not movimientos:
+        raise ValueError("'movimientos' debe ser una lista no vacía de movimientos o intercambios.")
+    ids = []
+    for i, movimiento in enumerate(movimientos):
+        if not isinstance(movimiento, dict) or movimiento.get('tipo') not in TIPOS_MOVIMIENTO:
+            raise ValueError(f"Movimiento {i}: 'tipo' debe ser uno de: {', '.join(TIPOS_MOVIMIENTO)}.")
+        ids.append(_entero(movimiento, 'horario_id', i))
+        if movimiento['tipo'] == 'intercambiar':
+            ids.append(_entero(movimiento, 'con_horario_id', i))
+    if len(ids) != len(set(ids)):
+        raise ValueError("Cada horario puede aparecer en un solo movimiento.")
+    filas = HorariosAsignados.objects.select_for_update().filter(periodo=periodo).in_bulk(ids)
+
+    cambios, origen = [], []
+    for i, movimiento in enumerate(movimientos):
+        horario_id = int(movimiento['horario_id'])
+        if movimiento['tipo'] == 'mover':
+            if horario_id not in filas:
+                raise ValueError(f"Movimiento {i}: el horario {horario_id} no existe en el período.")
+            cambios.append({'horario_id': horario_id, **{campo: movimiento.get(campo) for campo in CAMPOS_MOVER}})
+            origen.append(i)
+            continue
+        pareja = (horario_id, int(movimiento['con_horario_id']))
+        for un_id in pareja:
+            if un_id not in filas:
+                raise ValueError(f"Movimiento {i}: el horario {un_id} no existe en el período.")
+        for propio, otro in (pareja, pareja[::-1]):
+            cambios.append({
+                'horario_id': propio,
+                **{campo: getattr(filas[otro], campo if campo == 'dia_semana' else f"{campo}_id") for campo in CAMPOS_INTERCAMBIO}
+            })
+            origen.append(i)
+    return cambios, origen
+
+
+def aplicar_movimientos(periodo, movimientos):
+    """
+    Valida los movimientos como un lote y, si ninguna clase tiene conflictos, los guarda en una transacción.
+    Devuelve (aplicado, resultados) con {"movimiento", "horario_id", "conflictos"} por clase afectada; si alguna
+    tiene conflictos no se guarda nada. Lanza ValueError si la entrada es inválida e IntegrityError si otra
+    petición ocupó un bloque de destino mientras tanto (la transacción se revierte entera).
+    """
+    with transaction.atomic():
+        cambios, origen = cambios_de_movimientos(periodo, movimientos)
+        validator = ConflictValidatorService(periodo=periodo)
+        propuestas = validator.cargar_cambios(cambios)
+        conflictos = validator.validar_propuestas(propuestas)
+        resultados = [
+            {"movimiento": origen[i], "horario_id": propuesta['horario_id'], "conflictos": conflictos_propuesta}
+            for i, (propuesta, conflictos_propuesta) in enumerate(zip(propuestas, conflictos))
+        ]
+        if any(conflictos):
+            return False, resultados
+        _guardar(propuestas)
+        registrar_cambio_horario(periodo.pk)
+    return True, resultados
+
+
+def _guardar(propuestas):
+    """Un UPDATE por lote con las restricciones únicas diferidas; se verifican antes de salir de la transacción."""
+    filas = [
+        HorariosAsignados(horario_id=propuesta['horario_id'], **{campo: propuesta[campo] for campo in CAMPOS_CAMBIO})
+        for propuesta in propuestas
+    ]
+    # Los motores sin restricciones diferibles no las crean (Django las omite), así que no hay nada que diferir
+    diferir = connection.features.supports_deferrable_unique_constraints
+    nombres = ', '.join(
+        connection.ops.quote_name(restriccion.name) for restriccion in HorariosAsignados._meta.constraints
+        if getattr(restriccion, 'deferrable', None) is not None
+    )
+    with connection.cursor() as cursor:
+        if diferir:
+            cursor.execute(f"SET CONSTRAINTS {nombres} DEFERRED")
+        HorariosAsignados.objects.bulk_update(filas, list(CAMPOS_CAMBIO))
+        if diferir:
+            # Verifica ahora: un cruce con otra transacción se informa aquí y no al confirmar
+            cursor.execute(f"SET CONSTRAINTS {nombres} IMMEDIATE")
@@ -1,58 +1,300 @@
-from apps.scheduling.models import HorariosAsignados
+from collections import defaultdict
+
+from django.db import models
+
+from apps.academic_setup.models import EspaciosFisicos
+from apps.users.models import Docentes
+from apps.scheduling.models import Grupos, HorariosAsignados, DisponibilidadDocentes, ConfiguracionRestricciones, BloquesHorariosDefinicion
+from .constraint_compiler import CompiledConstraints
+
+
+# Campos de HorariosAsignados que definen una asignación propuesta (ver cargar_cambios)
+CAMPOS_CAMBIO = ('grupo', 'docente', 'espacio', 'dia_semana', 'bloque_horario')
+
+
+def _indice_vacio():
+    # { "docentes": {docente_id: {(dia, bloque_id), ...}}, "espacios": {...}, "grupos": {...} }
+    return {"docentes": defaultdict(set), "espacios": defaultdict(set), "grupos": defaultdict(set)}
+
+
+def _entero(cambio, campo, i):
+    try:
+        return int(cambio.get(campo))
+    except (TypeError, ValueError):
+        raise ValueError(f"Cambio {i}: '{campo}' debe ser un número entero.")
+
 
 class ConflictValidatorService:
     def __init__(self, periodo):
         self.periodo = periodo
+        # Ocupación ya guardada en la BD para el periodo; se carga una sola vez (ver cargar_ocupacion)
+        self.ocupacion_periodo = None
         # Para validaciones dentro de una misma sesión de generación, sin golpear la BD constantemente
-        self.current_session_assignments = {
-            "docentes": set(), # (docente_id, dia, bloque_id)
-            "espacios": set(), # (espacio_id, dia, bloque_id)
-            "grupos": set()    # (grupo_id, dia, bloque_id)
-        }
+        self.current_session_assignments = _indice_vacio()
+        # Restricciones configuradas compiladas y slots bloqueados por ellas (espacios no utilizables)
+        self.restricciones = None
+        self.bloqueos = _indice_vacio()
+
+    def cargar_restricciones(self, restricciones=None):
+        """
+        Usa las restricciones compiladas (CompiledConstraints) o, si no se pasan, compila las activas
+        del periodo y las globales.
+        """
+        if restricciones is None:
+            restricciones = CompiledConstraints(
+                ConfiguracionRestricciones.objects.filter(
+                    models.Q(periodo_aplicable=self.periodo) | models.Q(periodo_aplicable__isnull=True),
+                    esta_activa=True
+                ),
+                BloquesHorariosDefinicion.objects.order_by('dia_semana', 'hora_inicio', 'bloque_def_id')
+            )
+        self.restricciones = restricciones
+        self.bloqueos = _indice_vacio()
+        for espacio_id, slots in restricciones.bloqueos_espacios().items():
+            self.bloqueos["espacios"][espacio_id] = slots
+
+    def indices_ocupacion(self):
+        """Índices con slots no utilizables: BD, bloqueos por restricciones y sesión actual."""
+        return [indice for indice in (self.ocupacion_periodo, self.bloqueos, self.current_session_assignments) if indice]
+
+    def cargar_ocupacion(self, asignaciones=None):
+        """
+        Carga en memoria la ocupación del periodo indexada por docente, espacio y grupo y luego por (dia, bloque).
+        Si se pasa `asignaciones` (iterable de tuplas (docente_id, espacio_id, grupo_id, dia_semana, bloque_id))
+        se usa en lugar de consultar la BD, p. ej. para partir de un horario vacío al regenerar el periodo.
+        """
+        if asignaciones is None:
+            asignaciones = HorariosAsignados.objects.filter(periodo=self.periodo).values_list(
+                'docente_id', 'espacio_id', 'grupo_id', 'dia_semana', 'bloque_horario_id'
+            )
+        self.ocupacion_periodo = _indice_vacio()
+        for docente_id, espacio_id, grupo_id, dia_semana, bloque_id in asignaciones:
+            self.ocupacion_periodo["docentes"][docente_id].add((dia_semana, bloque_id))
+            self.ocupacion_periodo["espacios"][espacio_id].add((dia_semana, bloque_id))
+            self.ocupacion_periodo["grupos"][grupo_id].add((dia_semana, bloque_id))
 
     def check_slot_conflict(self, docente_id, espacio_id, grupo_id, dia_semana, bloque_id):
         """Verifica si un slot propuesto tiene conflictos con asignaciones existentes o de la sesión actual."""
-        # Conflicto con asignaciones en la BD
-        if HorariosAsignados.objects.filter(
-                periodo=self.periodo, dia_semana=dia_semana, bloque_horario_id=bloque_id,
-                docente_id=docente_id
-        ).exists():
-            return {"type": "docente_conflict", "message": "Docente ya asignado en este bloque."}
+        if self.ocupacion_periodo is None:
+            self.cargar_ocupacion()
+        slot = (dia_semana, bloque_id)
 
-        if HorariosAsignados.objects.filter(
-                periodo=self.periodo, dia_semana=dia_semana, bloque_horario_id=bloque_id,
-                espacio_id=espacio_id
-        ).exists():
+        # Conflicto con asignaciones en la BD (índice cargado en memoria)
+        # Se usa .get() para no crear entradas vacías en los defaultdict en cada consulta
+        if slot in self.ocupacion_periodo["docentes"].get(docente_id, ()):
+            return {"type": "docente_conflict", "message": "Docente ya asignado en este bloque."}
+        if slot in self.ocupacion_periodo["espacios"].get(espacio_id, ()):
             return {"type": "espacio_conflict", "message": "Espacio ya asignado en este bloque."}
-
-        if HorariosAsignados.objects.filter(
-                periodo=self.periodo, dia_semana=dia_semana, bloque_horario_id=bloque_id,
-                grupo_id=grupo_id
-        ).exists():
+        if slot in self.ocupacion_periodo["grupos"].get(grupo_id, ()):
             return {"type": "grupo_conflict", "message": "Grupo ya tiene una clase en este bloque."}
+        if slot in self.bloqueos["espacios"].get(espacio_id, ()):
+            return {"type": "espacio_restriccion", "message": "Espacio no disponible en este bloque (restricción configurada)."}
 
         # Conflicto con asignaciones de la sesión actual de generación
-        if (docente_id, dia_semana, bloque_id) in self.current_session_assignments["docentes"]:
+        if slot in self.current_session_assignments["docentes"].get(docente_id, ()):
             return {"type": "docente_session_conflict", "message": "Docente ya asignado en este bloque (sesión actual)."}
-        if (espacio_id, dia_semana, bloque_id) in self.current_session_assignments["espacios"]:
+        if slot in self.current_session_assignments["espacios"].get(espacio_id, ()):
             return {"type": "espacio_session_conflict", "message": "Espacio ya asignado en este bloque (sesión actual)."}
-        if (grupo_id, dia_semana, bloque_id) in self.current_session_assignments["grupos"]:
+        if slot in self.current_session_assignments["grupos"].get(grupo_id, ()):
             return {"type": "grupo_session_conflict", "message": "Grupo ya asignado en este bloque (sesión actual)."}
 
         return None # Sin conflictos
 
     def mark_slot_used(self, docente_id, espacio_id, grupo_id, dia_semana, bloque_id):
         """Marca un slot como usado durante la sesión actual de generación."""
-        self.current_session_assignments["docentes"].add((docente_id, dia_semana, bloque_id))
-        self.current_session_assignments["espacios"].add((espacio_id, dia_semana, bloque_id))
-        self.current_session_assignments["grupos"].add((grupo_id, dia_semana, bloque_id))
-
-    def clear_session_assignments(self):
-        """Limpia las asignaciones de la sesión actual."""
-        self.current_session_assignments = {"docentes": set(), "espacios": set(), "grupos": set()}
-
-    # Podrías añadir más métodos para validar todas las restricciones de `ConfiguracionRestricciones`
-    def validate_all_constraints(self, horario_propuesto_data):
-        # horario_propuesto_data es un diccionario con info de la propuesta
-        # ...
-        pass
+        slot = (dia_semana, bloque_id)
+        self.current_session_assignments["docentes"][docente_id].add(slot)
+        self.current_session_assignments["espacios"][espacio_id].add(slot)
+        self.current_session_assignments["grupos"][grupo_id].add(slot)
+
+    def clear_session_assignments(self, recargar_ocupacion=True):
+        """Limpia las asignaciones de la sesión actual y, salvo que se indique lo contrario, fuerza a recargar la ocupación del periodo."""
+        self.current_session_assignments = _indice_vacio()
+        if recargar_ocupacion:
+            self.ocupacion_periodo = None
+
+    def validate_all_constraints(self, horario_propuesto_data, excluir_horario_id=None):
+        """
+        Valida una propuesta de horario contra la ocupación y las restricciones de `ConfiguracionRestricciones`.
+        horario_propuesto_data es un diccionario con 'grupo', 'docente', 'espacio', 'dia_semana' y 'bloque_horario'
+        (instancias, como en validated_data). Al editar una fila, `excluir_horario_id` es su id para que no choque
+        consigo misma. Devuelve la lista de conflictos encontrados (vacía si es válida).
+        """
+        return self.validar_propuestas([{**horario_propuesto_data, 'horario_id': excluir_horario_id}])[0]
+
+    def validar_propuestas(self, propuestas):
+        """
+        Valida juntas varias asignaciones propuestas (altas o ediciones) del periodo: cruces de docente, espacio y
+        grupo con el horario guardado y entre las propias propuestas, disponibilidad del docente, carga máxima
+        semanal (max_horas_semanales), capacidad y tipo del espacio y restricciones configuradas.
+
+        Cada propuesta es un dict como el de validate_all_constraints; si trae 'horario_id' edita esa fila, que
+        deja de contar como ocupación. Las filas guardadas que pueden chocar y la disponibilidad de los docentes
+        se leen en una sola consulta (ver _ocupacion_relacionada); la primera validación de cada validador hace
+        además las 2 de cargar_restricciones (bloques y restricciones), así que son 3 consultas la primera vez y 1
+        las siguientes, sea cual sea el tamaño del lote. Devuelve una lista de conflictos por propuesta.
+        """
+        if not propuestas:
+            return []
+        if self.restricciones is None:
+            self.cargar_restricciones()
+        editadas = {p['horario_id'] for p in propuestas if p.get('horario_id') is not None}
+        ocupacion, carga, disponibilidad, editadas_por_docente = self._ocupacion_relacionada(propuestas, editadas)
+
+        # Ocupación de las propias propuestas, para detectar cruces entre ellas
+        del_lote = {"docentes": defaultdict(list), "espacios": defaultdict(list), "grupos": defaultdict(list)}
+        horas_lote = defaultdict(int)
+        for i, propuesta in enumerate(propuestas):
+            slot = (propuesta['dia_semana'], propuesta['bloque_horario'].bloque_def_id)
+            del_lote["docentes"][(propuesta['docente'].docente_id, slot)].append(i)
+            del_lote["espacios"][(propuesta['espacio'].espacio_id, slot)].append(i)
+            del_lote["grupos"][(propuesta['grupo'].grupo_id, slot)].append(i)
+            horas_lote[propuesta['docente'].docente_id] += 1
+
+        resultado = []
+        for i, propuesta in enumerate(propuestas):
+            grupo, docente, espacio = propuesta['grupo'], propuesta['docente'], propuesta['espacio']
+            dia_semana = propuesta['dia_semana']
+            bloque = propuesta['bloque_horario']
+            slot = (dia_semana, bloque.bloque_def_id)
+            conflictos = []
+
+            if grupo.periodo_id != self.periodo.pk:
+                conflictos.append({"type": "grupo_periodo", "message": "El grupo no pertenece al período del horario."})
+            if bloque.dia_semana is not None and bloque.dia_semana != dia_semana:
+                conflictos.append({"type": "bloque_dia", "message": "El bloque horario corresponde a otro día de la semana."})
+
+            # Cruces (RD01, RD02) con el horario guardado y con las demás propuestas
+            for tipo, entidad_id, nombre in (
+                ("docentes", docente.docente_id, "Docente"), ("espacios", espacio.espacio_id, "Espacio"),
+                ("grupos", grupo.grupo_id, "Grupo"),
+            ):
+                prefijo = tipo[:-1]
+                horario_id = ocupacion[tipo].get((entidad_id, slot))
+                if horario_id is not None:
+                    conflictos.append({
+                        "type": f"{prefijo}_conflict", "message": f"{nombre} ya asignado en este bloque.", "horario_id": horario_id
+                    })
+                otras = [j for j in del_lote[tipo][(entidad_id, slot)] if j != i]
+                if otras:
+                    conflictos.append({
+                        "type": f"{prefijo}_lote_conflict", "message": f"{nombre} asignado en este bloque por otra propuesta del lote.",
+                        "propuestas": otras
+                    })
+            if not self.restricciones.permite_espacio(espacio.espacio_id, dia_semana, bloque.bloque_def_id):
+                conflictos.append({"type": "espacio_restriccion", "message": "Espacio no disponible en este bloque (restricción configurada)."})
+
+            # Docente: disponibilidad en el periodo, restricciones y carga semanal (RD23, RG02)
+            if (docente.docente_id, dia_semana, bloque.bloque_def_id) not in disponibilidad:
+                conflictos.append({"type": "docente_disponibilidad", "message": "El docente no registró disponibilidad en este bloque."})
+            if not self.restricciones.permite_clase(docente.docente_id, grupo.materia_id, grupo.carrera_id, dia_semana, bloque.bloque_def_id):
+                conflictos.append({"type": "docente_restriccion", "message": "El bloque no está permitido para el docente, la materia o la carrera (restricción configurada)."})
+            # Solo se informa si el cambio le suma horas al docente (editar otra cosa de una fila no lo bloquea)
+            horas = carga[docente.docente_id] + horas_lote[docente.docente_id]
+            suma_horas = horas_lote[docente.docente_id] > editadas_por_docente[docente.docente_id]
+            if docente.max_horas_semanales is not None and horas > docente.max_horas_semanales and suma_horas:
+                conflictos.append({
+                    "type": "docente_carga",
+                    "message": f"El docente quedaría con {horas} horas semanales (máximo {docente.max_horas_semanales}).",
+                    "horas": horas, "max_horas_semanales": docente.max_horas_semanales
+                })
+
+            # Espacio: tipo requerido por la materia (RU08) y capacidad
+            tipo_requerido = self.restricciones.tipo_espacio_requerido(grupo.materia)
+            if tipo_requerido is not None and espacio.tipo_espacio_id != tipo_requerido:
+                conflictos.append({"type": "espacio_tipo", "message": "El espacio no es del tipo requerido por la materia."})
+            estudiantes = grupo.numero_estudiantes_estimado or 0
+            if espacio.capacidad is not None and espacio.capacidad < estudiantes:
+                conflictos.append({
+                    "type": "espacio_capacidad",
+                    "message": f"El espacio tiene capacidad para {espacio.capacidad} y el grupo tiene {estudiantes} estudiantes."
+                })
+            resultado.append(conflictos)
+        return resultado
+
+    def cargar_cambios(self, cambios):
+        """
+        Convierte una lista de cambios con ids ({"horario_id"?, "grupo", "docente", "espacio", "dia_semana",
+        "bloque_horario"}) en propuestas para validar_propuestas. Un cambio con horario_id edita esa fila del
+        periodo y los campos que omite conservan su valor actual. Lanza ValueError si algún cambio está mal
+        formado o referencia registros que no existen.
+        """
+        if not isinstance(cambios, (list, tuple)) or not cambios:
+            raise ValueError("'cambios' debe ser una lista no vacía de asignaciones propuestas.")
+        for i, cambio in enumerate(cambios):
+            if not isinstance(cambio, dict):
+                raise ValueError(f"Cambio {i}: debe ser un objeto con los campos del horario.")
+        editadas = [_entero(cambio, 'horario_id', i) for i, cambio in enumerate(cambios) if cambio.get('horario_id') is not None]
+        if len(editadas) != len(set(editadas)):
+            raise ValueError("Cada horario_id puede aparecer en un solo cambio.")
+        existentes = HorariosAsignados.objects.filter(periodo=self.periodo).in_bulk(editadas)
+
+        filas = []
+        for i, cambio in enumerate(cambios):
+            horario_id = _entero(cambio, 'horario_id', i) if cambio.get('horario_id') is not None else None
+            actual = existentes.get(horario_id)
+            if horario_id is not None and actual is None:
+                raise ValueError(f"Cambio {i}: el horario {horario_id} no existe en el período.")
+            fila = {'horario_id': horario_id}
+            for campo in CAMPOS_CAMBIO:
+                if cambio.get(campo) is None and actual is not None:
+                    fila[campo] = getattr(actual, campo if campo == 'dia_semana' else f"{campo}_id")
+                else:
+                    fila[campo] = _entero(cambio, campo, i)
+            filas.append(fila)
+
+        instancias = {
+            'grupo': Grupos.objects.select_related('materia', 'carrera').in_bulk({f['grupo'] for f in filas}),
+            'docente': Docentes.objects.in_bulk({f['docente'] for f in filas}),
+            'espacio': EspaciosFisicos.objects.in_bulk({f['espacio'] for f in filas}),
+            'bloque_horario': BloquesHorariosDefinicion.objects.in_bulk({f['bloque_horario'] for f in filas}),
+        }
+        for i, fila in enumerate(filas):
+            for campo, por_id in instancias.items():
+                if fila[campo] not in por_id:
+                    raise ValueError(f"Cambio {i}: {campo} {fila[campo]} no existe.")
+                fila[campo] = por_id[fila[campo]]
+        return filas
+
+    def _ocupacion_relacionada(self, propuestas, editadas):
+        """
+        Una consulta (UNION ALL) con las filas del periodo de los docentes, espacios y grupos de las propuestas y
+        la disponibilidad de esos docentes; ambas partes usan los índices únicos que empiezan por docente, espacio
+        o grupo. Las restricciones y los bloques no se leen aquí: validar_propuestas reutiliza los ya compilados. Las filas que se editan no cuentan como ocupación ni como carga.
+        Devuelve la ocupación por (entidad, slot) -> horario_id, las horas ya asignadas a cada docente, el conjunto
+        de (docente_id, dia_semana, bloque_id) disponibles y cuántas de las filas editadas tenía cada docente.
+        """
+        docentes = {p['docente'].docente_id for p in propuestas}
+        filas = HorariosAsignados.objects.filter(
+            models.Q(docente__in=docentes)
+            | models.Q(espacio__in={p['espacio'].espacio_id for p in propuestas})
+            | models.Q(grupo__in={p['grupo'].grupo_id for p in propuestas}),
+            periodo=self.periodo
+        ).annotate(
+            origen=models.Value('H', output_field=models.CharField())
+        ).values_list('origen', 'horario_id', 'docente_id', 'espacio_id', 'grupo_id', 'dia_semana', 'bloque_horario_id')
+        disponibles = DisponibilidadDocentes.objects.filter(
+            docente__in=docentes, periodo=self.periodo, esta_disponible=True
+        ).annotate(
+            origen=models.Value('D', output_field=models.CharField()),
+            nulo=models.Value(None, output_field=models.IntegerField())
+        ).values_list('origen', 'disponibilidad_id', 'docente_id', 'nulo', 'nulo', 'dia_semana', 'bloque_horario_id')
+
+        ocupacion = {"docentes": {}, "espacios": {}, "grupos": {}}
+        carga = defaultdict(int)
+        disponibilidad = set()
+        editadas_por_docente = defaultdict(int)
+        for origen, fila_id, docente_id, espacio_id, grupo_id, dia_semana, bloque_id in filas.union(disponibles, all=True):
+            if origen == 'D':
+                disponibilidad.add((docente_id, dia_semana, bloque_id))
+                continue
+            if fila_id in editadas:
+                editadas_por_docente[docente_id] += 1
+                continue
+            slot = (dia_semana, bloque_id)
+            ocupacion["docentes"][(docente_id, slot)] = fila_id
+            ocupacion["espacios"][(espacio_id, slot)] = fila_id
+            ocupacion["grupos"][(grupo_id, slot)] = fila_id
+            if docente_id in docentes:
+                carga[docente_id] += 1
+        return ocupacion, carga, disponibilidad, editadas_por_docente
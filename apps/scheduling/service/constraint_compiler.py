@@ -0,0 +1,176 @@
+"""
+Compilación de ConfiguracionRestricciones a tablas indexadas por entidad.
+
+`valor_parametro` es una lista de reglas "CLAVE=valores" separadas por ';', por ejemplo "NO_DIAS=6,7;NO_TURNOS=N".
+
+Reglas de bloques (máscaras de bits sobre los slots (dia_semana, bloque) de la generación):
+    NO_BLOQUES / SOLO_BLOQUES   ids de BloquesHorariosDefinicion
+    NO_DIAS / SOLO_DIAS         días de la semana (1=Lunes ... 7=Domingo)
+    NO_TURNOS / SOLO_TURNOS     turnos (M, T, N)
+Reglas de espacio:
+    TIPO_ESPACIO                id de TiposEspacio requerido (solo MATERIA)
+
+Según tipo_aplicacion, las reglas de bloques se aplican a:
+    GLOBAL, PERIODO   todas las clases
+    DOCENTE           al docente entidad_id_1 (solo cuando dicta la materia entidad_id_2, si se indica)
+    MATERIA           a la materia entidad_id_1
+    CARRERA           a los grupos de la carrera entidad_id_1
+    AULA              al espacio entidad_id_1 (bloques en los que el espacio no se puede usar)
+"""
+
+CLAVES_BLOQUES = ('BLOQUES', 'DIAS', 'TURNOS')
+TURNOS_VALIDOS = ('M', 'T', 'N')
+TIPOS_CON_ENTIDAD = ('DOCENTE', 'MATERIA', 'CARRERA', 'AULA')
+
+
+def parsear_valor_parametro(tipo_aplicacion, valor_parametro):
+    """
+    Convierte valor_parametro en una lista de reglas (clave, valores) o lanza ValueError con el motivo.
+    Las claves de bloques se devuelven como ('NO' | 'SOLO', 'BLOQUES' | 'DIAS' | 'TURNOS') y los valores como set.
+    """
+    reglas = []
+    for parte in (valor_parametro or '').split(';'):
+        parte = parte.strip()
+        if not parte:
+            continue
+        clave, separador, valores = parte.partition('=')
+        clave = clave.strip().upper()
+        valores = [v.strip() for v in valores.split(',') if v.strip()]
+        if not separador or not valores:
+            raise ValueError(f"Regla '{parte}' sin valores; use el formato CLAVE=valor1,valor2.")
+
+        if clave == 'TIPO_ESPACIO':
+            if tipo_aplicacion != 'MATERIA':
+                raise ValueError("TIPO_ESPACIO solo se puede usar en restricciones de tipo MATERIA.")
+            if len(valores) != 1 or not valores[0].isdigit():
+                raise ValueError("TIPO_ESPACIO debe ser un único id de tipo de espacio.")
+            reglas.append(('TIPO_ESPACIO', int(valores[0])))
+            continue
+
+        modo, _, objetivo = clave.partition('_')
+        if modo not in ('NO', 'SOLO') or objetivo not in CLAVES_BLOQUES:
+            raise ValueError(f"Clave de restricción desconocida: {clave}.")
+        if objetivo == 'TURNOS':
+            valores = [v.upper() for v in valores]
+            if any(v not in TURNOS_VALIDOS for v in valores):
+                raise ValueError(f"Turnos válidos: {', '.join(TURNOS_VALIDOS)}.")
+            reglas.append(((modo, objetivo), set(valores)))
+        else:
+            if not all(v.isdigit() for v in valores):
+                raise ValueError(f"{clave} debe ser una lista de números.")
+            reglas.append(((modo, objetivo), {int(v) for v in valores}))
+    if not reglas:
+        raise ValueError("La restricción no tiene reglas.")
+    return reglas
+
+
+def validar_restriccion(tipo_aplicacion, entidad_id_1, valor_parametro):
+    """Valida una restricción antes de guardarla; lanza ValueError si no se puede compilar."""
+    if tipo_aplicacion in TIPOS_CON_ENTIDAD and entidad_id_1 is None:
+        raise ValueError(f"Las restricciones de tipo {tipo_aplicacion} requieren entidad_id_1.")
+    parsear_valor_parametro(tipo_aplicacion, valor_parametro)
+
+
+class CompiledConstraints:
+    """
+    Tablas de restricciones indexadas por entidad. Las reglas de bloques se guardan como máscaras de bits de
+    slots prohibidos (bit j = j-ésimo bloque de `bloques`), así que evaluar un candidato cuesta unas pocas
+    búsquedas en diccionarios y un AND de bits, sin recorrer las reglas.
+    """
+
+    def __init__(self, restricciones, bloques):
+        self.indice_slot = {(b.dia_semana, b.bloque_def_id): j for j, b in enumerate(bloques)}
+        self.todos = (1 << len(bloques)) - 1
+        self.prohibidos_global = 0
+        self.prohibidos_docente = {}          # { docente_id: máscara }
+        self.prohibidos_docente_materia = {}  # { (docente_id, materia_id): máscara }
+        self.prohibidos_materia = {}          # { materia_id: máscara }
+        self.prohibidos_carrera = {}          # { carrera_id: máscara }
+        self.prohibidos_espacio = {}          # { espacio_id: máscara }
+        self.tipo_espacio_materia = {}        # { materia_id: tipo_espacio_id }
+        self.errores = []                     # [(codigo_restriccion, motivo)] de las filas que no se pudieron compilar
+        self._combinadas = {}
+
+        self._bits = {}
+        for j, bloque in enumerate(bloques):
+            bit = 1 << j
+            for objetivo, valor in (('BLOQUES', bloque.bloque_def_id), ('DIAS', bloque.dia_semana), ('TURNOS', bloque.turno)):
+                self._bits[(objetivo, valor)] = self._bits.get((objetivo, valor), 0) | bit
+
+        for restriccion in restricciones:
+            try:
+                self._compilar(restriccion)
+            except ValueError as e:
+                self.errores.append((restriccion.codigo_restriccion, str(e)))
+
+    def _mascara(self, objetivo, valores):
+        mascara = 0
+        for valor in valores:
+            mascara |= self._bits.get((objetivo, valor), 0)
+        return mascara
+
+    def _compilar(self, restriccion):
+        tipo = restriccion.tipo_aplicacion
+        validar_restriccion(tipo, restriccion.entidad_id_1, restriccion.valor_parametro)
+        prohibidos = 0
+        for clave, valores in parsear_valor_parametro(tipo, restriccion.valor_parametro):
+            if clave == 'TIPO_ESPACIO':
+                self.tipo_espacio_materia[restriccion.entidad_id_1] = valores
+                continue
+            modo, objetivo = clave
+            mascara = self._mascara(objetivo, valores)
+            prohibidos |= mascara if modo == 'NO' else self.todos & ~mascara
+        if not prohibidos:
+            return
+
+        if tipo in ('GLOBAL', 'PERIODO'):
+            self.prohibidos_global |= prohibidos
+            return
+        if tipo == 'DOCENTE' and restriccion.entidad_id_2 is not None:
+            tabla, clave = self.prohibidos_docente_materia, (restriccion.entidad_id_1, restriccion.entidad_id_2)
+        else:
+            tabla = {
+                'DOCENTE': self.prohibidos_docente, 'MATERIA': self.prohibidos_materia,
+                'CARRERA': self.prohibidos_carrera, 'AULA': self.prohibidos_espacio,
+            }[tipo]
+            clave = restriccion.entidad_id_1
+        tabla[clave] = tabla.get(clave, 0) | prohibidos
+
+    def prohibidos_clase(self, docente_id, materia_id, carrera_id):
+        """Máscara de slots prohibidos para que el docente dicte la materia a un grupo de la carrera."""
+        clave = (docente_id, materia_id, carrera_id)
+        mascara = self._combinadas.get(clave)
+        if mascara is None:
+            mascara = (
+                self.prohibidos_global
+                | self.prohibidos_docente.get(docente_id, 0)
+                | self.prohibidos_docente_materia.get((docente_id, materia_id), 0)
+                | self.prohibidos_materia.get(materia_id, 0)
+                | self.prohibidos_carrera.get(carrera_id, 0)
+            )
+            self._combinadas[clave] = mascara
+        return mascara
+
+    def permite_clase(self, docente_id, materia_id, carrera_id, dia_semana, bloque_id):
+        j = self.indice_slot.get((dia_semana, bloque_id))
+        if j is None:
+            return False
+        return not (self.prohibidos_clase(docente_id, materia_id, carrera_id) >> j) & 1
+
+    def permite_espacio(self, espacio_id, dia_semana, bloque_id):
+        j = self.indice_slot.get((dia_semana, bloque_id))
+        if j is None:
+            return False
+        return not (self.prohibidos_espacio.get(espacio_id, 0) >> j) & 1
+
+    def tipo_espacio_requerido(self, materia):
+        """Tipo de espacio que exige la materia: el configurado como restricción o el de Materias (RU08)."""
+        return self.tipo_espacio_materia.get(materia.materia_id, materia.requiere_tipo_espacio_especifico_id)
+
+    def bloqueos_espacios(self):
+        """Slots (dia_semana, bloque_id) en los que cada espacio no se puede usar: { espacio_id: {slot, ...} }."""
+        slots = list(self.indice_slot)
+        return {
+            espacio_id: {slots[j] for j in range(len(slots)) if (mascara >> j) & 1}
+            for espacio_id, mascara in self.prohibidos_espacio.items()
+        }
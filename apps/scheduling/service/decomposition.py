@@ -0,0 +1,186 @@
+import heapq
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Generador y grupos de cada proceso hijo, reconstruidos por _iniciar_proceso (no se vuelve a consultar la BD),
+# y los docentes y espacios completos, que cada partición puede restringir
+_GENERADOR_EN_CURSO = None
+_GRUPOS_EN_CURSO = None
+_RECURSOS_COMPLETOS = None
+
+
+def componentes_independientes(elementos, recursos_de):
+    """
+    Agrupa los índices de `elementos` en componentes conexas del grafo de recursos compartidos:
+    dos elementos quedan juntos si comparten, directa o indirectamente, algún recurso de `recursos_de(elemento)`.
+    Cada componente conserva el orden original de los elementos.
+    """
+    padre = list(range(len(elementos)))
+
+    def raiz(i):
+        while padre[i] != i:
+            padre[i] = padre[padre[i]]
+            i = padre[i]
+        return i
+
+    duenos = {} # { recurso: índice del primer elemento que lo usa }
+    for i, elemento in enumerate(elementos):
+        for recurso in recursos_de(elemento):
+            j = duenos.setdefault(recurso, i)
+            if j != i:
+                padre[raiz(i)] = raiz(j)
+
+    componentes = defaultdict(list)
+    for i in range(len(elementos)):
+        componentes[raiz(i)].append(i)
+    return list(componentes.values())
+
+
+def repartir_componentes(componentes, n_particiones):
+    """Reparte las componentes en a lo sumo n particiones equilibradas (la más grande va a la partición más liviana)."""
+    n_particiones = min(n_particiones, len(componentes))
+    if n_particiones <= 0:
+        return []
+    cargas = [(0, k) for k in range(n_particiones)]
+    particiones = [[] for _ in range(n_particiones)]
+    for componente in sorted(componentes, key=len, reverse=True):
+        carga, k = heapq.heappop(cargas)
+        particiones[k].extend(componente)
+        heapq.heappush(cargas, (carga + len(componente), k))
+    return [sorted(particion) for particion in particiones if particion]
+
+
+def repartir_recursos(demanda, propia, clase_de, n_particiones):
+    """
+    Asigna cada recurso a una sola partición. `demanda[recurso]` dice cuántos grupos de cada partición lo tienen
+    como candidato y `propia(recurso)` es la partición de su unidad académica (o None). El recurso queda en su
+    partición propia si esta lo necesita; si no, en la que más lo necesita en proporción a los recursos de su misma
+    clase (`clase_de`, p. ej. el tipo de espacio) que ya tiene. Devuelve un conjunto de recursos por partición.
+    """
+    asignados = [set() for _ in range(n_particiones)]
+    por_clase = defaultdict(lambda: [0] * n_particiones)
+    compartidos = []
+    # Primero los de partición propia: el reparto de los compartidos compensa lo que ya tiene cada partición
+    for recurso in sorted(demanda):
+        k = propia(recurso)
+        if k is not None and demanda[recurso][k]:
+            asignados[k].add(recurso)
+            por_clase[clase_de(recurso)][k] += 1
+        else:
+            compartidos.append(recurso)
+    for recurso in compartidos:
+        cuenta = por_clase[clase_de(recurso)]
+        k = max(range(n_particiones), key=lambda k: (demanda[recurso][k] / (1 + cuenta[k]), -k))
+        asignados[k].add(recurso)
+        cuenta[k] += 1
+    return asignados
+
+
+def _problema(generador, grupos):
+    """
+    Lo que necesita un proceso hijo para reconstruir el generador sin la BD: el snapshot de los datos cargados
+    (con el escenario ya aplicado, si lo hay), los parámetros de la búsqueda y el límite de tiempo.
+    """
+    from .snapshot import construir_snapshot # snapshot importa schedule_generator, que importa este módulo
+    return {
+        "snapshot": construir_snapshot(generador, grupos),
+        "parametros": {
+            "motor": generador.motor, "semilla": generador.semilla,
+            "time_budget_seconds": generador.time_budget_seconds,
+            "max_bloques_por_sesion": generador.max_bloques_por_sesion,
+        },
+        # perf_counter es un reloj monótono del sistema: el mismo límite vale en todos los procesos
+        "fin_presupuesto": generador.fin_presupuesto,
+    }
+
+
+def _iniciar_proceso(problema):
+    """
+    Inicializador de cada proceso hijo (spawn): arranca Django, reconstruye el generador desde el snapshot y lo
+    deja como lo deja _generar() antes de buscar (ocupación vacía). El motor se prepara en cada tarea, porque cada
+    partición o arranque parte de sus propios recursos y asignaciones. No consulta la BD.
+    """
+    global _GENERADOR_EN_CURSO, _GRUPOS_EN_CURSO, _RECURSOS_COMPLETOS
+    import django
+    django.setup()
+    from .snapshot import SnapshotGeneratorService
+
+    generador = SnapshotGeneratorService(problema["snapshot"], **problema["parametros"])
+    generador.generation_stats = {
+        "asignaciones_exitosas": 0, "intentos_fallidos": 0, "grupos_programados": 0, "grupos_no_programados": 0
+    }
+    generador._get_data_needed()
+    generador.fin_presupuesto = problema["fin_presupuesto"]
+    generador.validator.clear_session_assignments()
+    generador.validator.cargar_ocupacion(asignaciones=())
+    _GENERADOR_EN_CURSO, _GRUPOS_EN_CURSO = generador, list(generador.grupos_a_programar)
+    _RECURSOS_COMPLETOS = (list(generador.docentes_disponibles), list(generador.espacios_disponibles))
+
+
+def _pool(generador, grupos, procesos):
+    """
+    Procesos hijos con spawn y no con fork: el worker de generation_jobs tiene además su hilo de latido, y hacer
+    fork de un proceso con varios hilos copia bloqueados los locks que otros hilos tengan tomados
+    (logging, driver de la BD). Los hijos arrancan un intérprete nuevo y reciben el problema serializado.
+    """
+    return ProcessPoolExecutor(
+        max_workers=procesos, mp_context=multiprocessing.get_context('spawn'),
+        initializer=_iniciar_proceso, initargs=(_problema(generador, grupos),)
+    )
+
+
+def _resolver_particion(indices, docente_ids, espacio_ids):
+    """
+    Se ejecuta en el proceso hijo: corre la búsqueda sobre su partición, solo con los docentes y espacios indicados
+    (None: todos), y devuelve solo lo nuevo. Un mismo proceso puede recibir varias particiones: las asignaciones de
+    las anteriores siguen marcadas en el validador, pero usan otros recursos y otros grupos.
+    """
+    generador = _GENERADOR_EN_CURSO
+    docentes, espacios = _RECURSOS_COMPLETOS
+    generador.docentes_disponibles = docentes if docente_ids is None else [d for d in docentes if d.docente_id in docente_ids]
+    generador.docentes_por_id = {d.docente_id: d for d in generador.docentes_disponibles}
+    generador._candidatos_por_materia = {}
+    generador.espacios_disponibles = espacios if espacio_ids is None else [e for e in espacios if e.espacio_id in espacio_ids]
+    generador._indexar_espacios()
+    stats_previas = dict(generador.generation_stats)
+    generador.asignaciones = []
+    generador.unresolved_conflicts = []
+    generador.diagnosticos = []
+    # Motor y diagnóstico nuevos: el diagnóstico lleva la cuenta de las asignaciones ya leídas de la partición anterior
+    generador._preparar_motor()
+    generador._programar_grupos([_GRUPOS_EN_CURSO[i] for i in indices])
+    stats = {
+        clave: valor - stats_previas.get(clave, 0)
+        for clave, valor in generador.generation_stats.items() if isinstance(valor, int)
+    }
+    return generador.asignaciones, stats, generador.unresolved_conflicts, generador.diagnosticos
+
+
+def _resolver_arranque(semilla):
+    """Se ejecuta en el proceso hijo: una búsqueda completa del multi-arranque con la semilla indicada."""
+    generador = _GENERADOR_EN_CURSO
+    return (semilla, *generador._ejecutar_arranque(_GRUPOS_EN_CURSO, semilla))
+
+
+def resolver_arranques_en_procesos(generador, grupos, semillas, procesos):
+    """
+    Corre un arranque por semilla en a lo sumo `procesos` procesos hijos y va devolviendo
+    (semilla, asignaciones, stats, conflictos, diagnosticos, puntaje) a medida que terminan. Todos los hijos usan el
+    mismo límite de tiempo (generador.fin_presupuesto).
+    """
+    with _pool(generador, grupos, min(procesos, len(semillas))) as pool:
+        futuros = [pool.submit(_resolver_arranque, semilla) for semilla in semillas]
+        for futuro in as_completed(futuros):
+            yield futuro.result()
+
+
+def resolver_en_procesos(generador, grupos, particiones):
+    """
+    Resuelve cada partición (índices de `grupos`, docente_ids, espacio_ids) en un proceso hijo y va devolviendo
+    (k, (asignaciones, stats, conflictos, diagnosticos)) a medida que terminan, con k el número de la partición.
+    """
+    with _pool(generador, grupos, len(particiones)) as pool:
+        futuros = {pool.submit(_resolver_particion, *particion): k for k, particion in enumerate(particiones)}
+        for futuro in as_completed(futuros):
+            yield futuros[futuro], futuro.result()
@@ -0,0 +1,201 @@
+from collections import Counter, defaultdict
+
+# Grupos ocupantes que se nombran en el diagnóstico "bloques_ocupados" (los que más bloques factibles toman)
+MAX_OCUPANTES_INFORMADOS = 10
+
+MOTIVOS = {
+    "sin_docente_especialidad": "Ningún docente tiene las especialidades requeridas por la materia.",
+    "sin_espacio_apto": "No hay espacios del tipo y la capacidad que necesita el grupo.",
+    "sin_disponibilidad_docente": "Los docentes habilitados no tienen disponibilidad en bloques permitidos por las restricciones.",
+    "bloques_ocupados": "Todos los bloques factibles para el grupo ya están ocupados.",
+    "sin_tramo_contiguo": "Quedan bloques factibles libres, pero no suficientes bloques consecutivos para la sesión.",
+    "busqueda_incompleta": "Quedan bloques factibles libres; la búsqueda no logró completar el grupo.",
+    "presupuesto_agotado": "Se agotó el presupuesto de tiempo antes de programar el grupo.",
+}
+
+
+class DiagnosticoInviabilidad:
+    """
+    Explica por qué no se pudo programar un grupo a partir de los índices que la generación ya tiene en memoria
+    (candidatos por especialidad, espacios aptos, disponibilidad, restricciones compiladas y la ocupación del
+    validador). No repite la búsqueda: los bloques factibles de cada docente candidato son una máscara de bits
+    (disponibilidad AND NOT prohibidos) que se cruza con la ocupación del grupo, del docente y de los espacios
+    aptos; solo los bloques que quedan bloqueados se recorren para nombrar a sus ocupantes. Solo se calcula
+    para los grupos que fallan.
+
+    La ocupación de la sesión se lee de generador.asignaciones, que solo crece durante la búsqueda, así que el
+    índice inverso (recurso, slot) -> grupo se completa de forma incremental entre diagnósticos.
+    """
+
+    def __init__(self, generador, asignaciones_previas=()):
+        self.generador = generador
+        self._disponible = None     # { docente_id: máscara de slots disponibles }
+        self._slot_por_bit = None   # [(dia_semana, bloque_id), ...] en el orden de CompiledConstraints.indice_slot
+        self._ocupantes = {}        # { ("docentes" | "espacios", entidad_id, slot): grupo_id }
+        self._sesiones_grupo = Counter()
+        self._leidas = 0
+        self._codigos = None
+        for docente_id, espacio_id, grupo_id, dia_semana, bloque_id in asignaciones_previas:
+            self._registrar_ocupante(grupo_id, docente_id, espacio_id, (dia_semana, bloque_id))
+
+    def _registrar_ocupante(self, grupo_id, docente_id, espacio_id, slot):
+        self._ocupantes[("docentes", docente_id, slot)] = grupo_id
+        self._ocupantes[("espacios", espacio_id, slot)] = grupo_id
+        self._sesiones_grupo[grupo_id] += 1
+
+    def _actualizar_ocupantes(self):
+        asignaciones = self.generador.asignaciones
+        for grupo_id, docente_id, espacio_id, dia_semana, bloque_id in asignaciones[self._leidas:]:
+            self._registrar_ocupante(grupo_id, docente_id, espacio_id, (dia_semana, bloque_id))
+        self._leidas = len(asignaciones)
+
+    def _mascara_disponible(self, docente_id):
+        """Bloques en que el docente está disponible, como máscara sobre el índice de slots de CompiledConstraints."""
+        if self._disponible is None:
+            indice_slot = self.generador.restricciones.indice_slot
+            self._disponible = defaultdict(int)
+            for (d_id, dia_semana, bloque_id) in self.generador.docente_disponibilidad_map:
+                j = indice_slot.get((dia_semana, bloque_id))
+                if j is not None:
+                    self._disponible[d_id] |= 1 << j
+        return self._disponible.get(docente_id, 0)
+
+    def _mascara_ocupada(self, tipo, entidad_id):
+        """Slots ocupados por la entidad en cualquiera de los índices del validador (BD, bloqueos y sesión)."""
+        indice_slot = self.generador.restricciones.indice_slot
+        mascara = 0
+        for indice in self.generador.validator.indices_ocupacion():
+            for slot in indice[tipo].get(entidad_id, ()):
+                j = indice_slot.get(slot)
+                if j is not None:
+                    mascara |= 1 << j
+        return mascara
+
+    def _slots(self, mascara):
+        if self._slot_por_bit is None:
+            self._slot_por_bit = list(self.generador.restricciones.indice_slot)
+        slots = self._slot_por_bit
+        while mascara:
+            bit = mascara & -mascara
+            mascara ^= bit
+            yield slots[bit.bit_length() - 1]
+
+    def diagnosticar(self, grupo, motivo=None, bloques_tramo=1):
+        """
+        Dict con el motivo por el que el grupo quedó incompleto y su detalle. Si se indica `motivo`
+        (p. ej. presupuesto_agotado) no se analiza nada más.
+        """
+        gen = self.generador
+        materia = grupo.materia
+        self._actualizar_ocupantes()
+        detalle = {}
+        if motivo is None:
+            motivo, detalle = self._analizar(grupo, materia, bloques_tramo)
+        requeridas = gen._sesiones_requeridas(grupo)
+        asignadas = self._sesiones_grupo.get(grupo.grupo_id, 0)
+        if gen.sesiones_pendientes:
+            # Regeneración incremental: las requeridas son solo las que faltaban
+            asignadas -= int(materia.horas_totales) - requeridas
+        return {
+            "grupo_id": grupo.grupo_id,
+            "codigo_grupo": grupo.codigo_grupo,
+            "materia_id": materia.materia_id,
+            "materia": materia.nombre_materia,
+            "sesiones_requeridas": requeridas,
+            "sesiones_asignadas": max(asignadas, 0),
+            "motivo": motivo,
+            "mensaje": MOTIVOS[motivo],
+            "detalle": detalle,
+        }
+
+    def _analizar(self, grupo, materia, bloques_tramo):
+        gen = self.generador
+        # 1. Docentes con la especialidad requerida (o el pre-asignado)
+        docentes = gen._docentes_candidatos(grupo)
+        if not docentes:
+            return "sin_docente_especialidad", {
+                "especialidades_requeridas": sorted(gen.especialidades_por_materia.get(materia.materia_id, ())),
+            }
+
+        # 2. Espacios del tipo requerido con capacidad suficiente
+        espacios = gen._espacios_candidatos(grupo, materia)
+        if not espacios:
+            tipo_requerido = gen.restricciones.tipo_espacio_requerido(materia)
+            capacidades, del_tipo = gen.espacios_por_tipo.get(tipo_requerido, ((), ()))
+            return "sin_espacio_apto", {
+                "tipo_espacio_requerido": tipo_requerido,
+                "capacidad_requerida": grupo.numero_estudiantes_estimado or 0,
+                "espacios_del_tipo": len(del_tipo),
+                # Sin candidatos, ningún espacio del tipo tiene capacidad desconocida (esos se consideran aptos)
+                "capacidad_maxima_del_tipo": max(capacidades) if capacidades else None,
+            }
+
+        # 3. Bloques factibles: disponibilidad del docente intersectada con lo que permiten las restricciones
+        factibles = {}  # { docente_id: máscara }
+        disponibles = 0
+        for docente in docentes:
+            disponible = self._mascara_disponible(docente.docente_id)
+            disponibles |= disponible
+            mascara = disponible & ~gen.restricciones.prohibidos_clase(docente.docente_id, materia.materia_id, grupo.carrera_id)
+            if mascara:
+                factibles[docente.docente_id] = mascara
+        if not factibles:
+            return "sin_disponibilidad_docente", {
+                "docentes_habilitados": [d.docente_id for d in docentes],
+                "bloques_disponibles": disponibles.bit_count(),
+            }
+
+        # 4. Quién ocupa cada bloque factible: el propio grupo, el docente o todos los espacios aptos
+        todos = 0
+        for mascara in factibles.values():
+            todos |= mascara
+        propio = todos & self._mascara_ocupada("grupos", grupo.grupo_id)
+        ocupantes = defaultdict(set)  # { grupo_id: {slot, ...} }
+        previo = set()
+        con_docente_libre = 0
+        for docente_id, mascara in factibles.items():
+            mascara &= ~propio
+            ocupada = self._mascara_ocupada("docentes", docente_id)
+            con_docente_libre |= mascara & ~ocupada
+            for slot in self._slots(mascara & ocupada):
+                ocupante = self._ocupantes.get(("docentes", docente_id, slot))
+                (previo if ocupante is None else ocupantes[ocupante]).add(slot)
+        sin_espacio = con_docente_libre
+        ocupadas_espacio = {}
+        for espacio in espacios:
+            if not sin_espacio:
+                break
+            ocupadas_espacio[espacio.espacio_id] = self._mascara_ocupada("espacios", espacio.espacio_id)
+            sin_espacio &= ocupadas_espacio[espacio.espacio_id]
+        libres = con_docente_libre & ~sin_espacio
+
+        detalle = {
+            "docentes_habilitados": len(docentes),
+            "espacios_aptos": len(espacios),
+            "bloques_factibles": todos.bit_count(),
+        }
+        if libres:
+            detalle["bloques_libres"] = libres.bit_count()
+            return ("sin_tramo_contiguo" if bloques_tramo > 1 else "busqueda_incompleta"), detalle
+
+        for slot in self._slots(sin_espacio):
+            for espacio in espacios:
+                ocupante = self._ocupantes.get(("espacios", espacio.espacio_id, slot))
+                (previo if ocupante is None else ocupantes[ocupante]).add(slot)
+        codigos = self._codigos_grupo()
+        mayores = sorted(ocupantes.items(), key=lambda item: (-len(item[1]), item[0]))[:MAX_OCUPANTES_INFORMADOS]
+        detalle.update({
+            "ocupados_por_el_mismo_grupo": propio.bit_count(),
+            "ocupados_por_horario_previo_o_bloqueos": len(previo),
+            "grupos_ocupantes": len(ocupantes),
+            "ocupados_por": [
+                {"grupo_id": grupo_id, "codigo_grupo": codigos.get(grupo_id), "bloques": len(slots)}
+                for grupo_id, slots in mayores
+            ],
+        })
+        return "bloques_ocupados", detalle
+
+    def _codigos_grupo(self):
+        if self._codigos is None:
+            self._codigos = {g.grupo_id: g.codigo_grupo for g in self.generador.grupos_a_programar}
+        return self._codigos
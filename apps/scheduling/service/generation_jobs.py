@@ -0,0 +1,207 @@
+"""
+Cola de trabajos de generación de horarios.
+
+La petición HTTP solo crea el trabajo (PENDIENTE). La generación, intensiva en CPU, no corre en el proceso web:
+la ejecuta un proceso aparte, el comando `python manage.py procesar_trabajos_generacion`, que consulta la tabla
+de trabajos y ejecuta los pendientes de a uno (pueden correr varios workers; cada uno toma trabajos distintos).
+Sin ningún worker en marcha los trabajos quedan pendientes hasta que se cancelen.
+"""
+import datetime
+import logging
+import threading
+import time
+
+from django.db import close_old_connections, connection, transaction, IntegrityError
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.scheduling.models import TrabajosGeneracionHorario
+from .schedule_generator import ScheduleGeneratorService
+
+logger = logging.getLogger(__name__)
+
+# Segundos mínimos entre escrituras de progreso en la BD (los cambios de fase siempre se guardan)
+INTERVALO_MINIMO_PROGRESO = 1.0
+
+ESTADOS_ACTIVOS = ('PENDIENTE', 'EN_PROCESO')
+# Estados desde los que se puede reintentar un trabajo (con los mismos parámetros, como un trabajo nuevo)
+ESTADOS_REINTENTABLES = ('ERROR', 'CANCELADO')
+
+# Cada cuántos segundos el worker renueva fecha_latido del trabajo que ejecuta, y a partir de cuántos segundos
+# sin latido un trabajo en proceso se considera huérfano (su worker se reinició o cayó) y se da por fallido.
+# Los pendientes no vencen: esperan a que un worker los tome
+INTERVALO_LATIDO = 30
+LATIDO_VENCIDO = 3 * INTERVALO_LATIDO
+MENSAJE_VENCIDO = "El proceso que ejecutaba el trabajo dejó de responder (reinicio o caída); se puede reintentar."
+
+# Segundos entre consultas de un worker sin trabajos pendientes
+INTERVALO_CONSULTA_WORKER = 5
+
+# Trabajos en ejecución en este proceso; el hilo de latido los mantiene vivos en la BD
+_trabajos_propios = set()
+_candado_latido = threading.Lock()
+_hilo_latido = None
+
+
+class TrabajoInterrumpido(Exception):
+    """El trabajo se canceló o se dio por vencido mientras corría: la generación se abandona sin guardar."""
+
+
+def expirar_trabajos_vencidos(periodo=None):
+    """Marca como ERROR los trabajos en proceso sin latido reciente (del periodo indicado o de todos)."""
+    limite = timezone.now() - datetime.timedelta(seconds=LATIDO_VENCIDO)
+    vencidos = TrabajosGeneracionHorario.objects.filter(
+        # Los trabajos anteriores al latido no tienen fecha_latido: cuenta su creación
+        Q(fecha_latido__lt=limite) | Q(fecha_latido__isnull=True, fecha_creacion__lt=limite),
+        estado='EN_PROCESO'
+    )
+    if periodo is not None:
+        vencidos = vencidos.filter(periodo=periodo)
+    return vencidos.update(estado='ERROR', mensaje_error=MENSAJE_VENCIDO, fecha_fin=timezone.now())
+
+
+def trabajo_activo(periodo):
+    """Devuelve el trabajo pendiente o en proceso del periodo, si existe (los huérfanos ya no cuentan)."""
+    expirar_trabajos_vencidos(periodo)
+    return TrabajosGeneracionHorario.objects.filter(periodo=periodo, estado__in=ESTADOS_ACTIVOS).first()
+
+
+def encolar_generacion(periodo, parametros):
+    """
+    Crea el trabajo pendiente; lo ejecuta el worker (procesar_trabajos_generacion) que lo tome primero. Devuelve
+    (trabajo, creado): si el periodo ya tiene un trabajo activo se devuelve ese, sin crear otro. La restricción
+    única trabajo_activo_periodo_uniq resuelve la carrera entre dos peticiones simultáneas.
+    """
+    for intento in range(3):
+        activo = trabajo_activo(periodo)
+        if activo is not None:
+            return activo, False
+        try:
+            with transaction.atomic():
+                trabajo = TrabajosGeneracionHorario.objects.create(
+                    periodo=periodo, parametros=parametros, fecha_latido=timezone.now()
+                )
+        except IntegrityError:
+            # Otra petición encoló un trabajo del periodo entre la consulta y el INSERT: se devuelve ese
+            if intento == 2:
+                raise
+            continue
+        return trabajo, True
+
+
+def cancelar_trabajo(trabajo_id):
+    """
+    Cancela un trabajo pendiente o en proceso. Uno en proceso se detiene en su siguiente reporte de progreso
+    (entre grupos o fases), antes de guardar el horario. Devuelve False si el trabajo ya no estaba activo.
+    """
+    return bool(TrabajosGeneracionHorario.objects.filter(pk=trabajo_id, estado__in=ESTADOS_ACTIVOS).update(
+        estado='CANCELADO', fecha_fin=timezone.now()
+    ))
+
+
+def reintentar_trabajo(trabajo):
+    """Encola un trabajo nuevo con los parámetros de uno fallido o cancelado; devuelve (trabajo, creado)."""
+    if trabajo.estado not in ESTADOS_REINTENTABLES:
+        raise ValueError(f"Solo se pueden reintentar trabajos en estado {' o '.join(ESTADOS_REINTENTABLES)}.")
+    return encolar_generacion(trabajo.periodo, trabajo.parametros)
+
+
+def procesar_siguiente_trabajo():
+    """
+    Ejecuta en este proceso el trabajo pendiente más antiguo y devuelve su id, o None si no había ninguno. Si otro
+    worker lo tomó entre la consulta y el arranque, _ejecutar_trabajo no hace nada y el llamador sigue con el siguiente.
+    """
+    global _hilo_latido
+    expirar_trabajos_vencidos()
+    trabajo_id = TrabajosGeneracionHorario.objects.filter(estado='PENDIENTE').order_by(
+        'fecha_creacion', 'trabajo_id'
+    ).values_list('trabajo_id', flat=True).first()
+    if trabajo_id is None:
+        return None
+    with _candado_latido:
+        _trabajos_propios.add(trabajo_id)
+        if _hilo_latido is None or not _hilo_latido.is_alive():
+            _hilo_latido = threading.Thread(target=_latir, name='latido-generacion-horarios', daemon=True)
+            _hilo_latido.start()
+    _ejecutar_trabajo(trabajo_id)
+    return trabajo_id
+
+
+def _latir():
+    """Hilo del worker: renueva fecha_latido de los trabajos propios activos cada INTERVALO_LATIDO segundos."""
+    while True:
+        time.sleep(INTERVALO_LATIDO)
+        with _candado_latido:
+            propios = list(_trabajos_propios)
+        if not propios:
+            continue
+        try:
+            TrabajosGeneracionHorario.objects.filter(pk__in=propios, estado__in=ESTADOS_ACTIVOS).update(
+                fecha_latido=timezone.now()
+            )
+        except Exception:
+            logger.exception("No se pudo renovar el latido de los trabajos de generación %s", propios)
+        finally:
+            connection.close()
+
+
+class _ReporteProgreso:
+    """
+    Callback de progreso para ScheduleGeneratorService que guarda fase, porcentaje y stats parciales. Si el trabajo
+    dejó de estar EN_PROCESO (cancelado o vencido), lanza TrabajoInterrumpido para detener la generación.
+    """
+
+    def __init__(self, trabajo_id):
+        self.trabajo_id = trabajo_id
+        self.fase = None
+        self.ultima_escritura = 0.0
+
+    def __call__(self, fase, porcentaje, stats):
+        ahora = time.monotonic()
+        if fase == self.fase and ahora - self.ultima_escritura < INTERVALO_MINIMO_PROGRESO:
+            return
+        self.fase = fase
+        self.ultima_escritura = ahora
+        actualizados = TrabajosGeneracionHorario.objects.filter(pk=self.trabajo_id, estado='EN_PROCESO').update(
+            fase=fase, porcentaje=porcentaje, estadisticas=stats, fecha_latido=timezone.now()
+        )
+        if not actualizados:
+            raise TrabajoInterrumpido(self.trabajo_id)
+
+
+def _ejecutar_trabajo(trabajo_id):
+    close_old_connections()
+    try:
+        trabajo = TrabajosGeneracionHorario.objects.select_related('periodo').get(pk=trabajo_id)
+        iniciado = TrabajosGeneracionHorario.objects.filter(pk=trabajo_id, estado='PENDIENTE').update(
+            estado='EN_PROCESO', fecha_inicio=timezone.now(), fecha_latido=timezone.now()
+        )
+        if not iniciado: # Cancelado mientras esperaba en la cola, o ya tomado por otro worker
+            return
+
+        generator_service = ScheduleGeneratorService(
+            periodo=trabajo.periodo, progress_callback=_ReporteProgreso(trabajo_id), **trabajo.parametros
+        )
+        resultado = generator_service.generar_horarios_automaticos()
+
+        # Sin filtrar por estado: si llegó a guardar el horario, el trabajo terminó aunque se haya cancelado
+        # durante la escritura final
+        TrabajosGeneracionHorario.objects.filter(pk=trabajo_id).update(
+            estado='COMPLETADO', fase='completado', porcentaje=100,
+            estadisticas=resultado.get('stats', {}),
+            conflictos_no_resueltos=resultado.get('unresolved_conflicts', []),
+            diagnosticos=resultado.get('diagnosticos', []),
+            fecha_fin=timezone.now()
+        )
+    except TrabajoInterrumpido:
+        logger.info("Generación de horario interrumpida (trabajo %s cancelado o vencido)", trabajo_id)
+    except Exception as e:
+        logger.exception("Error en generación de horario (trabajo %s)", trabajo_id)
+        TrabajosGeneracionHorario.objects.filter(pk=trabajo_id).update(
+            estado='ERROR', mensaje_error=str(e), fecha_fin=timezone.now()
+        )
+    finally:
+        with _candado_latido:
+            _trabajos_propios.discard(trabajo_id)
+        # El worker no pasa por el ciclo de request de Django: cerrar la conexión explícitamente
+        connection.close()
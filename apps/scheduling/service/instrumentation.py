@@ -0,0 +1,98 @@
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+class ContadorConsultas:
+    """execute_wrapper que cuenta las consultas SQL y su duración total sin guardar el texto de cada una."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.segundos += time.perf_counter() - inicio
+
+
+class MedidorFases:
+    """
+    Mide cada fase de la generación: tiempo de pared, tiempo de CPU, consultas SQL y su duración, y los
+    contadores que la fase incrementa (p. ej. candidatos evaluados). Las fases son consecutivas (cambiar);
+    las subfases se miden dentro de la fase en curso y se informan aparte como "fase.subfase".
+    """
+
+    def __init__(self):
+        self.consultas = ContadorConsultas()
+        self.contadores = {}
+        self.fases = {}
+        self._actual = None
+        self._inicio = None
+
+    @property
+    def fase_actual(self):
+        return self._actual
+
+    @contextmanager
+    def contar_consultas(self):
+        with connection.execute_wrapper(self.consultas):
+            yield
+
+    def contar(self, clave, n=1):
+        self.contadores[clave] = self.contadores.get(clave, 0) + n
+
+    def _foto(self):
+        return (
+            time.perf_counter(), time.process_time(), self.consultas.consultas, self.consultas.segundos,
+            dict(self.contadores)
+        )
+
+    def _acumular(self, fase, inicio):
+        fin = self._foto()
+        medida = self.fases.setdefault(fase, {
+            "segundos": 0.0, "segundos_cpu": 0.0, "consultas_sql": 0, "segundos_sql": 0.0, "contadores": {}
+        })
+        medida["segundos"] += fin[0] - inicio[0]
+        medida["segundos_cpu"] += fin[1] - inicio[1]
+        medida["consultas_sql"] += fin[2] - inicio[2]
+        medida["segundos_sql"] += fin[3] - inicio[3]
+        for clave, valor in fin[4].items():
+            delta = valor - inicio[4].get(clave, 0)
+            if delta:
+                medida["contadores"][clave] = medida["contadores"].get(clave, 0) + delta
+
+    def cambiar(self, fase):
+        """Cierra la fase en curso (si hay) y empieza `fase` (None para terminar)."""
+        if self._actual is not None:
+            self._acumular(self._actual, self._inicio)
+        self._actual = fase
+        self._inicio = self._foto()
+
+    @contextmanager
+    def subfase(self, nombre):
+        inicio = self._foto()
+        try:
+            yield
+        finally:
+            self._acumular(f"{self._actual}.{nombre}" if self._actual else nombre, inicio)
+
+    def segundos_por_fase(self):
+        """Tiempo de pared de las fases principales (sin subfases)."""
+        return {fase: medida["segundos"] for fase, medida in self.fases.items() if '.' not in fase}
+
+    def resumen(self):
+        return {
+            fase: {
+                "segundos": round(medida["segundos"], 4),
+                "segundos_cpu": round(medida["segundos_cpu"], 4),
+                "consultas_sql": medida["consultas_sql"],
+                "segundos_sql": round(medida["segundos_sql"], 4),
+                **medida["contadores"],
+            }
+            for fase, medida in self.fases.items()
+        }
@@ -0,0 +1,195 @@
+from collections import defaultdict
+
+
+class IndiceIntervalos:
+    """
+    Ocupación por recurso y por día como máscaras de bits sobre los bloques del día ordenados por hora_inicio
+    (bit i = i-ésimo bloque del día). Permite ubicar sesiones de k bloques consecutivos: los inicios posibles
+    de un tramo de k bloques libres se obtienen con k operaciones AND/shift sobre la máscara del día, sin
+    revisar bloque por bloque. Dos bloques son consecutivos si uno empieza cuando termina el otro.
+
+    BloquesHorariosDefinicion es global y puede tener varias definiciones con el mismo horario (p. ej. una por
+    turno o por nombre). En esos días un bloque puede seguir a varios, y el siguiente en el orden no es el que
+    continúa el tramo: los inicios se calculan agrupando los bits por hora de inicio y de fin, y el tramo se
+    arma recorriendo los sucesores de cada bloque.
+
+    Un tramo se asigna al mismo docente y al mismo espacio en todos sus bloques. Entre tramos factibles se elige
+    el de mayor suma de preferencias del docente; a igual puntaje, el primer docente candidato, el día y el
+    inicio más tempranos y el primer espacio apto (el más chico).
+    """
+
+    def __init__(self, generador):
+        self.generador = generador
+        self.bloques_por_dia = defaultdict(list)  # { dia_semana: [bloque, ...] } por hora_inicio
+        for bloque in sorted(generador.bloques_horarios, key=lambda b: (b.dia_semana or 0, b.hora_inicio, b.bloque_def_id)):
+            self.bloques_por_dia[bloque.dia_semana].append(bloque)
+        self.dias = list(self.bloques_por_dia)
+        self.posicion = {}                        # { (dia_semana, bloque_id): bit del bloque en su día }
+        self.todos = {}                           # { dia_semana: máscara con todos los bloques del día }
+        self.siguientes = {}                      # { dia_semana: [máscara de los bloques que empiezan al terminar el i] }
+        self.lineal = {}                          # { dia_semana: cada bloque sigue a lo sumo al bit anterior }
+        self.encadenados = {}                     # { dia_semana: bit i si el bloque i+1 empieza al terminar el i }
+        self._por_hora = {}                       # { dia_semana: [(bloques que empiezan a una hora, los que terminan a esa hora)] }
+        for dia, bloques in self.bloques_por_dia.items():
+            self.todos[dia] = (1 << len(bloques)) - 1
+            empiezan, terminan = defaultdict(int), defaultdict(int)
+            for i, bloque in enumerate(bloques):
+                self.posicion[(dia, bloque.bloque_def_id)] = i
+                empiezan[bloque.hora_inicio] |= 1 << i
+                terminan[bloque.hora_fin] |= 1 << i
+            self.siguientes[dia] = [empiezan.get(bloque.hora_fin, 0) for bloque in bloques]
+            encadenados, lineal = 0, True
+            for i, siguientes in enumerate(self.siguientes[dia]):
+                if siguientes == 1 << (i + 1):
+                    encadenados |= 1 << i
+                elif siguientes:
+                    lineal = False
+            self.encadenados[dia] = encadenados
+            self.lineal[dia] = lineal
+            self._por_hora[dia] = [(mascara, terminan[hora]) for hora, mascara in empiezan.items() if terminan.get(hora)]
+        self._contiguos = {}
+
+        # Posición de cada bloque de la generación (índice global de CompiledConstraints) dentro de su día
+        indice_global = generador.restricciones.indice_slot
+        self._bit_global = [
+            (indice_global[(b.dia_semana, b.bloque_def_id)], b.dia_semana, self.posicion[(b.dia_semana, b.bloque_def_id)])
+            for b in generador.bloques_horarios
+        ]
+        self._permitidos = {}
+
+        # Disponibilidad de cada docente por día
+        self.disponible = defaultdict(lambda: defaultdict(int))  # { docente_id: { dia: máscara } }
+        for (docente_id, dia_semana, bloque_id) in generador.docente_disponibilidad_map:
+            i = self.posicion.get((dia_semana, bloque_id))
+            if i is not None:
+                self.disponible[docente_id][dia_semana] |= 1 << i
+
+        # Ocupación: { (tipo, entidad_id): { dia: máscara } }, con lo guardado, los bloqueos y la sesión actual
+        self.ocupado = defaultdict(lambda: defaultdict(int))
+        for indice in generador.validator.indices_ocupacion():
+            for tipo in ("docentes", "espacios", "grupos"):
+                for entidad_id, slots in indice[tipo].items():
+                    for slot in slots:
+                        self._ocupar(tipo, entidad_id, *slot)
+
+    def _ocupar(self, tipo, entidad_id, dia_semana, bloque_id):
+        i = self.posicion.get((dia_semana, bloque_id))
+        if i is not None:
+            self.ocupado[(tipo, entidad_id)][dia_semana] |= 1 << i
+
+    def marcar(self, docente_id, espacio_id, grupo_id, dia_semana, bloque_id):
+        """Mantiene las máscaras sincronizadas con el validador."""
+        self._ocupar("docentes", docente_id, dia_semana, bloque_id)
+        self._ocupar("espacios", espacio_id, dia_semana, bloque_id)
+        self._ocupar("grupos", grupo_id, dia_semana, bloque_id)
+
+    def _cadena(self, dia, k):
+        """Bits i tales que los bloques i .. i+k-1 del día son consecutivos."""
+        clave = (dia, k)
+        if clave not in self._contiguos:
+            cadena = self.todos[dia]
+            for paso in range(k - 1):
+                cadena &= self.encadenados[dia] >> paso
+            self._contiguos[clave] = cadena
+        return self._contiguos[clave]
+
+    def inicios(self, libres, dia, k):
+        """Inicios de tramos de k bloques consecutivos con todos sus bits en `libres`."""
+        if self.lineal[dia]:
+            inicios = libres & self._cadena(dia, k)
+            for paso in range(1, k):
+                inicios &= libres >> paso
+            return inicios
+        # Bloques desde los que sale un tramo libre de 1, 2, ... k bloques: los libres que terminan a la hora
+        # en que empieza algún bloque del que sale un tramo un bloque más corto
+        inicios = libres
+        for _ in range(k - 1):
+            previos = 0
+            for empiezan, terminan in self._por_hora[dia]:
+                if inicios & empiezan:
+                    previos |= terminan
+            inicios = libres & previos
+        return inicios
+
+    def _tramos(self, libres, dia, i, k):
+        """Tramos (bits de sus bloques, en orden) de k bloques consecutivos en `libres` que empiezan en el bit i."""
+        if self.lineal[dia]:
+            return [list(range(i, i + k))]
+        tramos = [[i]]
+        for _ in range(k - 1):
+            tramos = [
+                tramo + [j] for tramo in tramos for j in _bits(self.siguientes[dia][tramo[-1]] & libres)
+            ]
+        return tramos
+
+    def _permitidos_docente(self, docente_id, materia_id, carrera_id):
+        """Restricciones configuradas (CompiledConstraints) pasadas a máscaras por día."""
+        clave = (docente_id, materia_id, carrera_id)
+        if clave not in self._permitidos:
+            prohibidos = self.generador.restricciones.prohibidos_clase(docente_id, materia_id, carrera_id)
+            permitidos = dict(self.todos)
+            if prohibidos:
+                for j, dia, i in self._bit_global:
+                    if (prohibidos >> j) & 1:
+                        permitidos[dia] &= ~(1 << i)
+            self._permitidos[clave] = permitidos
+        return self._permitidos[clave]
+
+    def buscar_mejor_tramo(self, grupo, materia, docentes_candidatos, k):
+        """Mejor tramo de k bloques para el grupo: dict con grupo, docente, espacio, dia_semana y bloques, o None."""
+        gen = self.generador
+        espacios = gen._espacios_candidatos(grupo, materia)
+        if not docentes_candidatos or not espacios:
+            return None
+        ocupado_grupo = self.ocupado.get(("grupos", grupo.grupo_id), {})
+        # Inicios en los que hay al menos un espacio apto libre durante todo el tramo, por día
+        inicios_espacio = {}
+        for dia in self.dias:
+            union = 0
+            for espacio in espacios:
+                union |= self.inicios(self.todos[dia] & ~self.ocupado.get(("espacios", espacio.espacio_id), {}).get(dia, 0), dia, k)
+            inicios_espacio[dia] = union
+
+        mejor, mejor_puntaje = None, None
+        for docente in docentes_candidatos:
+            disponible = self.disponible.get(docente.docente_id, {})
+            ocupado_docente = self.ocupado.get(("docentes", docente.docente_id), {})
+            permitidos = self._permitidos_docente(docente.docente_id, materia.materia_id, grupo.carrera_id)
+            for dia in self.dias:
+                libres = disponible.get(dia, 0) & permitidos[dia] & ~ocupado_docente.get(dia, 0) & ~ocupado_grupo.get(dia, 0)
+                inicios = self.inicios(libres, dia, k) & inicios_espacio[dia]
+                bloques = self.bloques_por_dia[dia]
+                for i in _bits(inicios):
+                    for tramo in self._tramos(libres, dia, i, k):
+                        # Con un solo tramo por inicio, inicios_espacio ya garantiza un espacio libre en todo el
+                        # tramo; si hay varios, el docente y el espacio podrían estar libres en tramos distintos
+                        if not self.lineal[dia] and self._espacio_libre(espacios, dia, tramo) is None:
+                            continue
+                        puntaje = sum(
+                            gen.docente_disponibilidad_map[(docente.docente_id, dia, bloques[j].bloque_def_id)] for j in tramo
+                        )
+                        if mejor_puntaje is None or puntaje > mejor_puntaje:
+                            mejor, mejor_puntaje = (docente, dia, tramo), puntaje
+        if mejor is None:
+            return None
+
+        docente, dia, tramo = mejor
+        return {
+            "grupo": grupo, "docente": docente, "espacio": self._espacio_libre(espacios, dia, tramo), "dia_semana": dia,
+            "bloques": [self.bloques_por_dia[dia][j] for j in tramo],
+        }
+
+    def _espacio_libre(self, espacios, dia, tramo):
+        """Primer espacio (el más chico) libre en todos los bloques del tramo, o None."""
+        mascara = sum(1 << j for j in tramo)
+        return next(
+            (e for e in espacios if not mascara & self.ocupado.get(("espacios", e.espacio_id), {}).get(dia, 0)), None
+        )
+
+
+def _bits(mascara):
+    """Posiciones de los bits en 1 de la máscara, de menor a mayor."""
+    while mascara:
+        menor = mascara & -mascara
+        yield menor.bit_length() - 1
+        mascara ^= menor
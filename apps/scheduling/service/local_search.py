@@ -0,0 +1,236 @@
+import math
+import random
+import time
+
+# Puntos extra cuando el bloque cae en el turno preferente del grupo (Grupos.turno_preferente)
+BONO_TURNO_PREFERENTE = 1
+
+# Temperaturas inicial y final del recocido simulado, en unidades de puntaje (preferencias de -1 a 1)
+TEMPERATURA_INICIAL = 1.0
+TEMPERATURA_FINAL = 0.01
+
+# Movimientos evaluados entre cada consulta del reloj (y actualización de la temperatura)
+MOVIMIENTOS_POR_LOTE = 2000
+
+# Marca de celda libre y de celda ocupada por un horario que no se está optimizando
+LIBRE = -1
+FIJO = -2
+
+
+class LocalSearchOptimizer:
+    """
+    Fase de mejora opcional sobre un horario ya generado (recocido simulado).
+
+    El puntaje de una sesión es la preferencia del docente por el bloque (DisponibilidadDocentes.preferencia)
+    más BONO_TURNO_PREFERENTE si el bloque es del turno preferente del grupo. En cada paso se toma una sesión y
+    un valor (docente, bloque) de su dominio: si el docente está libre en ese bloque la sesión se mueve ahí;
+    si lo ocupa otra sesión del mismo docente, ambas intercambian bloque. La ocupación se guarda en tablas
+    planas docente/espacio/grupo x bloque con la sesión que ocupa cada celda, así que la factibilidad y la
+    variación del puntaje de cada movimiento se calculan solo con las sesiones involucradas.
+    """
+
+    def __init__(self, generador, semilla=None):
+        self.generador = generador
+        self.random = random.Random(semilla)
+        self.stats = {
+            "puntaje_inicial": 0, "puntaje_final": 0,
+            "movimientos_evaluados": 0, "movimientos_aceptados": 0, "segundos": 0.0
+        }
+
+    def _preparar(self, grupos, asignaciones):
+        gen = self.generador
+        self.bloques = gen.bloques_horarios
+        self.indice_slot = {(b.dia_semana, b.bloque_def_id): j for j, b in enumerate(self.bloques)}
+        nb = len(self.bloques)
+
+        grupos_por_id = {g.grupo_id: g for g in grupos}
+        self.grupo_ids = sorted({a[0] for a in asignaciones})
+        self.docente_ids = [d.docente_id for d in gen.docentes_disponibles]
+        self.espacio_ids = [e.espacio_id for e in gen.espacios_disponibles]
+        indice_grupo = {grupo_id: g for g, grupo_id in enumerate(self.grupo_ids)}
+        indice_docente = {docente_id: d for d, docente_id in enumerate(self.docente_ids)}
+        indice_espacio = {espacio_id: e for e, espacio_id in enumerate(self.espacio_ids)}
+
+        # Dominio de cada grupo: valores (docente, bloque, puntaje) y el mismo puntaje indexado por docente * nb + bloque
+        self.dominio = []
+        self.puntaje_de = []
+        self.espacios_de = []
+        self.espacios_set = []
+        for grupo_id in self.grupo_ids:
+            grupo = grupos_por_id[grupo_id]
+            materia = grupo.materia
+            valores = []
+            for docente in gen._docentes_candidatos(grupo):
+                d = indice_docente[docente.docente_id]
+                for j, bloque in enumerate(self.bloques):
+                    preferencia = gen.docente_disponibilidad_map.get((docente.docente_id, bloque.dia_semana, bloque.bloque_def_id))
+                    if preferencia is None or not gen._cumple_restricciones_docente(docente, bloque.dia_semana, bloque, materia, grupo):
+                        continue
+                    bono = BONO_TURNO_PREFERENTE if grupo.turno_preferente and bloque.turno == grupo.turno_preferente else 0
+                    valores.append((d, j, preferencia + bono))
+            self.dominio.append(valores)
+            self.puntaje_de.append({d * nb + j: puntaje for d, j, puntaje in valores})
+            espacios = [indice_espacio[e.espacio_id] for e in gen._espacios_candidatos(grupo, materia)]
+            self.espacios_de.append(espacios)
+            self.espacios_set.append(set(espacios))
+
+        # Ocupación: sesión que ocupa cada celda entidad x bloque (LIBRE, FIJO o índice de sesión)
+        self.quien_docente = [LIBRE] * (len(self.docente_ids) * nb)
+        self.quien_espacio = [LIBRE] * (len(self.espacio_ids) * nb)
+        self.quien_grupo = [LIBRE] * (len(self.grupo_ids) * nb)
+        # Celdas fijas: horarios del periodo que no se optimizan y bloqueos por restricciones (no la sesión actual,
+        # que son justamente las asignaciones a optimizar)
+        for ocupacion in (gen.validator.ocupacion_periodo, gen.validator.bloqueos):
+            if not ocupacion:
+                continue
+            for clave, indice, quien in (
+                ("docentes", indice_docente, self.quien_docente),
+                ("espacios", indice_espacio, self.quien_espacio),
+                ("grupos", indice_grupo, self.quien_grupo),
+            ):
+                for entidad_id, slots in ocupacion[clave].items():
+                    if entidad_id not in indice:
+                        continue
+                    for slot in slots:
+                        if slot in self.indice_slot:
+                            quien[indice[entidad_id] * nb + self.indice_slot[slot]] = FIJO
+
+        # Sesiones a optimizar, en arreglos paralelos
+        self.sesion_grupo, self.sesion_docente, self.sesion_espacio, self.sesion_bloque, self.sesion_puntaje = [], [], [], [], []
+        for i, (grupo_id, docente_id, espacio_id, dia_semana, bloque_id) in enumerate(asignaciones):
+            g, d, e = indice_grupo[grupo_id], indice_docente[docente_id], indice_espacio[espacio_id]
+            j = self.indice_slot[(dia_semana, bloque_id)]
+            self.sesion_grupo.append(g)
+            self.sesion_docente.append(d)
+            self.sesion_espacio.append(e)
+            self.sesion_bloque.append(j)
+            self.sesion_puntaje.append(self.puntaje_de[g].get(d * nb + j, 0))
+            self.quien_docente[d * nb + j] = i
+            self.quien_espacio[e * nb + j] = i
+            self.quien_grupo[g * nb + j] = i
+
+    def _liberar(self, i):
+        nb = len(self.bloques)
+        j = self.sesion_bloque[i]
+        self.quien_docente[self.sesion_docente[i] * nb + j] = LIBRE
+        self.quien_espacio[self.sesion_espacio[i] * nb + j] = LIBRE
+        self.quien_grupo[self.sesion_grupo[i] * nb + j] = LIBRE
+
+    def _ocupar(self, i, d, e, j, puntaje):
+        nb = len(self.bloques)
+        self.sesion_docente[i], self.sesion_espacio[i], self.sesion_bloque[i], self.sesion_puntaje[i] = d, e, j, puntaje
+        self.quien_docente[d * nb + j] = i
+        self.quien_espacio[e * nb + j] = i
+        self.quien_grupo[self.sesion_grupo[i] * nb + j] = i
+
+    def _evaluar(self, i):
+        """
+        Propone un movimiento para la sesión i y devuelve (delta, aplicar) o None si no es factible.
+        `aplicar` es una tupla con las sesiones y sus nuevos valores (docente, espacio, bloque, puntaje).
+        """
+        nb = len(self.bloques)
+        dominio = self.dominio[self.sesion_grupo[i]]
+        if not dominio:
+            return None
+        d, j, puntaje = dominio[int(self.random.random() * len(dominio))]
+        g, d0, e0, j0 = self.sesion_grupo[i], self.sesion_docente[i], self.sesion_espacio[i], self.sesion_bloque[i]
+        k = self.quien_docente[d * nb + j]
+
+        if k == LIBRE:
+            # Mover la sesión a un bloque (o docente) libre
+            e = e0
+            if j != j0:
+                if self.quien_grupo[g * nb + j] != LIBRE:
+                    return None
+                if self.quien_espacio[e0 * nb + j] != LIBRE:
+                    espacios = self.espacios_de[g]
+                    e = espacios[int(self.random.random() * len(espacios))]
+                    if self.quien_espacio[e * nb + j] != LIBRE:
+                        return None
+            return puntaje - self.sesion_puntaje[i], ((i, d, e, j, puntaje),)
+
+        if k == FIJO or k == i or d != d0:
+            return None
+
+        # Intercambiar bloque con otra sesión del mismo docente
+        gk, ek = self.sesion_grupo[k], self.sesion_espacio[k]
+        puntaje_k = self.puntaje_de[gk].get(d * nb + j0)
+        if puntaje_k is None:
+            return None
+        if g != gk and (self.quien_grupo[g * nb + j] != LIBRE or self.quien_grupo[gk * nb + j0] != LIBRE):
+            return None
+        if e0 == ek or (self.quien_espacio[e0 * nb + j] == LIBRE and self.quien_espacio[ek * nb + j0] == LIBRE):
+            e_i, e_k = e0, ek
+        elif ek in self.espacios_set[g] and e0 in self.espacios_set[gk]:
+            e_i, e_k = ek, e0 # Cada sesión se queda con el espacio que deja la otra
+        else:
+            return None
+        delta = puntaje + puntaje_k - self.sesion_puntaje[i] - self.sesion_puntaje[k]
+        return delta, ((i, d, e_i, j, puntaje), (k, d, e_k, j0, puntaje_k))
+
+    def mejorar(self, grupos, asignaciones, segundos, on_progress=None):
+        """
+        Optimiza `asignaciones` (tuplas (grupo_id, docente_id, espacio_id, dia_semana, bloque_id)) durante
+        `segundos` y devuelve la mejor lista encontrada, en el mismo orden.
+        """
+        inicio = time.perf_counter()
+        asignaciones = list(asignaciones)
+        self._preparar(grupos, asignaciones)
+        puntaje = sum(self.sesion_puntaje)
+        self.stats["puntaje_inicial"] = puntaje
+        n = len(asignaciones)
+
+        mejor_puntaje, mejor = puntaje, None
+        evaluados = aceptados = 0
+        temperatura = TEMPERATURA_INICIAL
+        aleatorio = self.random.random
+        while n and segundos > 0:
+            if evaluados % MOVIMIENTOS_POR_LOTE == 0:
+                avance = (time.perf_counter() - inicio) / segundos
+                if avance >= 1:
+                    break
+                # Enfriamiento geométrico según el tiempo consumido
+                temperatura = TEMPERATURA_INICIAL * (TEMPERATURA_FINAL / TEMPERATURA_INICIAL) ** avance
+                if on_progress is not None and evaluados:
+                    on_progress(int(100 * avance))
+            evaluados += 1
+
+            propuesta = self._evaluar(int(aleatorio() * n))
+            if propuesta is None:
+                continue
+            delta, cambios = propuesta
+            if delta < 0:
+                if aleatorio() >= math.exp(delta / temperatura):
+                    continue
+                # Antes de empeorar desde un nuevo máximo se guarda una copia para poder volver a él
+                if puntaje > mejor_puntaje:
+                    mejor_puntaje = puntaje
+                    mejor = (list(self.sesion_docente), list(self.sesion_espacio), list(self.sesion_bloque))
+
+            for i, *_ in cambios:
+                self._liberar(i)
+            for cambio in cambios:
+                self._ocupar(*cambio)
+            puntaje += delta
+            aceptados += 1
+
+        if puntaje < mejor_puntaje and mejor is not None:
+            self.sesion_docente, self.sesion_espacio, self.sesion_bloque = mejor
+            puntaje = mejor_puntaje
+
+        self.stats.update({
+            "puntaje_final": puntaje,
+            "movimientos_evaluados": evaluados,
+            "movimientos_aceptados": aceptados,
+            "segundos": time.perf_counter() - inicio,
+        })
+        return [
+            (
+                self.grupo_ids[self.sesion_grupo[i]],
+                self.docente_ids[self.sesion_docente[i]],
+                self.espacio_ids[self.sesion_espacio[i]],
+                self.bloques[self.sesion_bloque[i]].dia_semana,
+                self.bloques[self.sesion_bloque[i]].bloque_def_id,
+            )
+            for i in range(n)
+        ]
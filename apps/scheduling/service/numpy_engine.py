@@ -0,0 +1,131 @@
+import numpy as np
+
+# Puntaje para combinaciones no factibles; menor que cualquier preferencia válida (SmallIntegerField)
+SIN_PUNTAJE = np.iinfo(np.int32).min
+
+
+class NumpySlotEngine:
+    """
+    Motor alternativo de búsqueda de slots para ScheduleGeneratorService.
+
+    Construye una sola vez por ejecución matrices booleanas y de puntaje (docentes x bloques, espacios x bloques)
+    y elige el mejor slot de cada sesión con máscaras y argmax en lugar del triple bucle docente x espacio x bloque.
+    Respeta el mismo orden de desempate que el motor de referencia (primer docente, luego espacio, luego bloque
+    con el mayor puntaje), por lo que ambos producen las mismas asignaciones.
+    """
+
+    def __init__(self, generador):
+        self.generador = generador
+        self.docentes = generador.docentes_disponibles
+        self.espacios = generador.espacios_disponibles
+        self.bloques = generador.bloques_horarios
+        self.indice_docente = {d.docente_id: i for i, d in enumerate(self.docentes)}
+        self.indice_espacio = {e.espacio_id: i for i, e in enumerate(self.espacios)}
+        self.indice_slot = {(b.dia_semana, b.bloque_def_id): j for j, b in enumerate(self.bloques)}
+
+        n_docentes, n_espacios, n_bloques = len(self.docentes), len(self.espacios), len(self.bloques)
+        # Disponibilidad y preferencia del docente por bloque (DisponibilidadDocentes)
+        self.disponible = np.zeros((n_docentes, n_bloques), dtype=bool)
+        self.preferencia = np.zeros((n_docentes, n_bloques), dtype=np.int32)
+        for (docente_id, dia_semana, bloque_id), preferencia in generador.docente_disponibilidad_map.items():
+            i = self.indice_docente.get(docente_id)
+            j = self.indice_slot.get((dia_semana, bloque_id))
+            if i is not None and j is not None:
+                self.disponible[i, j] = True
+                self.preferencia[i, j] = preferencia
+
+        # Ocupación actual de docentes, espacios y grupos (y bloqueos por restricciones), inicializada desde el validador
+        self.docente_ocupado = np.zeros((n_docentes, n_bloques), dtype=bool)
+        self.espacio_ocupado = np.zeros((n_espacios, n_bloques), dtype=bool)
+        self.grupo_ocupado = {}
+        for indice in generador.validator.indices_ocupacion():
+            self._cargar_ocupacion(indice["docentes"], self.indice_docente, self.docente_ocupado)
+            self._cargar_ocupacion(indice["espacios"], self.indice_espacio, self.espacio_ocupado)
+            for grupo_id, slots in indice["grupos"].items():
+                fila = self._fila_grupo(grupo_id)
+                for slot in slots:
+                    if slot in self.indice_slot:
+                        fila[self.indice_slot[slot]] = True
+
+        # Máscaras por grupo que no cambian entre sesiones (se calculan una vez por grupo)
+        self._mascaras_grupo = {}
+
+    def _cargar_ocupacion(self, ocupacion, indice_entidad, matriz):
+        for entidad_id, slots in ocupacion.items():
+            i = indice_entidad.get(entidad_id)
+            if i is None:
+                continue
+            for slot in slots:
+                j = self.indice_slot.get(slot)
+                if j is not None:
+                    matriz[i, j] = True
+
+    def _fila_grupo(self, grupo_id):
+        if grupo_id not in self.grupo_ocupado:
+            self.grupo_ocupado[grupo_id] = np.zeros(len(self.bloques), dtype=bool)
+        return self.grupo_ocupado[grupo_id]
+
+    def _mascaras(self, grupo, materia, docentes_candidatos):
+        """Índices de candidatos, espacios aptos para el grupo (tipo y capacidad) y restricciones docente x bloque."""
+        clave = (grupo.grupo_id, tuple(d.docente_id for d in docentes_candidatos))
+        if clave not in self._mascaras_grupo:
+            gen = self.generador
+            filas_docentes = np.array([self.indice_docente[d.docente_id] for d in docentes_candidatos], dtype=np.intp)
+            espacios_aptos = np.array(
+                [self.indice_espacio[e.espacio_id] for e in gen._espacios_candidatos(grupo, materia)],
+                dtype=np.intp
+            )
+            restricciones_docente = np.array(
+                [[gen._cumple_restricciones_docente(d, b.dia_semana, b, materia, grupo) for b in self.bloques] for d in docentes_candidatos],
+                dtype=bool
+            ).reshape(len(docentes_candidatos), len(self.bloques))
+            self._mascaras_grupo = {clave: (filas_docentes, espacios_aptos, restricciones_docente)}
+        return self._mascaras_grupo[clave]
+
+    def buscar_mejor_opcion(self, grupo, materia, docentes_candidatos):
+        if not docentes_candidatos or not self.bloques:
+            return None
+        filas_docentes, espacios_aptos, restricciones_docente = self._mascaras(grupo, materia, docentes_candidatos)
+        if not len(espacios_aptos):
+            return None
+
+        # candidatos x bloques: docente disponible, libre, cumple restricciones y el grupo está libre
+        sin_conflicto = ~self.docente_ocupado[filas_docentes] & ~self._fila_grupo(grupo.grupo_id)
+        docente_libre = self.disponible[filas_docentes] & sin_conflicto & restricciones_docente
+        # espacios aptos x bloques libres
+        espacio_libre = ~self.espacio_ocupado[espacios_aptos]
+
+        # Mismos contadores que el triple bucle del motor de referencia: combinaciones docente x espacio x bloque
+        # y cuántas de ellas chocan con la ocupación (docente, grupo o espacio)
+        combinaciones = len(filas_docentes) * len(espacios_aptos) * len(self.bloques)
+        sin_choque = int((sin_conflicto.sum(axis=0) * espacio_libre.sum(axis=0)).sum())
+        self.generador._contar("candidatos_evaluados", combinaciones)
+        self.generador._contar("conflictos_detectados", combinaciones - sin_choque)
+        factible = docente_libre & espacio_libre.any(axis=0)
+        if not factible.any():
+            return None
+
+        puntaje = np.where(factible, self.preferencia[filas_docentes], SIN_PUNTAJE)
+        mejores = puntaje == puntaje.max()
+        # Primer docente (en orden de candidatos) con algún slot de puntaje máximo,
+        # luego el primer espacio y bloque en ese orden, igual que el motor de referencia
+        c = int(np.argmax(mejores.any(axis=1)))
+        combinacion = espacio_libre & mejores[c]
+        e, j = np.unravel_index(int(np.argmax(combinacion)), combinacion.shape)
+
+        bloque = self.bloques[j]
+        return {
+            "grupo": grupo, "docente": docentes_candidatos[c], "espacio": self.espacios[espacios_aptos[e]],
+            "dia_semana": bloque.dia_semana, "bloque_horario": bloque
+        }
+
+    def mark_slot_used(self, docente_id, espacio_id, grupo_id, dia_semana, bloque_id):
+        """Mantiene las matrices de ocupación sincronizadas con el validador."""
+        j = self.indice_slot.get((dia_semana, bloque_id))
+        if j is None:
+            return
+        if docente_id in self.indice_docente:
+            self.docente_ocupado[self.indice_docente[docente_id], j] = True
+        if espacio_id in self.indice_espacio:
+            self.espacio_ocupado[self.indice_espacio[espacio_id], j] = True
+        self._fila_grupo(grupo_id)[j] = True
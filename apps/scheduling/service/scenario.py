@@ -0,0 +1,225 @@
+"""
+Escenarios what-if para simular una generación sin escribir en la base de datos.
+
+Un escenario es un dict con cambios que se aplican solo a los datos cargados en memoria por el generador:
+
+    espacios_nuevos          [{"nombre_espacio", "tipo_espacio", "capacidad", "unidad"}]
+    espacios_excluidos       [espacio_id, ...]
+    docentes_excluidos       [docente_id, ...]
+    disponibilidad_docentes  [{"docente": id, "bloques": [{"bloque_horario": id, "preferencia": 0}, ...]}]
+                             (reemplaza la disponibilidad del docente en el periodo)
+    grupos_nuevos            [{"codigo_grupo", "materia", "carrera", "numero_estudiantes_estimado",
+                               "turno_preferente", "docente_asignado_directamente"}]
+    grupos_excluidos         [grupo_id, ...]
+
+Los espacios y grupos nuevos reciben ids negativos (-1, -2, ...) que solo existen en la simulación.
+"""
+import math
+
+from apps.academic_setup.models import Carrera, Materias, TiposEspacio, EspaciosFisicos
+from apps.scheduling.models import Grupos
+
+CLAVES_ESCENARIO = (
+    'espacios_nuevos', 'espacios_excluidos', 'docentes_excluidos', 'disponibilidad_docentes',
+    'grupos_nuevos', 'grupos_excluidos',
+)
+TURNOS_VALIDOS = ('M', 'T', 'N')
+
+# La simulación corre dentro de la petición HTTP: su presupuesto por defecto y el máximo aceptado son de
+# segundos, no los 10 minutos de una generación encolada (PRESUPUESTO_POR_DEFECTO_SEGUNDOS)
+PRESUPUESTO_SIMULACION_SEGUNDOS = 10
+PRESUPUESTO_MAXIMO_SIMULACION_SEGUNDOS = 30
+# Cada arranque repite la búsqueda completa dentro del mismo presupuesto; más arranques se encolan
+MAX_ARRANQUES_SIMULACION = 3
+
+
+def _lista(escenario, clave):
+    valor = escenario.get(clave) or []
+    if not isinstance(valor, (list, tuple)):
+        raise ValueError(f"'{clave}' debe ser una lista.")
+    return valor
+
+
+def _ids(escenario, clave):
+    try:
+        return {int(i) for i in _lista(escenario, clave)}
+    except (TypeError, ValueError):
+        raise ValueError(f"'{clave}' debe ser una lista de IDs.")
+
+
+def _entero(datos, campo, contexto, opcional=False):
+    valor = datos.get(campo) if isinstance(datos, dict) else None
+    if valor is None and opcional:
+        return None
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"{contexto}: '{campo}' debe ser un número entero.")
+
+
+def presupuesto_simulacion(time_budget_seconds):
+    """
+    Presupuesto de una simulación: el indicado o el por defecto; lanza ValueError si no es un número finito entre
+    0 (excluido) y el máximo.
+    """
+    if time_budget_seconds is None:
+        return PRESUPUESTO_SIMULACION_SEGUNDOS
+    try:
+        segundos = float(time_budget_seconds)
+    except (TypeError, ValueError):
+        segundos = math.nan
+    if not (math.isfinite(segundos) and 0 < segundos <= PRESUPUESTO_MAXIMO_SIMULACION_SEGUNDOS):
+        raise ValueError(
+            f"El presupuesto de una simulación (time_budget_seconds) debe ser un número mayor a 0 y de a lo sumo "
+            f"{PRESUPUESTO_MAXIMO_SIMULACION_SEGUNDOS} segundos; para más, encole una generación."
+        )
+    return segundos
+
+
+def arranques_simulacion(arranques, semillas):
+    """Lanza ValueError si la simulación pide más de MAX_ARRANQUES_SIMULACION arranques (o semillas)."""
+    try:
+        cantidad = len(semillas) if isinstance(semillas, (list, tuple)) else int(arranques or 1)
+    except (TypeError, ValueError):
+        return  # El formato lo valida el generador
+    if cantidad > MAX_ARRANQUES_SIMULACION:
+        raise ValueError(
+            f"Una simulación admite a lo sumo {MAX_ARRANQUES_SIMULACION} arranques (arranques o semillas); "
+            f"para más, encole una generación."
+        )
+
+
+def validar_escenario(escenario):
+    """Valida la forma del escenario (no los ids) y lanza ValueError con el motivo."""
+    if escenario is None:
+        return
+    if not isinstance(escenario, dict):
+        raise ValueError("El escenario debe ser un objeto con los cambios a simular.")
+    desconocidas = set(escenario) - set(CLAVES_ESCENARIO)
+    if desconocidas:
+        raise ValueError(f"Claves de escenario desconocidas: {', '.join(sorted(desconocidas))}.")
+    for clave in ('espacios_excluidos', 'docentes_excluidos', 'grupos_excluidos'):
+        _ids(escenario, clave)
+    for datos in _lista(escenario, 'espacios_nuevos'):
+        _entero(datos, 'tipo_espacio', "espacios_nuevos")
+        _entero(datos, 'capacidad', "espacios_nuevos", opcional=True)
+        _entero(datos, 'unidad', "espacios_nuevos", opcional=True)
+    for datos in _lista(escenario, 'disponibilidad_docentes'):
+        _entero(datos, 'docente', "disponibilidad_docentes")
+        bloques = datos.get('bloques')
+        if not isinstance(bloques, (list, tuple)):
+            raise ValueError("disponibilidad_docentes: 'bloques' debe ser una lista.")
+        for bloque in bloques:
+            _entero(bloque, 'bloque_horario', "disponibilidad_docentes")
+            _entero(bloque, 'preferencia', "disponibilidad_docentes", opcional=True)
+    for datos in _lista(escenario, 'grupos_nuevos'):
+        _entero(datos, 'materia', "grupos_nuevos")
+        _entero(datos, 'carrera', "grupos_nuevos")
+        _entero(datos, 'numero_estudiantes_estimado', "grupos_nuevos", opcional=True)
+        _entero(datos, 'docente_asignado_directamente', "grupos_nuevos", opcional=True)
+        if datos.get('turno_preferente') not in (None, '') + TURNOS_VALIDOS:
+            raise ValueError(f"grupos_nuevos: turnos válidos: {', '.join(TURNOS_VALIDOS)}.")
+
+
+def aplicar_escenario(generador, escenario):
+    """
+    Aplica el escenario sobre los datos que cargó generador._get_data_needed() y rehace los índices que
+    dependen de ellos. Solo lee de la BD (materias, carreras y tipos de espacio referenciados).
+    """
+    validar_escenario(escenario)
+    if not escenario:
+        return
+
+    # Espacios
+    excluidos = _ids(escenario, 'espacios_excluidos')
+    espacios = [e for e in generador.espacios_disponibles if e.espacio_id not in excluidos]
+    nuevos = _lista(escenario, 'espacios_nuevos')
+    tipos = TiposEspacio.objects.in_bulk({_entero(d, 'tipo_espacio', "espacios_nuevos") for d in nuevos})
+    for n, datos in enumerate(nuevos, start=1):
+        tipo = tipos.get(_entero(datos, 'tipo_espacio', "espacios_nuevos"))
+        if tipo is None:
+            raise ValueError(f"espacios_nuevos: el tipo de espacio {datos['tipo_espacio']} no existe.")
+        espacios.append(EspaciosFisicos(
+            espacio_id=-n, nombre_espacio=datos.get('nombre_espacio') or f"Espacio simulado {n}", tipo_espacio=tipo,
+            capacidad=_entero(datos, 'capacidad', "espacios_nuevos", opcional=True),
+            unidad_id=_entero(datos, 'unidad', "espacios_nuevos", opcional=True)
+        ))
+    generador.espacios_disponibles = espacios
+    generador._indexar_espacios()
+
+    # Docentes
+    excluidos = _ids(escenario, 'docentes_excluidos')
+    if excluidos:
+        generador.docentes_disponibles = [d for d in generador.docentes_disponibles if d.docente_id not in excluidos]
+        generador.docentes_por_id = {d.docente_id: d for d in generador.docentes_disponibles}
+        generador._candidatos_por_materia = {}
+
+    # Disponibilidad: se reemplaza la del docente en el periodo
+    bloques_por_id = {b.bloque_def_id: b for b in generador.bloques_horarios}
+    for datos in _lista(escenario, 'disponibilidad_docentes'):
+        docente_id = _entero(datos, 'docente', "disponibilidad_docentes")
+        generador.docente_disponibilidad_map = {
+            clave: preferencia for clave, preferencia in generador.docente_disponibilidad_map.items() if clave[0] != docente_id
+        }
+        for bloque in datos['bloques']:
+            definicion = bloques_por_id.get(_entero(bloque, 'bloque_horario', "disponibilidad_docentes"))
+            if definicion is None:
+                raise ValueError(f"disponibilidad_docentes: el bloque {bloque['bloque_horario']} no existe.")
+            preferencia = _entero(bloque, 'preferencia', "disponibilidad_docentes", opcional=True) or 0
+            generador.docente_disponibilidad_map[(docente_id, definicion.dia_semana, definicion.bloque_def_id)] = preferencia
+
+    # Grupos
+    excluidos = _ids(escenario, 'grupos_excluidos')
+    grupos = [g for g in generador.grupos_a_programar if g.grupo_id not in excluidos]
+    nuevos = _lista(escenario, 'grupos_nuevos')
+    materias = Materias.objects.in_bulk({_entero(d, 'materia', "grupos_nuevos") for d in nuevos})
+    carreras = Carrera.objects.in_bulk({_entero(d, 'carrera', "grupos_nuevos") for d in nuevos})
+    for n, datos in enumerate(nuevos, start=1):
+        materia = materias.get(_entero(datos, 'materia', "grupos_nuevos"))
+        carrera = carreras.get(_entero(datos, 'carrera', "grupos_nuevos"))
+        if materia is None or carrera is None:
+            raise ValueError(f"grupos_nuevos: la materia {datos['materia']} o la carrera {datos['carrera']} no existe.")
+        grupos.append(Grupos(
+            grupo_id=-n, codigo_grupo=datos.get('codigo_grupo') or f"SIM{n}", materia=materia, carrera=carrera,
+            periodo=generador.periodo,
+            numero_estudiantes_estimado=_entero(datos, 'numero_estudiantes_estimado', "grupos_nuevos", opcional=True),
+            turno_preferente=datos.get('turno_preferente') or None,
+            docente_asignado_directamente_id=_entero(datos, 'docente_asignado_directamente', "grupos_nuevos", opcional=True)
+        ))
+    generador.grupos_a_programar = grupos
+
+
+def diferencia_horarios(actuales, propuestas):
+    """
+    Compara dos listas de asignaciones (grupo_id, docente_id, espacio_id, dia_semana, bloque_id) como multiconjuntos
+    y devuelve las que se agregan, las que se eliminan, cuántas no cambian y los grupos con cambios.
+    """
+    restantes = {}
+    for asignacion in actuales:
+        restantes[asignacion] = restantes.get(asignacion, 0) + 1
+    agregadas = []
+    for asignacion in propuestas:
+        if restantes.get(asignacion):
+            restantes[asignacion] -= 1
+        else:
+            agregadas.append(asignacion)
+    eliminadas = [asignacion for asignacion, veces in restantes.items() for _ in range(veces)]
+    return {
+        "agregadas": [_como_dict(a) for a in agregadas],
+        "eliminadas": [_como_dict(a) for a in eliminadas],
+        "sin_cambios": len(propuestas) - len(agregadas),
+        "grupos_modificados": sorted({a[0] for a in agregadas} | {a[0] for a in eliminadas}),
+    }
+
+
+def _como_dict(asignacion):
+    grupo_id, docente_id, espacio_id, dia_semana, bloque_id = asignacion
+    return {
+        "grupo": grupo_id, "docente": docente_id, "espacio": espacio_id,
+        "dia_semana": dia_semana, "bloque_horario": bloque_id,
+    }
+
+
+def como_dicts(asignaciones):
+    """Asignaciones con los mismos nombres de campo que HorariosAsignados."""
+    return [_como_dict(a) for a in asignaciones]
@@ -1,69 +1,833 @@
-from apps.academic_setup.models import PeriodoAcademico, Materias, EspaciosFisicos
-from apps.users.models import Docentes
+import json
+import logging
+import math
+import os
+import random
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import models, transaction
+from apps.academic_setup.models import PeriodoAcademico, Materias, EspaciosFisicos, MateriaEspecialidadesRequeridas
+from apps.users.models import Docentes, DocenteEspecialidades
 from apps.scheduling.models import Grupos, DisponibilidadDocentes, HorariosAsignados, ConfiguracionRestricciones, BloquesHorariosDefinicion
 from .conflict_validator import ConflictValidatorService # Importar el validador
+from .backtracking_solver import BacktrackingSolver
+from .constraint_compiler import CompiledConstraints
+from .diagnostics import DiagnosticoInviabilidad
+from .instrumentation import MedidorFases
+from .interval_index import IndiceIntervalos
+from .local_search import LocalSearchOptimizer, BONO_TURNO_PREFERENTE
+from .scenario import aplicar_escenario, como_dicts, diferencia_horarios
+from .timetable_grid import registrar_cambio_horario
+from .decomposition import (
+    componentes_independientes, repartir_componentes, repartir_recursos, resolver_en_procesos,
+    resolver_arranques_en_procesos
+)
+
+logger = logging.getLogger(__name__)
+
+# Contadores de trabajo de la búsqueda que se informan por fase (ver MedidorFases)
+CONTADORES_BUSQUEDA = ("candidatos_evaluados", "conflictos_detectados")
+
+# Filas por INSERT al persistir el horario generado
+TAMANO_LOTE_INSERCION = 2000
+
+# Motores de búsqueda: "referencia" (bucles en Python), "numpy" (arreglos vectorizados) o
+# "backtracking" (MRV + forward checking con retroceso acotado)
+MOTORES_DISPONIBLES = ("referencia", "numpy", "backtracking")
+
+# AQ02: la generación no debe pasar de 10 minutos; es el presupuesto por defecto
+PRESUPUESTO_POR_DEFECTO_SEGUNDOS = 600
+
+# Capacidad con la que se ordenan los espacios sin capacidad registrada: se consideran aptos para cualquier grupo,
+# pero se prueban después de los que sí la tienen
+CAPACIDAD_DESCONOCIDA = float('inf')
+
+# Cada cuántos segundos se publica (vía progress_callback) el mejor horario parcial encontrado
+INTERVALO_CHECKPOINT_SEGUNDOS = 5
 
 class ScheduleGeneratorService:
-    def __init__(self, periodo: PeriodoAcademico):
+    def __init__(self, periodo: PeriodoAcademico, motor="referencia", procesos=1, segundos_mejora=0, semilla=None,
+                 time_budget_seconds=None, max_bloques_por_sesion=1, arranques=1, semillas=None, progress_callback=None):
+        if motor not in MOTORES_DISPONIBLES:
+            raise ValueError(f"Motor de generación no válido: {motor}. Opciones: {', '.join(MOTORES_DISPONIBLES)}.")
+        try:
+            procesos = int(procesos)
+        except (TypeError, ValueError):
+            procesos = 0
+        if procesos < 1:
+            raise ValueError("El número de procesos debe ser un entero mayor o igual a 1.")
+        try:
+            segundos_mejora = float(segundos_mejora or 0)
+        except (TypeError, ValueError):
+            segundos_mejora = -1
+        if not math.isfinite(segundos_mejora) or segundos_mejora < 0:
+            raise ValueError("Los segundos de mejora deben ser un número mayor o igual a 0.")
+        try:
+            time_budget_seconds = float(PRESUPUESTO_POR_DEFECTO_SEGUNDOS if time_budget_seconds is None else time_budget_seconds)
+        except (TypeError, ValueError):
+            time_budget_seconds = 0
+        if not math.isfinite(time_budget_seconds) or time_budget_seconds <= 0:
+            raise ValueError("El presupuesto de tiempo (time_budget_seconds) debe ser un número mayor a 0.")
+        try:
+            max_bloques_por_sesion = int(max_bloques_por_sesion or 1)
+        except (TypeError, ValueError):
+            max_bloques_por_sesion = 0
+        if max_bloques_por_sesion < 1:
+            raise ValueError("max_bloques_por_sesion debe ser un entero mayor o igual a 1.")
+        if max_bloques_por_sesion > 1 and (motor == "backtracking" or segundos_mejora > 0):
+            # El retroceso y la búsqueda local mueven bloques sueltos y romperían los tramos
+            raise ValueError("Las sesiones de varios bloques solo se admiten con los motores referencia y numpy, sin fase de mejora.")
+        if semillas is not None:
+            try:
+                if not isinstance(semillas, (list, tuple)) or not semillas:
+                    raise TypeError
+                semillas = [int(s) for s in semillas]
+            except (TypeError, ValueError):
+                raise ValueError("semillas debe ser una lista no vacía de enteros.")
+        else:
+            try:
+                arranques = int(arranques or 1)
+                # Semillas reproducibles: a partir de `semilla` (o de 0) si no se indican explícitamente
+                base = int(semilla) if semilla is not None else 0
+            except (TypeError, ValueError):
+                arranques = 0
+            if arranques < 1:
+                raise ValueError("El número de arranques debe ser un entero mayor o igual a 1 (y la semilla un entero).")
+            semillas = [base + i for i in range(arranques)] if arranques > 1 else None
         self.periodo = periodo
+        self.motor = motor
+        # Procesos para resolver en paralelo las componentes independientes (no más que los núcleos disponibles)
+        self.procesos = min(procesos, os.cpu_count() or 1)
+        self.motor_slots = None
+        # Bloques consecutivos por sesión (mismo día, docente y espacio); con más de 1 se usa IndiceIntervalos
+        self.max_bloques_por_sesion = max_bloques_por_sesion
+        self.indice_intervalos = None
+        # Segundos de la fase opcional de mejora por búsqueda local (0 = sin mejora) y semilla de su generador aleatorio
+        self.segundos_mejora = segundos_mejora
+        self.semilla = semilla
+        # Multi-arranque: una búsqueda por semilla (orden de grupos y desempates aleatorios), se queda la mejor
+        self.semillas = semillas
+        self._aleatorio = None
+        # Presupuesto total de la generación; el límite (perf_counter) se fija al iniciar cada ejecución
+        self.time_budget_seconds = time_budget_seconds
+        self.fin_presupuesto = None
+        # Tiempo, CPU, consultas SQL y contadores por fase de la última ejecución
+        self.medidor = MedidorFases()
+        # progress_callback(fase, porcentaje, stats) se invoca al cambiar de fase y tras cada grupo procesado
+        self.progress_callback = progress_callback
         self.validator = ConflictValidatorService(periodo=self.periodo)
         self.unresolved_conflicts = []
+        # Motivo estructurado por cada grupo que quedó sin programar o incompleto (ver DiagnosticoInviabilidad)
+        self.diagnosticos = []
+        self.diagnostico = None
         self.generation_stats = {"asignaciones_exitosas": 0, "intentos_fallidos": 0}
+        # Asignaciones generadas en memoria: (grupo_id, docente_id, espacio_id, dia_semana, bloque_id)
+        self.asignaciones = []
+        # Sesiones que faltan por grupo cuando solo se reubica parte del horario (ver regenerar_incremental)
+        self.sesiones_pendientes = {}
+        # Asignaciones que se conservan al reubicar (docente_id, espacio_id, grupo_id, dia_semana, bloque_id)
+        self.asignaciones_conservadas = ()
 
     def _get_data_needed(self):
         """Recopila todos los datos necesarios para la generación."""
         self.grupos_a_programar = Grupos.objects.filter(periodo=self.periodo).select_related('materia', 'carrera')
-        self.docentes_disponibles = Docentes.objects.prefetch_related(
-            'especialidades',
-            'disponibilidades__bloque_horario' # Para acceder a la disponibilidad del docente
-        ).all() # Podrías filtrar por unidad académica si es relevante
-        self.espacios_disponibles = EspaciosFisicos.objects.select_related('tipo_espacio').all() # Filtrar por unidad si es necesario
-        self.bloques_horarios = BloquesHorariosDefinicion.objects.filter(
+        self.docentes_disponibles = list(Docentes.objects.order_by('docente_id')) # Podrías filtrar por unidad académica si es relevante
+        self.docentes_por_id = {d.docente_id: d for d in self.docentes_disponibles}
+        # Índices invertidos para elegir candidatos sin consultas dentro del bucle (RU05, RD16)
+        self.docentes_por_especialidad = defaultdict(set) # { especialidad_id: {docente_id, ...} }
+        for docente_id, especialidad_id in DocenteEspecialidades.objects.values_list('docente_id', 'especialidad_id'):
+            self.docentes_por_especialidad[especialidad_id].add(docente_id)
+        self.especialidades_por_materia = defaultdict(set) # { materia_id: {especialidad_id, ...} }
+        for materia_id, especialidad_id in MateriaEspecialidadesRequeridas.objects.values_list('materia_id', 'especialidad_id'):
+            self.especialidades_por_materia[materia_id].add(especialidad_id)
+        self._candidatos_por_materia = {}
+        self.espacios_disponibles = list(EspaciosFisicos.objects.select_related('tipo_espacio').order_by('espacio_id')) # Filtrar por unidad si es necesario
+        self._indexar_espacios()
+        self.bloques_horarios = list(BloquesHorariosDefinicion.objects.filter(
             # Filtra por días laborables configurados, ej. L-V o L-S (RU13)
-        ).order_by('dia_semana', 'hora_inicio')
+        ).order_by('dia_semana', 'hora_inicio', 'bloque_def_id'))
+        self._bloques_por_slot = {(b.dia_semana, b.bloque_def_id): b for b in self.bloques_horarios}
         self.restricciones_configuradas = ConfiguracionRestricciones.objects.filter(
             (models.Q(periodo_aplicable=self.periodo) | models.Q(periodo_aplicable__isnull=True)),
             esta_activa=True
         )
+        self._compilar_restricciones()
         # Cargar disponibilidad de docentes para el periodo
-        self.docente_disponibilidad_map = self._map_docente_disponibilidad()
+        with self.medidor.subfase("disponibilidad"):
+            self.docente_disponibilidad_map = self._map_docente_disponibilidad()
         # ... y otros datos que necesites pre-procesar
 
+    def _compilar_restricciones(self):
+        """Compila restricciones_configuradas a máscaras por entidad; el validador las usa para los bloqueos de espacios."""
+        self.restricciones = CompiledConstraints(self.restricciones_configuradas, self.bloques_horarios)
+        self.validator.cargar_restricciones(self.restricciones)
+        if self.restricciones.errores:
+            self.generation_stats["restricciones_invalidas"] = len(self.restricciones.errores)
+            for codigo, motivo in self.restricciones.errores:
+                self.unresolved_conflicts.append(f"Restricción {codigo} ignorada: {motivo}")
+
     def _map_docente_disponibilidad(self):
         """Crea un mapa de fácil acceso para la disponibilidad de docentes."""
+        # Solo las columnas que se usan: la consulta se resuelve con el índice parcial disp_periodo_activa_idx
         disponibilidades = DisponibilidadDocentes.objects.filter(periodo=self.periodo, esta_disponible=True) \
-            .select_related('docente', 'bloque_horario')
+            .values_list('docente_id', 'dia_semana', 'bloque_horario_id', 'preferencia')
 
         dispo_map = {} # { (docente_id, dia_semana, bloque_id): preferencia }
-        for d in disponibilidades:
-            key = (d.docente_id, d.dia_semana, d.bloque_horario_id)
-            dispo_map[key] = d.preferencia
+        for docente_id, dia_semana, bloque_id, preferencia in disponibilidades:
+            dispo_map[(docente_id, dia_semana, bloque_id)] = preferencia
         return dispo_map
 
+    def _docentes_candidatos(self, grupo):
+        """Docentes con alguna especialidad requerida por la materia; el docente pre-asignado va primero."""
+        materia_id = grupo.materia_id
+        if materia_id not in self._candidatos_por_materia:
+            ids = set().union(*(
+                self.docentes_por_especialidad.get(especialidad_id, ())
+                for especialidad_id in self.especialidades_por_materia.get(materia_id, ())
+            ))
+            self._candidatos_por_materia[materia_id] = [
+                self.docentes_por_id[docente_id] for docente_id in sorted(ids) if docente_id in self.docentes_por_id
+            ]
+            if self._aleatorio is not None: # Desempate aleatorio entre docentes en el multi-arranque
+                self._aleatorio.shuffle(self._candidatos_por_materia[materia_id])
+        candidatos = self._candidatos_por_materia[materia_id]
+
+        directo_id = grupo.docente_asignado_directamente_id
+        if directo_id in self.docentes_por_id: # Priorizar docente pre-asignado
+            candidatos = [self.docentes_por_id[directo_id]] + [d for d in candidatos if d.docente_id != directo_id]
+        return candidatos
+
+    def _sesiones_requeridas(self, grupo):
+        """Sesiones (bloques) que hay que programar para el grupo en esta ejecución."""
+        if grupo.grupo_id in self.sesiones_pendientes:
+            return self.sesiones_pendientes[grupo.grupo_id]
+        return int(grupo.materia.horas_totales)
+
+    def _tramos_requeridos(self, grupo):
+        """
+        Reparte las sesiones requeridas en tramos de bloques consecutivos de a lo sumo max_bloques_por_sesion,
+        lo más parejos posible (p. ej. 5 horas con máximo 4 -> [3, 2]).
+        """
+        total = self._sesiones_requeridas(grupo)
+        if total <= 0:
+            return []
+        cantidad = -(-total // self.max_bloques_por_sesion)
+        base, resto = divmod(total, cantidad)
+        return [base + 1] * resto + [base] * (cantidad - resto)
+
     def _es_docente_disponible(self, docente_id, dia_semana, bloque_id):
         return (docente_id, dia_semana, bloque_id) in self.docente_disponibilidad_map
 
-    def _cumple_restricciones_docente(self, docente, dia_semana, bloque_horario, materia):
-        # Verificar especialidad del docente vs materia (RU05, RD16)
+    def _cumple_restricciones_docente(self, docente, dia_semana, bloque_horario, materia, grupo=None):
+        # La especialidad del docente vs materia ya se filtra en _docentes_candidatos (RU05, RD16)
         # Verificar carga horaria máxima (RD23, RG02)
-        # Verificar otras restricciones específicas del docente (RD03)
-        # ...
-        return True
+        # Restricciones configuradas de bloques: globales, del docente (RD03), de la materia y de la carrera
+        carrera_id = grupo.carrera_id if grupo is not None else None
+        return self.restricciones.permite_clase(
+            docente.docente_id, materia.materia_id, carrera_id, dia_semana, bloque_horario.bloque_def_id
+        )
 
     def _cumple_restricciones_espacio(self, espacio, materia, grupo):
         # Verificar tipo de espacio requerido por la materia (RU08, RG03, RD07)
+        tipo_requerido = self.restricciones.tipo_espacio_requerido(materia)
+        if tipo_requerido is not None and espacio.tipo_espacio_id != tipo_requerido:
+            return False
         # Verificar capacidad del espacio vs tamaño del grupo
-        # ...
+        if espacio.capacidad is not None and espacio.capacidad < (grupo.numero_estudiantes_estimado or 0):
+            return False
         return True
 
+    def _indexar_espacios(self):
+        """
+        Índice de espacios por tipo (y uno con todos, clave None) ordenados por capacidad ascendente, con la lista
+        de capacidades en paralelo para cortar con bisect los que no alcanzan el tamaño del grupo.
+        """
+        ordenados = sorted(
+            self.espacios_disponibles,
+            key=lambda e: (CAPACIDAD_DESCONOCIDA if e.capacidad is None else e.capacidad, e.espacio_id)
+        )
+        por_tipo = defaultdict(list)
+        for espacio in ordenados:
+            por_tipo[espacio.tipo_espacio_id].append(espacio)
+        por_tipo[None] = ordenados
+        self.espacios_por_tipo = {
+            tipo_id: ([CAPACIDAD_DESCONOCIDA if e.capacidad is None else e.capacidad for e in espacios], espacios)
+            for tipo_id, espacios in por_tipo.items()
+        }
+        self._espacios_por_clave = {}
+
+    def _espacios_candidatos(self, grupo, materia):
+        """Espacios aptos para el grupo, del más chico al más grande (no se desperdician aulas grandes en grupos chicos)."""
+        tipo_requerido = self.restricciones.tipo_espacio_requerido(materia)
+        minimo = grupo.numero_estudiantes_estimado or 0
+        clave = (tipo_requerido, minimo)
+        if clave not in self._espacios_por_clave:
+            capacidades, espacios = self.espacios_por_tipo.get(tipo_requerido, ((), ()))
+            self._espacios_por_clave[clave] = [
+                e for e in espacios[bisect_left(capacidades, minimo):] if self._cumple_restricciones_espacio(e, materia, grupo)
+            ]
+        return self._espacios_por_clave[clave]
+
+    def _buscar_mejor_opcion_referencia(self, grupo, materia, docentes_candidatos):
+        """Motor de referencia: recorre docente x espacio x bloque y se queda con el primer slot de mayor puntaje."""
+        mejor_opcion = None
+        mejor_score = -float('inf')
+        espacios_candidatos = self._espacios_candidatos(grupo, materia)
+        conflictos = 0
+
+        for docente_cand in docentes_candidatos:
+            for espacio_cand in espacios_candidatos:
+                for bloque_cand in self.bloques_horarios:
+                    # Verificar si el slot ya está ocupado o si hay conflicto
+                    if self.validator.check_slot_conflict(
+                            docente_id=docente_cand.docente_id,
+                            espacio_id=espacio_cand.espacio_id,
+                            grupo_id=grupo.grupo_id, # Para evitar que el mismo grupo se programe dos veces en el mismo slot
+                            dia_semana=bloque_cand.dia_semana,
+                            bloque_id=bloque_cand.bloque_def_id
+                    ):
+                        conflictos += 1
+                        continue
+
+                    if not self._es_docente_disponible(docente_cand.docente_id, bloque_cand.dia_semana, bloque_cand.bloque_def_id):
+                        continue
+
+                    if not self._cumple_restricciones_docente(docente_cand, bloque_cand.dia_semana, bloque_cand, materia, grupo):
+                        continue
+
+                    # Aquí podrías añadir un score basado en preferencias, etc.
+                    score_actual = self.docente_disponibilidad_map.get((docente_cand.docente_id, bloque_cand.dia_semana, bloque_cand.bloque_def_id), 0)
+
+                    if score_actual > mejor_score:
+                        mejor_score = score_actual
+                        mejor_opcion = {
+                            "grupo": grupo, "docente": docente_cand, "espacio": espacio_cand,
+                            "dia_semana": bloque_cand.dia_semana, "bloque_horario": bloque_cand
+                        }
+        self._contar("candidatos_evaluados", len(docentes_candidatos) * len(espacios_candidatos) * len(self.bloques_horarios))
+        self._contar("conflictos_detectados", conflictos)
+        return mejor_opcion
+
+    def _buscar_mejor_opcion(self, grupo, materia, docentes_candidatos):
+        if self.motor_slots is not None:
+            return self.motor_slots.buscar_mejor_opcion(grupo, materia, docentes_candidatos)
+        return self._buscar_mejor_opcion_referencia(grupo, materia, docentes_candidatos)
+
+    def _marcar_asignacion(self, opcion):
+        """Registra la asignación en memoria y marca el slot como usado en el validador y en el motor."""
+        asignacion = (
+            opcion["grupo"].grupo_id,
+            opcion["docente"].docente_id,
+            opcion["espacio"].espacio_id,
+            opcion["dia_semana"],
+            opcion["bloque_horario"].bloque_def_id
+        )
+        self.asignaciones.append(asignacion)
+        grupo_id, docente_id, espacio_id, dia_semana, bloque_id = asignacion
+        # Marcar el slot como usado para el validador en esta sesión de generación
+        self.validator.mark_slot_used(
+            docente_id=docente_id, espacio_id=espacio_id, grupo_id=grupo_id,
+            dia_semana=dia_semana, bloque_id=bloque_id
+        )
+        if self.motor_slots is not None:
+            self.motor_slots.mark_slot_used(
+                docente_id=docente_id, espacio_id=espacio_id, grupo_id=grupo_id,
+                dia_semana=dia_semana, bloque_id=bloque_id
+            )
+        if self.indice_intervalos is not None:
+            self.indice_intervalos.marcar(
+                docente_id=docente_id, espacio_id=espacio_id, grupo_id=grupo_id,
+                dia_semana=dia_semana, bloque_id=bloque_id
+            )
+
+    def _preparar_motor(self):
+        """Estructuras del motor elegido, construidas sobre la ocupación ya cargada en el validador."""
+        self.diagnostico = DiagnosticoInviabilidad(self, self.asignaciones_conservadas)
+        if self.max_bloques_por_sesion > 1:
+            # Los tramos de varios bloques se buscan siempre con el índice de intervalos, con ambos motores
+            self.indice_intervalos = IndiceIntervalos(self)
+        elif self.motor == "numpy":
+            from .numpy_engine import NumpySlotEngine # numpy solo se necesita con este motor
+            self.motor_slots = NumpySlotEngine(self)
+
+    def _liberar_motor(self):
+        self.motor_slots = None
+        self.indice_intervalos = None
+        self.diagnostico = None
+
+    def _registrar_inviable(self, grupo, motivo=None, bloques_tramo=1):
+        """Agrega a self.diagnosticos el motivo por el que el grupo quedó sin completar."""
+        if self.diagnostico is None:
+            self.diagnostico = DiagnosticoInviabilidad(self, self.asignaciones_conservadas)
+        self.diagnosticos.append(self.diagnostico.diagnosticar(grupo, motivo=motivo, bloques_tramo=bloques_tramo))
+
+    def _registrar_motivos(self):
+        motivos = defaultdict(int)
+        for diagnostico in self.diagnosticos:
+            motivos[diagnostico["motivo"]] += 1
+        self.generation_stats["motivos_no_programados"] = dict(motivos)
+
+    def _contar(self, clave, n=1):
+        """Incrementa un contador de trabajo en las stats (se suman entre procesos) y en la fase en curso."""
+        self.generation_stats[clave] = self.generation_stats.get(clave, 0) + n
+        self.medidor.contar(clave, n)
+
+    def _reportar_progreso(self, fase, porcentaje):
+        if fase != self.medidor.fase_actual:
+            self.medidor.cambiar(fase)
+        if self.progress_callback is not None:
+            self.progress_callback(fase, porcentaje, dict(self.generation_stats))
+
+    # --- Presupuesto de tiempo (AQ02) ----------------------------------------------------------------
+
+    def _iniciar_presupuesto(self):
+        ahora = time.perf_counter()
+        self.fin_presupuesto = ahora + self.time_budget_seconds
+        self._ultimo_checkpoint = ahora
+
+    def _segundos_restantes(self):
+        if self.fin_presupuesto is None:
+            return float('inf')
+        return max(self.fin_presupuesto - time.perf_counter(), 0.0)
+
+    def _presupuesto_agotado(self):
+        return self.fin_presupuesto is not None and time.perf_counter() >= self.fin_presupuesto
+
+    def _checkpoint(self, porcentaje):
+        """Publica periódicamente el mejor horario parcial encontrado (lo ya asignado en memoria)."""
+        if self.progress_callback is None:
+            return
+        ahora = time.perf_counter()
+        if ahora - self._ultimo_checkpoint < INTERVALO_CHECKPOINT_SEGUNDOS:
+            return
+        self._ultimo_checkpoint = ahora
+        self.generation_stats["checkpoints"] = self.generation_stats.get("checkpoints", 0) + 1
+        self.generation_stats["asignaciones_en_checkpoint"] = len(self.asignaciones)
+        self._reportar_progreso(self.medidor.fase_actual or "busqueda", porcentaje)
+
+    def _registrar_presupuesto(self):
+        self.medidor.cambiar(None)
+        self.generation_stats["presupuesto_segundos"] = self.time_budget_seconds
+        self.generation_stats["presupuesto_agotado"] = self._presupuesto_agotado()
+        self.generation_stats["presupuesto_por_fase"] = {
+            fase: {"segundos": round(segundos, 3), "porcentaje": round(100 * segundos / self.time_budget_seconds, 2)}
+            for fase, segundos in self.medidor.segundos_por_fase().items()
+        }
+
+    def _registrar_metricas(self, operacion):
+        """Agrega las mediciones por fase a las stats y, si HORARIOS_REGISTRAR_METRICAS está activo, las registra."""
+        self.medidor.cambiar(None)
+        self.generation_stats["fases"] = self.medidor.resumen()
+        if getattr(settings, 'HORARIOS_REGISTRAR_METRICAS', False):
+            logger.info(json.dumps({
+                "evento": "metricas_generacion_horarios", "operacion": operacion,
+                "periodo_id": self.periodo.pk, "motor": self.motor, "procesos": self.procesos,
+                "stats": self.generation_stats,
+            }, default=str))
+
+    def _persistir_asignaciones(self):
+        """Reemplaza los horarios del periodo por las asignaciones generadas en una sola transacción."""
+        with transaction.atomic():
+            # Borrado en un solo DELETE: ningún modelo depende de HorariosAsignados ni hay señales, así que
+            # Django no necesita cargar las filas para resolver cascadas
+            HorariosAsignados.objects.filter(periodo=self.periodo).delete()
+            self._insertar_asignaciones()
+            registrar_cambio_horario(self.periodo.pk)
+
+    def _insertar_asignaciones(self):
+        HorariosAsignados.objects.bulk_create(
+            [
+                HorariosAsignados(
+                    grupo_id=grupo_id, docente_id=docente_id, espacio_id=espacio_id,
+                    periodo=self.periodo, dia_semana=dia_semana, bloque_horario_id=bloque_id
+                )
+                for grupo_id, docente_id, espacio_id, dia_semana, bloque_id in self.asignaciones
+            ],
+            batch_size=TAMANO_LOTE_INSERCION
+        )
+
+    def _programar_grupos(self, grupos, reportar_progreso=False):
+        if self.motor == "backtracking":
+            self._programar_backtracking(grupos, reportar_progreso)
+        else:
+            self._programar_grupos_voraz(grupos, reportar_progreso)
+
+    def _programar_backtracking(self, grupos, reportar_progreso=False):
+        """Programa los grupos con BacktrackingSolver y acumula asignaciones, stats y conflictos."""
+        solver = BacktrackingSolver(self)
+        on_progress = (lambda porcentaje: self._reportar_progreso("busqueda", porcentaje)) if reportar_progreso else None
+        asignaciones, descartados = solver.resolver(grupos, on_progress=on_progress, fin=self.fin_presupuesto)
+        for asignacion in asignaciones:
+            grupo_id, docente_id, espacio_id, dia_semana, bloque_id = asignacion
+            self.asignaciones.append(asignacion)
+            self.validator.mark_slot_used(
+                docente_id=docente_id, espacio_id=espacio_id, grupo_id=grupo_id,
+                dia_semana=dia_semana, bloque_id=bloque_id
+            )
+        self.generation_stats["asignaciones_exitosas"] += len(asignaciones)
+
+        descartados = set(descartados)
+        for grupo in grupos:
+            if grupo.grupo_id in descartados:
+                self.unresolved_conflicts.append(f"No se pudo asignar una sesión para el grupo {grupo.codigo_grupo} (materia: {grupo.materia.nombre_materia}).")
+                self._registrar_inviable(grupo)
+                self.generation_stats["intentos_fallidos"] += 1
+                self.generation_stats["grupos_no_programados"] += 1
+            else:
+                self.generation_stats["grupos_programados"] += 1
+        for clave in ("nodos_explorados", "podas", "retrocesos"):
+            self.generation_stats[clave] = self.generation_stats.get(clave, 0) + solver.stats[clave]
+        if reportar_progreso:
+            self._reportar_progreso("busqueda", 100)
+
+    def _programar_grupos_voraz(self, grupos, reportar_progreso=False):
+        """Bucle voraz: asigna las sesiones de cada grupo en orden y acumula asignaciones, stats y conflictos."""
+        for indice_grupo, grupo in enumerate(grupos, start=1):
+            if self._presupuesto_agotado():
+                # Se detiene entre grupos: lo asignado hasta aquí es el mejor horario parcial y se conserva
+                for pendiente in grupos[indice_grupo - 1:]:
+                    self.unresolved_conflicts.append(f"No se programó el grupo {pendiente.codigo_grupo} (materia: {pendiente.materia.nombre_materia}): se agotó el presupuesto de tiempo.")
+                    self._registrar_inviable(pendiente, motivo="presupuesto_agotado")
+                    self.generation_stats["grupos_no_programados"] += 1
+                break
+            materia = grupo.materia
+            horas_necesarias = self._sesiones_requeridas(grupo) # Asumimos que cada bloque cubre 1 hora, simplificación
+            asignaciones_hechas_para_grupo = 0
+
+            # Determinar docentes candidatos para esta materia/grupo
+            docentes_candidatos = self._docentes_candidatos(grupo)
+
+            if self.indice_intervalos is not None:
+                asignaciones_hechas_para_grupo = self._programar_tramos(grupo, materia, docentes_candidatos)
+            else:
+                # Iterar hasta cubrir las horas necesarias o no encontrar más slots
+                for _ in range(int(horas_necesarias)): # Simplificación: cada iteración es 1 hora/bloque
+                    if asignaciones_hechas_para_grupo >= horas_necesarias:
+                        break
+
+                    mejor_opcion = self._buscar_mejor_opcion(grupo, materia, docentes_candidatos)
+
+                    if mejor_opcion:
+                        self._marcar_asignacion(mejor_opcion)
+                        asignaciones_hechas_para_grupo += 1 # O las horas que cubre el bloque
+                        self.generation_stats["asignaciones_exitosas"] += 1
+                    else:
+                        self.unresolved_conflicts.append(f"No se pudo asignar una sesión para el grupo {grupo.codigo_grupo} (materia: {materia.nombre_materia}).")
+                        self._registrar_inviable(grupo)
+                        self.generation_stats["intentos_fallidos"] += 1 # Para esta sesión/hora del grupo
+                        break # No se pudo asignar una hora para este grupo, pasar al siguiente o registrar
+
+
+            if asignaciones_hechas_para_grupo >= horas_necesarias:
+                self.generation_stats["grupos_programados"] += 1
+            else:
+                self.generation_stats["grupos_no_programados"] += 1
+            if reportar_progreso:
+                self._reportar_progreso("busqueda", 100 * indice_grupo // len(grupos))
+                self._checkpoint(100 * indice_grupo // len(grupos))
+
+    def _programar_tramos(self, grupo, materia, docentes_candidatos):
+        """Sesiones de varios bloques consecutivos: cada tramo con el mismo docente y espacio. Devuelve los bloques asignados."""
+        asignados = 0
+        for bloques_tramo in self._tramos_requeridos(grupo):
+            tramo = self.indice_intervalos.buscar_mejor_tramo(grupo, materia, docentes_candidatos, bloques_tramo)
+            if tramo is None:
+                self.unresolved_conflicts.append(f"No se pudo asignar una sesión de {bloques_tramo} bloques consecutivos para el grupo {grupo.codigo_grupo} (materia: {materia.nombre_materia}).")
+                self._registrar_inviable(grupo, bloques_tramo=bloques_tramo)
+                self.generation_stats["intentos_fallidos"] += 1
+                break
+            for bloque in tramo["bloques"]:
+                self._marcar_asignacion({**tramo, "bloque_horario": bloque})
+            asignados += bloques_tramo
+            self.generation_stats["asignaciones_exitosas"] += bloques_tramo
+            self.generation_stats["tramos_asignados"] = self.generation_stats.get("tramos_asignados", 0) + 1
+        return asignados
+
+    def _programar_en_paralelo(self, grupos):
+        """
+        Reparte los grupos en particiones y resuelve cada una en un proceso distinto; las asignaciones se unen aquí
+        y se persisten en una sola escritura. Si los grupos forman componentes que no comparten docentes ni espacios
+        candidatos, cada partición es un conjunto de componentes y el resultado es el mismo que el del bucle
+        secuencial. Si no (lo habitual: los docentes de una especialidad enseñan en varias carreras), se particiona
+        por unidad académica y cada partición usa solo sus recursos (ver _particiones_por_unidad); los grupos que
+        no se completan así se reintentan al final, en este proceso, con todos los recursos.
+        """
+        componentes = componentes_independientes(
+            grupos, lambda g: self._recursos_candidatos(g)
+        )
+        self.generation_stats["componentes_independientes"] = len(componentes)
+        particiones = [(indices, None, None) for indices in repartir_componentes(componentes, self.procesos)]
+        if len(particiones) <= 1:
+            particiones = self._particiones_por_unidad(grupos)
+        if len(particiones) <= 1:
+            self._programar_grupos(grupos, reportar_progreso=True)
+            return
+        self.generation_stats["particiones"] = len(particiones)
+
+        # Se unen en el orden de las particiones, no en el que terminan: el resultado no depende de los procesos
+        resultados = {}
+        for k, resultado in resolver_en_procesos(self, grupos, particiones):
+            resultados[k] = resultado
+            self._reportar_progreso("busqueda", 100 * len(resultados) // len(particiones))
+
+        grupos_por_id = {g.grupo_id: g for g in grupos}
+        reintentar = set()
+        for k in range(len(particiones)):
+            asignaciones, stats, conflictos, diagnosticos = resultados[k]
+            if particiones[k][1] is not None:
+                # Partición con recursos propios: sus grupos incompletos se descartan (asignaciones parciales,
+                # conflictos y diagnósticos, que van de a pares) y se reintentan con todos los recursos
+                incompletos = {d["grupo_id"] for d in diagnosticos}
+                descartadas = [a for a in asignaciones if a[0] in incompletos]
+                asignaciones = [a for a in asignaciones if a[0] not in incompletos]
+                pares = [(c, d) for c, d in zip(conflictos, diagnosticos) if d["grupo_id"] not in incompletos]
+                conflictos, diagnosticos = [c for c, _ in pares], [d for _, d in pares]
+                stats["grupos_no_programados"] -= len(incompletos)
+                stats["asignaciones_exitosas"] -= len(descartadas)
+                if "tramos_asignados" in stats:
+                    stats["tramos_asignados"] -= self._tramos_completos(descartadas, grupos_por_id)
+                reintentar |= incompletos
+            self.asignaciones.extend(asignaciones)
+            for clave, valor in stats.items():
+                self.generation_stats[clave] = self.generation_stats.get(clave, 0) + valor
+                if clave in CONTADORES_BUSQUEDA:
+                    self.medidor.contar(clave, valor)
+            self.unresolved_conflicts.extend(conflictos)
+            self.diagnosticos.extend(diagnosticos)
+
+        if reintentar:
+            self.generation_stats["grupos_reintentados"] = len(reintentar)
+            # El validador y el motor parten del horario unido de todas las particiones
+            self.validator.clear_session_assignments(recargar_ocupacion=False)
+            for grupo_id, docente_id, espacio_id, dia_semana, bloque_id in self.asignaciones:
+                self.validator.mark_slot_used(
+                    docente_id=docente_id, espacio_id=espacio_id, grupo_id=grupo_id,
+                    dia_semana=dia_semana, bloque_id=bloque_id
+                )
+            self._preparar_motor()
+            self._programar_grupos([g for g in grupos if g.grupo_id in reintentar])
+
+    def _particiones_por_unidad(self, grupos):
+        """
+        Particiones para cuando los grupos comparten recursos: los grupos se agrupan por la unidad académica de su
+        carrera (las unidades se reparten en a lo sumo `procesos` particiones) y cada docente y espacio candidato
+        queda en una sola partición, la de su unidad si la necesita (ver repartir_recursos). Como las particiones no
+        comparten recursos, sus horarios se unen sin cruces. Devuelve [(índices, docente_ids, espacio_ids)], o []
+        si todos los grupos son de una misma unidad.
+        """
+        por_unidad = defaultdict(list)
+        for i, grupo in enumerate(grupos):
+            por_unidad[grupo.carrera.unidad_id].append(i)
+        particiones = repartir_componentes(list(por_unidad.values()), self.procesos)
+        if len(particiones) <= 1:
+            return []
+        particion_de_unidad = {}
+        for k, indices in enumerate(particiones):
+            for i in indices:
+                particion_de_unidad[grupos[i].carrera.unidad_id] = k
+
+        demanda = defaultdict(lambda: [0] * len(particiones)) # { recurso: grupos candidatos por partición }
+        for k, indices in enumerate(particiones):
+            for i in indices:
+                for recurso in self._recursos_candidatos(grupos[i]):
+                    demanda[recurso][k] += 1
+        espacios_por_id = {e.espacio_id: e for e in self.espacios_disponibles}
+
+        def unidad(recurso):
+            tipo, recurso_id = recurso
+            if tipo == "docente":
+                return self.docentes_por_id[recurso_id].unidad_principal_id
+            return espacios_por_id[recurso_id].unidad_id
+
+        def propia(recurso):
+            # Los recursos sin unidad (p. ej. espacios compartidos) se reparten según la demanda
+            return None if unidad(recurso) is None else particion_de_unidad.get(unidad(recurso))
+
+        def clase(recurso):
+            tipo, recurso_id = recurso
+            return (tipo, espacios_por_id[recurso_id].tipo_espacio_id if tipo == "espacio" else None)
+
+        recursos = repartir_recursos(demanda, propia, clase, len(particiones))
+        return [
+            (indices, {i for tipo, i in propios if tipo == "docente"}, {i for tipo, i in propios if tipo == "espacio"})
+            for indices, propios in zip(particiones, recursos)
+        ]
+
+    def _tramos_completos(self, asignaciones, grupos_por_id):
+        """Cuántos tramos completos forman las asignaciones de cada grupo (se agregan tramo por tramo, en orden)."""
+        por_grupo = defaultdict(int)
+        for asignacion in asignaciones:
+            por_grupo[asignacion[0]] += 1
+        tramos = 0
+        for grupo_id, asignadas in por_grupo.items():
+            for bloques_tramo in self._tramos_requeridos(grupos_por_id[grupo_id]):
+                if asignadas < bloques_tramo:
+                    break
+                asignadas -= bloques_tramo
+                tramos += 1
+        return tramos
+
+    def _puntaje_asignaciones(self, asignaciones):
+        """Preferencia del docente por cada bloque más el bono de turno preferente (mismo puntaje que la fase de mejora)."""
+        grupos_por_id = {g.grupo_id: g for g in self.grupos_a_programar}
+        puntaje = 0
+        for grupo_id, docente_id, _, dia_semana, bloque_id in asignaciones:
+            puntaje += self.docente_disponibilidad_map.get((docente_id, dia_semana, bloque_id), 0)
+            turno_preferente = grupos_por_id[grupo_id].turno_preferente
+            if turno_preferente and self._bloques_por_slot[(dia_semana, bloque_id)].turno == turno_preferente:
+                puntaje += BONO_TURNO_PREFERENTE
+        return puntaje
+
+    def _ejecutar_arranque(self, grupos, semilla):
+        """
+        Una búsqueda completa desde la ocupación inicial con el orden de grupos, de docentes candidatos y de bloques
+        barajado con `semilla`. Devuelve (asignaciones, stats, conflictos, diagnosticos, puntaje) y deja los datos
+        como estaban.
+        """
+        stats_previas = dict(self.generation_stats)
+        bloques_originales = self.bloques_horarios
+        self.asignaciones, self.unresolved_conflicts, self.diagnosticos = [], [], []
+        self.validator.clear_session_assignments(recargar_ocupacion=False)
+        self._aleatorio = random.Random(semilla)
+        try:
+            orden = list(grupos)
+            self._aleatorio.shuffle(orden)
+            self.bloques_horarios = list(bloques_originales)
+            self._aleatorio.shuffle(self.bloques_horarios)
+            self._candidatos_por_materia = {}
+            self._preparar_motor()
+            self._programar_grupos(orden)
+        finally:
+            self._aleatorio = None
+            self.bloques_horarios = bloques_originales
+            self._candidatos_por_materia = {}
+            self._liberar_motor()
+        stats = {
+            clave: valor - stats_previas.get(clave, 0)
+            for clave, valor in self.generation_stats.items() if isinstance(valor, int)
+        }
+        self.generation_stats = stats_previas
+        return (
+            self.asignaciones, stats, self.unresolved_conflicts, self.diagnosticos,
+            self._puntaje_asignaciones(self.asignaciones)
+        )
+
+    def _programar_multi_arranque(self, grupos):
+        """
+        Corre una búsqueda por semilla (en procesos si hay más de uno) con el presupuesto de tiempo compartido y
+        se queda con la que programa más grupos y, a igualdad, con la de mayor puntaje de preferencias.
+        """
+        en_procesos = self.procesos > 1
+        if en_procesos:
+            resultados = resolver_arranques_en_procesos(self, grupos, self.semillas, self.procesos)
+        else:
+            resultados = (
+                (semilla, *self._ejecutar_arranque(grupos, semilla))
+                for semilla in self.semillas if not self._presupuesto_agotado()
+            )
+
+        mejor, resumen = None, []
+        for n, (semilla, asignaciones, stats, conflictos, diagnosticos, puntaje) in enumerate(resultados, start=1):
+            resumen.append({
+                "semilla": semilla, "grupos_programados": stats.get("grupos_programados", 0),
+                "asignaciones": len(asignaciones), "puntaje": puntaje,
+            })
+            # El trabajo de búsqueda se suma para todos los arranques; el resultado es solo el del mejor
+            # (en este proceso el medidor ya lo contó al correr cada arranque)
+            for clave in CONTADORES_BUSQUEDA:
+                if clave in stats:
+                    valor = stats.pop(clave)
+                    self.generation_stats[clave] = self.generation_stats.get(clave, 0) + valor
+                    if en_procesos:
+                        self.medidor.contar(clave, valor)
+            clave_orden = (stats.get("grupos_programados", 0), puntaje, -self.semillas.index(semilla))
+            if mejor is None or clave_orden > mejor[0]:
+                mejor = (clave_orden, semilla, asignaciones, stats, conflictos, diagnosticos)
+            self._reportar_progreso("busqueda", 100 * n // len(self.semillas))
+
+        self.asignaciones, self.unresolved_conflicts, self.diagnosticos = [], [], []
+        if mejor is not None:
+            _, semilla, self.asignaciones, stats, self.unresolved_conflicts, self.diagnosticos = mejor
+            for clave, valor in stats.items():
+                self.generation_stats[clave] = self.generation_stats.get(clave, 0) + valor
+            self.generation_stats["semilla_ganadora"] = semilla
+        # En procesos los arranques llegan según terminan: el resumen sigue el orden de las semillas
+        self.generation_stats["arranques"] = sorted(resumen, key=lambda arranque: self.semillas.index(arranque["semilla"]))
+        # El validador y el motor reflejan el horario elegido (lo necesita la fase de mejora)
+        self.validator.clear_session_assignments(recargar_ocupacion=False)
+        for grupo_id, docente_id, espacio_id, dia_semana, bloque_id in self.asignaciones:
+            self.validator.mark_slot_used(
+                docente_id=docente_id, espacio_id=espacio_id, grupo_id=grupo_id,
+                dia_semana=dia_semana, bloque_id=bloque_id
+            )
+
+    def _recursos_candidatos(self, grupo):
+        """Docentes y espacios que el grupo podría usar; define las aristas del grafo de recursos compartidos."""
+        docentes = [("docente", d.docente_id) for d in self._docentes_candidatos(grupo)]
+        espacios = [("espacio", e.espacio_id) for e in self._espacios_candidatos(grupo, grupo.materia)]
+        return docentes + espacios
+
+    def _mejorar_asignaciones(self, grupos):
+        """Fase de mejora: sube el puntaje de preferencias del horario sin cambiar qué sesiones quedaron programadas."""
+        optimizador = LocalSearchOptimizer(self, semilla=self.semilla)
+        self.asignaciones = optimizador.mejorar(
+            grupos, self.asignaciones, min(self.segundos_mejora, self._segundos_restantes()),
+            on_progress=lambda porcentaje: self._reportar_progreso("mejora", porcentaje)
+        )
+        # El validador refleja el horario mejorado
+        self.validator.clear_session_assignments(recargar_ocupacion=False)
+        for grupo_id, docente_id, espacio_id, dia_semana, bloque_id in self.asignaciones:
+            self.validator.mark_slot_used(
+                docente_id=docente_id, espacio_id=espacio_id, grupo_id=grupo_id,
+                dia_semana=dia_semana, bloque_id=bloque_id
+            )
+        stats = optimizador.stats
+        self.generation_stats.update({
+            "puntaje_inicial": stats["puntaje_inicial"],
+            "puntaje_final": stats["puntaje_final"],
+            "movimientos_evaluados": stats["movimientos_evaluados"],
+            "movimientos_aceptados": stats["movimientos_aceptados"],
+            "movimientos_por_segundo": round(stats["movimientos_evaluados"] / max(stats["segundos"], 1e-9)),
+        })
+
     def generar_horarios_automaticos(self):
         # AQ02: El sistema debe permitir la generación de horarios ... en un tiempo no mayor a 10 minutos.
         # RS08: El sistema debe implementar algoritmos de optimización...
+        self.medidor = MedidorFases()
+        with self.medidor.contar_consultas():
+            resultado = self._generar()
+        self._registrar_metricas("generacion")
+        return resultado
 
-        self._get_data_needed()
-        HorariosAsignados.objects.filter(periodo=self.periodo).delete() # Limpiar horarios previos del periodo (o marcarlos como obsoletos)
+    def simular(self, escenario=None):
+        """
+        Dry-run: ejecuta la generación completa sobre los datos del periodo con los cambios de `escenario`
+        (ver service/scenario.py) aplicados solo en memoria. No escribe ni bloquea filas en la BD; devuelve el
+        horario propuesto y su diferencia con el horario actual del periodo.
+        """
+        self.medidor = MedidorFases()
+        with self.medidor.contar_consultas():
+            resultado = self._generar(escenario=escenario, persistir=False)
+        self._registrar_metricas("simulacion")
+        return resultado
+
+    def _generar(self, escenario=None, persistir=True):
         self.unresolved_conflicts = []
+        self.diagnosticos = []
+        self.asignaciones = []
+        self.sesiones_pendientes = {}
         self.generation_stats = {"asignaciones_exitosas": 0, "intentos_fallidos": 0, "grupos_programados": 0, "grupos_no_programados": 0}
+        self._iniciar_presupuesto()
+        self._reportar_progreso("carga_datos", 0)
+        self._get_data_needed()
+        aplicar_escenario(self, escenario)
+        # Los horarios previos del periodo se reemplazan al persistir: el validador parte de una ocupación vacía en memoria
+        self.validator.clear_session_assignments()
+        self.validator.cargar_ocupacion(asignaciones=())
+        self._preparar_motor()
 
 
         # Lógica del Algoritmo (Ejemplo muy simplificado - ESTO ES LO COMPLEJO):
@@ -77,94 +841,162 @@ class ScheduleGeneratorService:
         #    f. Si se asigna, marcar recursos como usados para ese slot y actualizar estadísticas.
         #    g. Si no se puede asignar, registrar el conflicto/problema.
 
-        for grupo in self.grupos_a_programar:
-            materia = grupo.materia
-            horas_necesarias = materia.horas_totales # Asumimos que cada bloque cubre 1 hora, simplificación
-            asignaciones_hechas_para_grupo = 0
+        grupos = list(self.grupos_a_programar)
+        self._reportar_progreso("busqueda", 0)
+        inicio_busqueda = time.perf_counter()
+        if self.semillas:
+            self._programar_multi_arranque(grupos)
+        elif self.procesos > 1:
+            self._programar_en_paralelo(grupos)
+        else:
+            self._programar_grupos(grupos, reportar_progreso=True)
+        if self.motor == "backtracking":
+            segundos = max(time.perf_counter() - inicio_busqueda, 1e-9)
+            self.generation_stats["nodos_por_segundo"] = round(self.generation_stats["nodos_explorados"] / segundos)
+            self.generation_stats["podas_por_segundo"] = round(self.generation_stats["podas"] / segundos)
 
-            # Determinar docentes candidatos para esta materia/grupo
-            docentes_candidatos = [
-                d for d in self.docentes_disponibles
-                if any(e in d.especialidades.all() for e in materia.materiaespecialidadesrequeridas_set.all().values_list('especialidad', flat=True))
-            ]
-            if grupo.docente_asignado_directamente: # Priorizar docente pre-asignado
-                docentes_candidatos.insert(0, grupo.docente_asignado_directamente)
+        if self.segundos_mejora > 0 and not self._presupuesto_agotado():
+            self._reportar_progreso("mejora", 0)
+            self._mejorar_asignaciones(grupos)
+        self._registrar_motivos()
 
+        resultado = {}
+        if persistir:
+            self._reportar_progreso("persistencia", 100)
+            self._persistir_asignaciones()
+        else:
+            self._reportar_progreso("comparacion", 100)
+            actuales = HorariosAsignados.objects.filter(periodo=self.periodo).values_list(
+                'grupo_id', 'docente_id', 'espacio_id', 'dia_semana', 'bloque_horario_id'
+            )
+            resultado["horario_propuesto"] = como_dicts(self.asignaciones)
+            resultado["diferencia"] = diferencia_horarios(list(actuales), self.asignaciones)
+        self._registrar_presupuesto()
 
-            # Iterar hasta cubrir las horas necesarias o no encontrar más slots
-            for _ in range(int(horas_necesarias)): # Simplificación: cada iteración es 1 hora/bloque
-                if asignaciones_hechas_para_grupo >= horas_necesarias:
-                    break
+        # Limpiar el estado del validador para la próxima vez
+        self.validator.clear_session_assignments()
+        self._liberar_motor()
+
+        return {
+            "stats": self.generation_stats,
+            "unresolved_conflicts": self.unresolved_conflicts,
+            "diagnosticos": self.diagnosticos,
+            **resultado
+        }
 
-                mejor_opcion = None
-                mejor_score = -float('inf')
-
-                for docente_cand in docentes_candidatos:
-                    for espacio_cand in self.espacios_disponibles:
-                        if not self._cumple_restricciones_espacio(espacio_cand, materia, grupo):
-                            continue
-                        for bloque_cand in self.bloques_horarios:
-                            # Verificar si el slot ya está ocupado o si hay conflicto
-                            if self.validator.check_slot_conflict(
-                                    docente_id=docente_cand.docente_id,
-                                    espacio_id=espacio_cand.espacio_id,
-                                    grupo_id=grupo.grupo_id, # Para evitar que el mismo grupo se programe dos veces en el mismo slot
-                                    dia_semana=bloque_cand.dia_semana,
-                                    bloque_id=bloque_cand.bloque_def_id
-                            ):
-                                continue
-
-                            if not self._es_docente_disponible(docente_cand.docente_id, bloque_cand.dia_semana, bloque_cand.bloque_def_id):
-                                continue
-
-                            if not self._cumple_restricciones_docente(docente_cand, bloque_cand.dia_semana, bloque_cand, materia):
-                                continue
-
-                            # Aquí podrías añadir un score basado en preferencias, etc.
-                            score_actual = self.docente_disponibilidad_map.get((docente_cand.docente_id, bloque_cand.dia_semana, bloque_cand.bloque_def_id), 0)
-
-                            if score_actual > mejor_score:
-                                mejor_score = score_actual
-                                mejor_opcion = {
-                                    "grupo": grupo, "docente": docente_cand, "espacio": espacio_cand,
-                                    "dia_semana": bloque_cand.dia_semana, "bloque_horario": bloque_cand
-                                }
-
-                if mejor_opcion:
-                    HorariosAsignados.objects.create(
-                        grupo=mejor_opcion["grupo"],
-                        docente=mejor_opcion["docente"],
-                        espacio=mejor_opcion["espacio"],
-                        periodo=self.periodo,
-                        dia_semana=mejor_opcion["dia_semana"],
-                        bloque_horario=mejor_opcion["bloque_horario"]
-                    )
-                    asignaciones_hechas_para_grupo += 1 # O las horas que cubre el bloque
-                    self.generation_stats["asignaciones_exitosas"] += 1
-                    # Marcar el slot como usado para el validador en esta sesión de generación
-                    self.validator.mark_slot_used(
-                        docente_id=mejor_opcion["docente"].docente_id,
-                        espacio_id=mejor_opcion["espacio"].espacio_id,
-                        grupo_id=mejor_opcion["grupo"].grupo_id,
-                        dia_semana=mejor_opcion["dia_semana"],
-                        bloque_id=mejor_opcion["bloque_horario"].bloque_def_id
-                    )
-                else:
-                    self.unresolved_conflicts.append(f"No se pudo asignar una sesión para el grupo {grupo.codigo_grupo} (materia: {materia.nombre_materia}).")
-                    self.generation_stats["intentos_fallidos"] += 1 # Para esta sesión/hora del grupo
-                    break # No se pudo asignar una hora para este grupo, pasar al siguiente o registrar
+    def _asignacion_valida(self, grupo, docente_id, espacio_id, dia_semana, bloque_id):
+        """Indica si una asignación existente sigue cumpliendo las mismas reglas que usa la generación."""
+        if grupo is None: # El grupo ya no pertenece al periodo
+            return False
+        bloque = self._bloques_por_slot.get((dia_semana, bloque_id))
+        docente = self.docentes_por_id.get(docente_id)
+        if bloque is None or docente is None:
+            return False
+        if docente not in self._docentes_candidatos(grupo):
+            return False
+        if not self._es_docente_disponible(docente_id, dia_semana, bloque_id):
+            return False
+        if not self._cumple_restricciones_docente(docente, dia_semana, bloque, grupo.materia, grupo):
+            return False
+        if not self.restricciones.permite_espacio(espacio_id, dia_semana, bloque_id):
+            return False
+        return any(e.espacio_id == espacio_id for e in self._espacios_candidatos(grupo, grupo.materia))
 
+    def regenerar_incremental(self, docentes=(), espacios=(), grupos=(), bloques=()):
+        """
+        Regenera solo lo afectado por cambios en los docentes, espacios, grupos o bloques indicados (ids).
+        Las asignaciones de esas entidades que ya no son válidas se liberan y se vuelven a ubicar alrededor
+        del horario existente, que no se modifica. También se intenta completar los grupos relacionados
+        con los cambios a los que les faltan sesiones (p. ej. un docente que ahora tiene más disponibilidad).
+        """
+        self.medidor = MedidorFases()
+        with self.medidor.contar_consultas():
+            resultado = self._regenerar_incremental(docentes, espacios, grupos, bloques)
+        self._registrar_metricas("regeneracion_incremental")
+        return resultado
 
-            if asignaciones_hechas_para_grupo >= horas_necesarias:
-                self.generation_stats["grupos_programados"] += 1
+    def _regenerar_incremental(self, docentes, espacios, grupos, bloques):
+        inicio = time.perf_counter()
+        docentes, espacios, grupos, bloques = set(docentes), set(espacios), set(grupos), set(bloques)
+        self.unresolved_conflicts = []
+        self.diagnosticos = []
+        self.asignaciones = []
+        self.sesiones_pendientes = {}
+        self.generation_stats = {
+            "asignaciones_exitosas": 0, "intentos_fallidos": 0, "grupos_programados": 0, "grupos_no_programados": 0,
+            "asignaciones_conservadas": 0, "asignaciones_liberadas": 0
+        }
+        self._iniciar_presupuesto()
+        self.medidor.cambiar("carga_datos")
+        self._get_data_needed()
+        grupos_por_id = {g.grupo_id: g for g in self.grupos_a_programar}
+        self.medidor.cambiar("analisis")
+
+        # 1. Liberar las asignaciones de las entidades cambiadas que dejaron de ser válidas
+        conservadas = defaultdict(list) # { grupo_id: [(horario_id, asignacion), ...] }
+        liberadas = []
+        grupos_afectados = set(grupos)
+        existentes = HorariosAsignados.objects.filter(periodo=self.periodo).order_by('horario_id').values_list(
+            'horario_id', 'grupo_id', 'docente_id', 'espacio_id', 'dia_semana', 'bloque_horario_id'
+        )
+        for horario_id, grupo_id, docente_id, espacio_id, dia_semana, bloque_id in existentes:
+            afectada = grupo_id in grupos or docente_id in docentes or espacio_id in espacios or bloque_id in bloques
+            if afectada and not self._asignacion_valida(grupos_por_id.get(grupo_id), docente_id, espacio_id, dia_semana, bloque_id):
+                liberadas.append(horario_id)
+                grupos_afectados.add(grupo_id)
             else:
-                self.generation_stats["grupos_no_programados"] += 1
+                conservadas[grupo_id].append((horario_id, (docente_id, espacio_id, grupo_id, dia_semana, bloque_id)))
 
+        # Si un grupo cambiado ahora necesita menos sesiones, se liberan las más recientes
+        for grupo_id in grupos:
+            grupo = grupos_por_id.get(grupo_id)
+            exceso = len(conservadas.get(grupo_id, ())) - (int(grupo.materia.horas_totales) if grupo else 0)
+            if exceso > 0:
+                liberadas.extend(horario_id for horario_id, _ in conservadas[grupo_id][-exceso:])
+                del conservadas[grupo_id][-exceso:]
 
-        # Limpiar el estado del validador para la próxima vez
+        # Con sesiones de varios bloques, un bloque suelto no completaría su tramo: el grupo afectado se reubica entero
+        if self.max_bloques_por_sesion > 1:
+            for grupo_id in grupos_afectados:
+                liberadas.extend(horario_id for horario_id, _ in conservadas.pop(grupo_id, ()))
+
+        # 2. Grupos a reubicar: los afectados y los que comparten candidatos con los cambios, si les faltan sesiones
+        recursos_cambiados = {("docente", i) for i in docentes} | {("espacio", i) for i in espacios}
+        a_reubicar = []
+        for grupo in self.grupos_a_programar:
+            faltan = int(grupo.materia.horas_totales) - len(conservadas.get(grupo.grupo_id, ()))
+            if faltan <= 0:
+                continue
+            if grupo.grupo_id in grupos_afectados or recursos_cambiados.intersection(self._recursos_candidatos(grupo)):
+                self.sesiones_pendientes[grupo.grupo_id] = faltan
+                a_reubicar.append(grupo)
+
+        # 3. Reubicar sobre la ocupación de las asignaciones conservadas
+        self.medidor.cambiar("busqueda")
+        self.asignaciones_conservadas = [asignacion for filas in conservadas.values() for _, asignacion in filas]
         self.validator.clear_session_assignments()
+        self.validator.cargar_ocupacion(asignaciones=self.asignaciones_conservadas)
+        self._preparar_motor()
+        self._programar_grupos(a_reubicar)
+        self._registrar_motivos()
+
+        # 4. Guardar solo la diferencia: borrar lo liberado e insertar lo reubicado
+        self.medidor.cambiar("persistencia")
+        with transaction.atomic():
+            if liberadas:
+                HorariosAsignados.objects.filter(pk__in=liberadas).delete()
+            self._insertar_asignaciones()
+            registrar_cambio_horario(self.periodo.pk)
 
+        self.validator.clear_session_assignments()
+        self._liberar_motor()
+        self.sesiones_pendientes = {}
+        self.asignaciones_conservadas = ()
+        self.generation_stats["asignaciones_conservadas"] = sum(len(filas) for filas in conservadas.values())
+        self.generation_stats["asignaciones_liberadas"] = len(liberadas)
+        self.generation_stats["segundos"] = round(time.perf_counter() - inicio, 3)
         return {
             "stats": self.generation_stats,
-            "unresolved_conflicts": self.unresolved_conflicts
+            "unresolved_conflicts": self.unresolved_conflicts,
+            "diagnosticos": self.diagnosticos
         }
@@ -0,0 +1,214 @@
+"""
+Snapshot del problema de generación de un periodo, para resolverlo sin base de datos.
+
+El snapshot guarda exactamente lo que carga ScheduleGeneratorService._get_data_needed() (grupos, materias,
+carreras, docentes con especialidades, disponibilidad, espacios, bloques y restricciones activas) en un
+archivo JSON comprimido con gzip. Cada tabla se guarda por columnas ({"columnas": [...], "filas": [[...]]}),
+en el mismo orden en que la generación la recorre, así que resolver el snapshot produce el mismo horario
+que generar sobre la BD con los mismos parámetros.
+
+El resultado de resolver un snapshot es otro archivo JSON con las asignaciones, que se puede importar
+al periodo con importar_resultado().
+"""
+import datetime
+import gzip
+import json
+from collections import defaultdict
+
+from apps.academic_setup.models import PeriodoAcademico, Materias, Carrera, EspaciosFisicos
+from apps.users.models import Docentes
+from apps.scheduling.models import Grupos, BloquesHorariosDefinicion, ConfiguracionRestricciones
+from .schedule_generator import ScheduleGeneratorService
+
+VERSION_SNAPSHOT = 1
+
+COLUMNAS = {
+    "grupos": ("grupo_id", "codigo_grupo", "materia_id", "carrera_id", "numero_estudiantes_estimado",
+               "turno_preferente", "docente_asignado_directamente_id"),
+    "materias": ("materia_id", "codigo_materia", "nombre_materia", "horas_academicas_teoricas",
+                 "horas_academicas_practicas", "horas_academicas_laboratorio", "requiere_tipo_espacio_especifico_id"),
+    "carreras": ("carrera_id", "nombre_carrera", "unidad_id"),
+    "docentes": ("docente_id", "codigo_docente", "nombres", "apellidos", "max_horas_semanales", "unidad_principal_id"),
+    "espacios": ("espacio_id", "nombre_espacio", "tipo_espacio_id", "capacidad", "unidad_id"),
+    "bloques": ("bloque_def_id", "nombre_bloque", "hora_inicio", "hora_fin", "turno", "dia_semana"),
+    "restricciones": ("codigo_restriccion", "tipo_aplicacion", "entidad_id_1", "entidad_id_2", "valor_parametro"),
+    "docente_especialidades": ("docente_id", "especialidad_id"),
+    "materia_especialidades": ("materia_id", "especialidad_id"),
+    "disponibilidad": ("docente_id", "dia_semana", "bloque_id", "preferencia"),
+}
+CAMPOS_HORA = ("hora_inicio", "hora_fin")
+
+
+def _tabla(nombre, objetos):
+    filas = []
+    for objeto in objetos:
+        fila = []
+        for columna in COLUMNAS[nombre]:
+            valor = getattr(objeto, columna)
+            fila.append(valor.isoformat() if columna in CAMPOS_HORA else valor)
+        filas.append(fila)
+    return {"columnas": list(COLUMNAS[nombre]), "filas": filas}
+
+
+def _filas(snapshot, nombre):
+    """Filas de la tabla como dicts; falla si el archivo no tiene las columnas esperadas."""
+    tabla = snapshot[nombre]
+    if tuple(tabla["columnas"]) != COLUMNAS[nombre]:
+        raise ValueError(f"La tabla '{nombre}' del snapshot no tiene las columnas esperadas.")
+    return [dict(zip(COLUMNAS[nombre], fila)) for fila in tabla["filas"]]
+
+
+def exportar_snapshot(periodo, ruta):
+    """Escribe el snapshot del periodo en `ruta` y devuelve la cantidad de filas por tabla."""
+    generador = ScheduleGeneratorService(periodo=periodo)
+    generador._get_data_needed()
+    snapshot = construir_snapshot(generador)
+    with gzip.open(ruta, 'wt', encoding='utf-8') as archivo:
+        json.dump(snapshot, archivo, separators=(',', ':'))
+    return {nombre: len(snapshot[nombre]["filas"]) for nombre in COLUMNAS}
+
+
+def construir_snapshot(generador, grupos=None):
+    """
+    Snapshot (dict serializable) de los datos que el generador tiene cargados, con los cambios en memoria que se
+    les hayan aplicado (p. ej. un escenario). `grupos` fija el orden de los grupos; por defecto, grupos_a_programar.
+    """
+    grupos = list(generador.grupos_a_programar if grupos is None else grupos)
+    materias = {g.materia_id: g.materia for g in grupos}
+    carreras = {g.carrera_id: g.carrera for g in grupos}
+    pares = lambda indice: sorted((a, b) for b, ids in indice.items() for a in ids)
+
+    periodo = generador.periodo
+    return {
+        "version": VERSION_SNAPSHOT,
+        "creado": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "periodo": {"periodo_id": periodo.periodo_id, "nombre_periodo": periodo.nombre_periodo},
+        "grupos": _tabla("grupos", grupos),
+        "materias": _tabla("materias", materias.values()),
+        "carreras": _tabla("carreras", carreras.values()),
+        "docentes": _tabla("docentes", generador.docentes_disponibles),
+        "espacios": _tabla("espacios", generador.espacios_disponibles),
+        "bloques": _tabla("bloques", generador.bloques_horarios),
+        "restricciones": _tabla("restricciones", generador.restricciones_configuradas),
+        "docente_especialidades": {
+            "columnas": list(COLUMNAS["docente_especialidades"]),
+            "filas": pares(generador.docentes_por_especialidad),
+        },
+        "materia_especialidades": {
+            "columnas": list(COLUMNAS["materia_especialidades"]),
+            "filas": [[m, e] for e, m in pares(generador.especialidades_por_materia)],
+        },
+        "disponibilidad": {
+            "columnas": list(COLUMNAS["disponibilidad"]),
+            "filas": [[*clave, preferencia] for clave, preferencia in sorted(generador.docente_disponibilidad_map.items())],
+        },
+    }
+
+
+def cargar_snapshot(ruta):
+    with gzip.open(ruta, 'rt', encoding='utf-8') as archivo:
+        snapshot = json.load(archivo)
+    if snapshot.get("version") != VERSION_SNAPSHOT:
+        raise ValueError(f"Versión de snapshot no soportada: {snapshot.get('version')} (se espera {VERSION_SNAPSHOT}).")
+    return snapshot
+
+
+class SnapshotGeneratorService(ScheduleGeneratorService):
+    """
+    Generador que toma los datos de un snapshot en lugar de la BD. Los modelos se instancian en memoria
+    (nunca se guardan) y las asignaciones generadas quedan en self.asignaciones en vez de persistirse.
+    """
+
+    def __init__(self, snapshot, **parametros):
+        periodo = PeriodoAcademico(**snapshot["periodo"])
+        super().__init__(periodo=periodo, **parametros)
+        self.snapshot = snapshot
+
+    def _get_data_needed(self):
+        snapshot = self.snapshot
+        materias = {fila["materia_id"]: Materias(**fila) for fila in _filas(snapshot, "materias")}
+        carreras = {fila["carrera_id"]: Carrera(**fila) for fila in _filas(snapshot, "carreras")}
+        self.grupos_a_programar = [
+            Grupos(periodo=self.periodo, materia=materias[fila["materia_id"]], carrera=carreras[fila["carrera_id"]], **{
+                k: v for k, v in fila.items() if k not in ("materia_id", "carrera_id")
+            })
+            for fila in _filas(snapshot, "grupos")
+        ]
+        self.docentes_disponibles = [Docentes(**fila) for fila in _filas(snapshot, "docentes")]
+        self.docentes_por_id = {d.docente_id: d for d in self.docentes_disponibles}
+        self.docentes_por_especialidad = defaultdict(set)
+        for fila in _filas(snapshot, "docente_especialidades"):
+            self.docentes_por_especialidad[fila["especialidad_id"]].add(fila["docente_id"])
+        self.especialidades_por_materia = defaultdict(set)
+        for fila in _filas(snapshot, "materia_especialidades"):
+            self.especialidades_por_materia[fila["materia_id"]].add(fila["especialidad_id"])
+        self._candidatos_por_materia = {}
+        self.espacios_disponibles = [EspaciosFisicos(**fila) for fila in _filas(snapshot, "espacios")]
+        self._indexar_espacios()
+        self.bloques_horarios = []
+        for fila in _filas(snapshot, "bloques"):
+            for campo in CAMPOS_HORA:
+                fila[campo] = datetime.time.fromisoformat(fila[campo])
+            self.bloques_horarios.append(BloquesHorariosDefinicion(**fila))
+        self._bloques_por_slot = {(b.dia_semana, b.bloque_def_id): b for b in self.bloques_horarios}
+        self.restricciones_configuradas = [ConfiguracionRestricciones(**fila) for fila in _filas(snapshot, "restricciones")]
+        self._compilar_restricciones()
+        self.docente_disponibilidad_map = {
+            (fila["docente_id"], fila["dia_semana"], fila["bloque_id"]): fila["preferencia"]
+            for fila in _filas(snapshot, "disponibilidad")
+        }
+
+    def _persistir_asignaciones(self):
+        # Sin BD: el resultado se escribe en un archivo (ver escribir_resultado)
+        pass
+
+
+def escribir_resultado(ruta, snapshot, parametros, resultado, asignaciones):
+    contenido = {
+        "version": VERSION_SNAPSHOT,
+        "periodo": snapshot["periodo"],
+        "parametros": parametros,
+        "stats": resultado.get("stats", {}),
+        "unresolved_conflicts": resultado.get("unresolved_conflicts", []),
+        "diagnosticos": resultado.get("diagnosticos", []),
+        "columnas": ["grupo_id", "docente_id", "espacio_id", "dia_semana", "bloque_id"],
+        "asignaciones": [list(a) for a in asignaciones],
+    }
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(contenido, archivo, separators=(',', ':'), default=str)
+
+
+def importar_resultado(ruta, periodo=None):
+    """
+    Reemplaza los horarios del periodo por las asignaciones de un archivo de resultado. Falla con ValueError
+    si el periodo no existe o si alguna asignación referencia grupos, docentes, espacios o bloques que ya no están.
+    Devuelve (periodo, cantidad de asignaciones importadas).
+    """
+    with open(ruta, encoding='utf-8') as archivo:
+        contenido = json.load(archivo)
+    if contenido.get("version") != VERSION_SNAPSHOT:
+        raise ValueError(f"Versión de resultado no soportada: {contenido.get('version')}.")
+    if periodo is None:
+        periodo = PeriodoAcademico.objects.filter(pk=contenido["periodo"]["periodo_id"]).first()
+        if periodo is None:
+            raise ValueError(f"El periodo {contenido['periodo']['periodo_id']} no existe.")
+    asignaciones = [tuple(a) for a in contenido["asignaciones"]]
+
+    faltantes = []
+    for nombre, consulta, posicion in (
+        ("grupos", Grupos.objects.filter(periodo=periodo), 0),
+        ("docentes", Docentes.objects.all(), 1),
+        ("espacios", EspaciosFisicos.objects.all(), 2),
+        ("bloques", BloquesHorariosDefinicion.objects.all(), 4),
+    ):
+        ids = {a[posicion] for a in asignaciones}
+        existentes = set(consulta.filter(pk__in=ids).values_list('pk', flat=True))
+        if ids - existentes:
+            faltantes.append(f"{nombre} {sorted(ids - existentes)[:10]}")
+    if faltantes:
+        raise ValueError("El resultado referencia registros que no existen en el periodo: " + "; ".join(faltantes))
+
+    generador = ScheduleGeneratorService(periodo=periodo)
+    generador.asignaciones = asignaciones
+    generador._persistir_asignaciones()
+    return periodo, len(asignaciones)
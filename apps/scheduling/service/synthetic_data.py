@@ -0,0 +1,130 @@
+import datetime
+import itertools
+import random
+
+from django.db import transaction
+
+from apps.academic_setup.models import (
+    UnidadAcademica, Carrera, PeriodoAcademico, TiposEspacio, EspaciosFisicos, Especialidades, Materias,
+    MateriaEspecialidadesRequeridas
+)
+from apps.users.models import Docentes, DocenteEspecialidades
+from apps.scheduling.models import Grupos, BloquesHorariosDefinicion, DisponibilidadDocentes
+
+TAMANO_LOTE = 2000
+
+# Proporciones del escenario sintético, tomadas de un periodo típico de la institución
+UNIDADES = 3
+CARRERAS_POR_UNIDAD = 4
+ESPECIALIDADES = 30
+GRUPOS_POR_MATERIA = 5
+ESPECIALIDADES_POR_DOCENTE = (1, 3)
+# (nombre, proporción de espacios, capacidades posibles)
+TIPOS_ESPACIO = (
+    ("Aula", 0.80, (25, 30, 35, 40, 50)),
+    ("Laboratorio", 0.15, (20, 25, 30)),
+    ("Auditorio", 0.05, (80, 120)),
+)
+PROPORCION_MATERIAS_CON_LABORATORIO = 0.15
+TAMANOS_GRUPO = (15, 20, 25, 30, 35, 40)
+PREFERENCIAS = (-1, 0, 0, 0, 1) # DisponibilidadDocentes.preferencia
+
+_contador = itertools.count(1)
+
+
+def _bloques(n_bloques):
+    """n bloques de una hora repartidos de lunes a viernes (o sábado si no alcanzan 14 por día)."""
+    dias = 5 if n_bloques <= 5 * 14 else 6
+    por_dia = -(-n_bloques // dias)
+    bloques = []
+    for k in range(n_bloques):
+        dia, hora = k // por_dia + 1, 7 + k % por_dia
+        turno = 'M' if hora < 13 else ('T' if hora < 19 else 'N')
+        bloques.append((dia, datetime.time(hora % 24), datetime.time((hora + 1) % 24), turno))
+    return bloques
+
+
+@transaction.atomic
+def crear_periodo_sintetico(docentes=50, grupos=100, espacios=200, bloques=60, densidad_disponibilidad=0.6, semilla=1):
+    """
+    Crea un periodo con datos sintéticos a la escala indicada y devuelve el PeriodoAcademico.
+    Cada docente tiene de 1 a 3 especialidades y está disponible en `densidad_disponibilidad` de los bloques;
+    cada materia requiere una especialidad y algunas un laboratorio. Los nombres llevan un prefijo único,
+    así que se pueden crear varios escenarios en la misma base de datos.
+    """
+    r = random.Random(semilla)
+    prefijo = f"SINT{semilla}-{next(_contador)}-{r.randrange(10 ** 6)}"
+
+    periodo = PeriodoAcademico.objects.create(
+        nombre_periodo=prefijo, fecha_inicio=datetime.date(2025, 3, 1), fecha_fin=datetime.date(2025, 7, 31)
+    )
+    unidades = [UnidadAcademica.objects.create(nombre_unidad=f"{prefijo} U{i}") for i in range(UNIDADES)]
+    carreras = [
+        Carrera.objects.create(nombre_carrera=f"{prefijo} C{i}", unidad=unidad)
+        for unidad in unidades for i in range(CARRERAS_POR_UNIDAD)
+    ]
+    especialidades = Especialidades.objects.bulk_create(
+        [Especialidades(nombre_especialidad=f"{prefijo} E{i}") for i in range(ESPECIALIDADES)]
+    )
+
+    # Espacios: la mayoría aulas, algunos laboratorios y auditorios; algunos compartidos entre unidades
+    tipos = {}
+    nuevos_espacios = []
+    for nombre, proporcion, capacidades in TIPOS_ESPACIO:
+        tipos[nombre] = TiposEspacio.objects.create(nombre_tipo_espacio=f"{prefijo} {nombre}")
+        for i in range(max(1, round(espacios * proporcion))):
+            nuevos_espacios.append(EspaciosFisicos(
+                nombre_espacio=f"{prefijo} {nombre} {i}", tipo_espacio=tipos[nombre], capacidad=r.choice(capacidades),
+                unidad=r.choice(unidades + [None])
+            ))
+    EspaciosFisicos.objects.bulk_create(nuevos_espacios[:espacios], batch_size=TAMANO_LOTE)
+
+    bloques = BloquesHorariosDefinicion.objects.bulk_create([
+        BloquesHorariosDefinicion(
+            nombre_bloque=f"{prefijo} B{k}", hora_inicio=inicio, hora_fin=fin, turno=turno, dia_semana=dia
+        )
+        for k, (dia, inicio, fin, turno) in enumerate(_bloques(bloques))
+    ])
+
+    # Materias: una especialidad requerida cada una; unas pocas requieren laboratorio
+    materias = Materias.objects.bulk_create([
+        Materias(
+            codigo_materia=f"{prefijo} M{i}", nombre_materia=f"Materia {i}",
+            horas_academicas_teoricas=r.choice((2, 3)), horas_academicas_practicas=r.choice((0, 1)),
+            requiere_tipo_espacio_especifico=tipos["Laboratorio"] if r.random() < PROPORCION_MATERIAS_CON_LABORATORIO else None
+        )
+        for i in range(max(1, grupos // GRUPOS_POR_MATERIA))
+    ])
+    MateriaEspecialidadesRequeridas.objects.bulk_create([
+        MateriaEspecialidadesRequeridas(materia=materia, especialidad=r.choice(especialidades)) for materia in materias
+    ])
+
+    nuevos_docentes = Docentes.objects.bulk_create([
+        Docentes(
+            codigo_docente=f"{prefijo} D{i}", nombres=f"Docente {i}", apellidos="Sintético",
+            max_horas_semanales=r.choice((None, 12, 20, 30)), unidad_principal=r.choice(unidades)
+        )
+        for i in range(docentes)
+    ], batch_size=TAMANO_LOTE)
+    DocenteEspecialidades.objects.bulk_create([
+        DocenteEspecialidades(docente=docente, especialidad=especialidad)
+        for docente in nuevos_docentes
+        for especialidad in r.sample(especialidades, r.randint(*ESPECIALIDADES_POR_DOCENTE))
+    ], batch_size=TAMANO_LOTE)
+    DisponibilidadDocentes.objects.bulk_create([
+        DisponibilidadDocentes(
+            docente=docente, periodo=periodo, dia_semana=bloque.dia_semana, bloque_horario=bloque,
+            preferencia=r.choice(PREFERENCIAS)
+        )
+        for docente in nuevos_docentes
+        for bloque in bloques if r.random() < densidad_disponibilidad
+    ], batch_size=TAMANO_LOTE)
+
+    Grupos.objects.bulk_create([
+        Grupos(
+            codigo_grupo=f"G{i}", materia=r.choice(materias), carrera=r.choice(carreras), periodo=periodo,
+            numero_estudiantes_estimado=r.choice(TAMANOS_GRUPO), turno_preferente=r.choice(('M', 'T', None))
+        )
+        for i in range(grupos)
+    ], batch_size=TAMANO_LOTE)
+    return periodo
@@ -0,0 +1,142 @@
+"""
+Grilla semanal (franjas horarias x días) de un docente, espacio, grupo o carrera en un periodo.
+
+La grilla se construye con una sola consulta: las clases de la entidad en el periodo y los bloques
+(BloquesHorariosDefinicion), que dan los ejes, así que los bloques libres también aparecen. Se guarda en la caché de
+Django con la versión del horario del periodo (VersionHorarioPeriodo) en la clave: cualquier cambio en
+HorariosAsignados debe llamar a registrar_cambio_horario dentro de su transacción, y desde ese momento las
+grillas del periodo se reconstruyen en la siguiente lectura. La versión vive en la BD, así que la invalidación
+vale para todos los procesos aunque cada uno tenga su propia caché.
+
+Formato:
+
+    {"periodo_id", "tipo", "id", "version",
+     "dias": [1, 2, ...],
+     "franjas": [{"hora_inicio", "hora_fin", "turno"}, ...],
+     "bloques": [[bloque_def_id | null por día] por franja],     (null: no hay bloque ese día en esa franja)
+     "celdas": [[[índices en "clases"] | null por día] por franja],
+     "clases": [{"horario_id", "bloque_horario", "grupo_id", "codigo_grupo", "materia", "docente_id",
+                 "docente", "espacio_id", "espacio", "estado"}, ...]}
+"""
+from django.core.cache import cache
+from django.db.models import F, Value, CharField, IntegerField
+from django.utils import timezone
+
+from apps.scheduling.models import BloquesHorariosDefinicion, HorariosAsignados, VersionHorarioPeriodo
+
+# { tipo de grilla: campo de HorariosAsignados por el que se filtra }
+TIPOS_GRILLA = {'docente': 'docente_id', 'espacio': 'espacio_id', 'grupo': 'grupo_id', 'carrera': 'grupo__carrera_id'}
+# Las claves viejas no se borran: expiran. También acota cuánto tarda en verse un cambio de nombre (materia,
+# docente, espacio) o de bloques, que no cambian la versión del horario
+TIEMPO_CACHE_GRILLA = 60 * 60
+
+
+def _nombre_docente(usuario_id, nombre_usuario, apellido_usuario, nombres, apellidos):
+    """Como Docentes.__str__ sin el código: el nombre del usuario si tiene uno asociado."""
+    if usuario_id is not None:
+        return f"{nombre_usuario} {apellido_usuario}".strip()
+    return f"{nombres} {apellidos}"
+
+
+def version_horario(periodo_id):
+    return VersionHorarioPeriodo.objects.filter(periodo_id=periodo_id).values_list('version', flat=True).first() or 0
+
+
+def registrar_cambio_horario(*periodo_ids):
+    """Sube la versión del horario de los periodos indicados (se ignoran los None), invalidando sus grillas."""
+    for periodo_id in {p for p in periodo_ids if p is not None}:
+        actualizadas = VersionHorarioPeriodo.objects.filter(periodo_id=periodo_id).update(
+            version=F('version') + 1, fecha_modificacion=timezone.now()
+        )
+        if not actualizadas:
+            _, creada = VersionHorarioPeriodo.objects.get_or_create(periodo_id=periodo_id, defaults={'version': 1})
+            if not creada: # Otra transacción la creó al mismo tiempo
+                VersionHorarioPeriodo.objects.filter(periodo_id=periodo_id).update(
+                    version=F('version') + 1, fecha_modificacion=timezone.now()
+                )
+
+
+def grilla_semanal(periodo_id, tipo, entidad_id):
+    """Grilla de la entidad desde la caché, o construida y guardada si su versión no está."""
+    if tipo not in TIPOS_GRILLA:
+        raise ValueError(f"Tipo de grilla desconocido: {tipo}. Válidos: {', '.join(TIPOS_GRILLA)}.")
+    # La versión se lee antes que las clases: si cambia mientras tanto, lo construido queda bajo la versión vieja
+    version = version_horario(periodo_id)
+    clave = f"grilla_horario:{periodo_id}:{version}:{tipo}:{entidad_id}"
+    grilla = cache.get(clave)
+    if grilla is None:
+        grilla = {"periodo_id": periodo_id, "tipo": tipo, "id": entidad_id, "version": version,
+                  **construir_grilla(periodo_id, tipo, entidad_id)}
+        cache.set(clave, grilla, TIEMPO_CACHE_GRILLA)
+    return grilla
+
+
+def construir_grilla(periodo_id, tipo, entidad_id):
+    """
+    Días, franjas, bloques, celdas y clases de la grilla (ver el formato arriba). Una sola consulta (UNION ALL): las
+    clases de la entidad en el periodo con sus nombres para mostrar y todos los bloques, que forman los ejes.
+    """
+    clases = HorariosAsignados.objects.filter(periodo_id=periodo_id, **{TIPOS_GRILLA[tipo]: entidad_id})
+    if tipo == 'carrera':
+        # El grupo es del mismo periodo: con ese filtro sus grupos salen del índice (periodo, carrera) de grupos
+        clases = clases.filter(grupo__periodo_id=periodo_id)
+    clases = clases.annotate(
+        origen=Value('H', output_field=CharField()),
+    ).values_list(
+        'origen', 'bloque_horario_id', 'dia_semana', 'bloque_horario__hora_inicio', 'bloque_horario__hora_fin',
+        'bloque_horario__turno', 'horario_id', 'grupo_id', 'grupo__codigo_grupo', 'grupo__materia__nombre_materia',
+        'espacio_id', 'espacio__nombre_espacio', 'estado', 'docente_id', 'docente__usuario_id',
+        'docente__usuario__first_name', 'docente__usuario__last_name', 'docente__nombres', 'docente__apellidos',
+    )
+    bloques = BloquesHorariosDefinicion.objects.order_by().annotate(
+        origen=Value('B', output_field=CharField()),
+        entero=Value(None, output_field=IntegerField()),
+        texto=Value(None, output_field=CharField()),
+    ).values_list(
+        'origen', 'bloque_def_id', 'dia_semana', 'hora_inicio', 'hora_fin', 'turno',
+        'entero', 'entero', 'texto', 'texto', 'entero', 'texto', 'texto', 'entero', 'entero',
+        'texto', 'texto', 'texto', 'texto',
+    )
+    filas_bloques, filas_clases = [], []
+    for fila in clases.union(bloques, all=True):
+        (filas_bloques if fila[0] == 'B' else filas_clases).append(fila[1:])
+
+    franjas, fila_franja = [], {}
+    bloques_celda = {}  # { (franja, dia): bloque_def_id }
+    genericos = {}      # { franja: bloque_def_id } de bloques sin día (valen para todos)
+    dias = set()
+    for bloque_id, dia, hora_inicio, hora_fin, turno, *_ in sorted(filas_bloques, key=lambda f: (f[2], f[3], f[1] or 0, f[0])):
+        if (hora_inicio, hora_fin) not in fila_franja:
+            fila_franja[(hora_inicio, hora_fin)] = len(franjas)
+            franjas.append({"hora_inicio": hora_inicio.isoformat(), "hora_fin": hora_fin.isoformat(), "turno": turno})
+        franja = fila_franja[(hora_inicio, hora_fin)]
+        if dia is None:
+            genericos[franja] = bloque_id
+        else:
+            dias.add(dia)
+            bloques_celda[(franja, dia)] = bloque_id
+
+    celdas = {}         # { (franja, dia): [índice de clase, ...] }
+    clases = []
+    for (bloque_id, dia, hora_inicio, hora_fin, _, horario_id, grupo_id, codigo_grupo, materia,
+         espacio_id, espacio, estado, docente_id, *nombre) in sorted(filas_clases, key=lambda f: (f[1], f[2], f[5])):
+        dias.add(dia)
+        celdas.setdefault((fila_franja[(hora_inicio, hora_fin)], dia), []).append(len(clases))
+        clases.append({
+            "horario_id": horario_id, "bloque_horario": bloque_id, "grupo_id": grupo_id, "codigo_grupo": codigo_grupo,
+            "materia": materia, "docente_id": docente_id, "docente": _nombre_docente(*nombre), "espacio_id": espacio_id,
+            "espacio": espacio, "estado": estado,
+        })
+
+    dias = sorted(dias)
+    matriz_bloques = [[bloques_celda.get((franja, dia), genericos.get(franja)) for dia in dias] for franja in range(len(franjas))]
+    return {
+        "dias": dias,
+        "franjas": franjas,
+        "bloques": matriz_bloques,
+        "celdas": [
+            [celdas.get((franja, dia), [] if matriz_bloques[franja][d] is not None else None) for d, dia in enumerate(dias)]
+            for franja in range(len(franjas))
+        ],
+        "clases": clases,
+    }
@@ -1,3 +1,781 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import tempfile
+from collections import Counter, defaultdict
+from io import StringIO
+from itertools import combinations
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.db.models import Value
+from django.db.models.functions import Concat
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.academic_setup.models import EspaciosFisicos, Materias, TiposEspacio
+from apps.users.models import Docentes
+from apps.scheduling.models import (
+    BloquesHorariosDefinicion, ConfiguracionRestricciones, DisponibilidadDocentes, Grupos, HorariosAsignados,
+    TrabajosGeneracionHorario
+)
+from apps.scheduling.service import decomposition, generation_jobs
+from apps.scheduling.service.conflict_validator import ConflictValidatorService
+from apps.scheduling.service.generation_jobs import (
+    encolar_generacion, cancelar_trabajo, reintentar_trabajo, trabajo_activo, TrabajoInterrumpido, MENSAJE_VENCIDO
+)
+from apps.scheduling.service.schedule_generator import ScheduleGeneratorService
+from apps.scheduling.service.synthetic_data import crear_periodo_sintetico
+
+# Escala chica de los escenarios sintéticos: cada generación tarda menos de un segundo
+ESCALA_PRUEBAS = {"docentes": 30, "grupos": 40, "espacios": 20, "bloques": 40}
+URL_HORARIOS = '/api/scheduling/horarios-asignados/'
+URL_TRABAJOS = '/api/scheduling/trabajos-generacion/'
+URL_ACCIONES = '/api/scheduling/acciones-horario/'
+
+
+def tramos_asignados(generador, horario):
+    """
+    Tramos del horario propuesto por la última simulación de `generador`: las clases de cada tramo se agregan
+    seguidas, en orden, así que se recortan por grupo según _tramos_requeridos.
+    """
+    por_grupo = defaultdict(list)
+    for clase in horario:
+        por_grupo[clase["grupo"]].append(clase)
+    for grupo in generador.grupos_a_programar:
+        clases = por_grupo[grupo.grupo_id]
+        for tamano in generador._tramos_requeridos(grupo):
+            tramo, clases = clases[:tamano], clases[tamano:]
+            if tramo:
+                yield tramo
+
+
+class IndiceIntervalosTests(TestCase):
+
+    def test_tramos_con_definiciones_de_bloques_superpuestas(self):
+        # Dos periodos con la misma semilla tienen los mismos datos, pero cada uno crea su propio juego de bloques
+        # con los mismos horarios: el segundo ve dos definiciones por franja (07:00-08:00, 07:00-08:00, ...)
+        unico = crear_periodo_sintetico(semilla=1, **ESCALA_PRUEBAS)
+        esperado = ScheduleGeneratorService(periodo=unico, motor="numpy", max_bloques_por_sesion=2).simular()["stats"]
+        periodo = crear_periodo_sintetico(semilla=1, **ESCALA_PRUEBAS)
+        bloques = BloquesHorariosDefinicion.objects.in_bulk()
+
+        generador = ScheduleGeneratorService(periodo=periodo, motor="numpy", max_bloques_por_sesion=2)
+        resultado = generador.simular()
+
+        stats = resultado["stats"]
+        self.assertGreater(stats.get("tramos_asignados", 0), 0)
+        for clave in ("grupos_programados", "tramos_asignados", "motivos_no_programados"):
+            self.assertEqual(stats[clave], esperado[clave])
+        for tramo in tramos_asignados(generador, resultado["horario_propuesto"]):
+            self.assertEqual(len({(c["docente"], c["espacio"], c["dia_semana"]) for c in tramo}), 1)
+            for anterior, siguiente in zip(tramo, tramo[1:]):
+                self.assertEqual(bloques[anterior["bloque_horario"]].hora_fin, bloques[siguiente["bloque_horario"]].hora_inicio)
+
+
+class MotoresTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.periodo = crear_periodo_sintetico(semilla=1, **ESCALA_PRUEBAS)
+
+    def assertSinCruces(self, horario):
+        for entidad in ("docente", "espacio", "grupo"):
+            slots = [(clase[entidad], clase["dia_semana"], clase["bloque_horario"]) for clase in horario]
+            self.assertEqual(len(slots), len(set(slots)), f"{entidad} con dos clases en el mismo bloque")
+
+    def test_motores_coinciden(self):
+        resultados = {
+            motor: ScheduleGeneratorService(periodo=self.periodo, motor=motor, semilla=7).simular()
+            for motor in ("referencia", "numpy", "backtracking")
+        }
+        referencia = resultados["referencia"]
+        self.assertGreater(referencia["stats"]["grupos_programados"], 0)
+        # numpy es la misma búsqueda vectorizada: el mismo horario, clase por clase
+        self.assertEqual(resultados["numpy"]["horario_propuesto"], referencia["horario_propuesto"])
+        self.assertEqual(resultados["numpy"]["stats"]["motivos_no_programados"], referencia["stats"]["motivos_no_programados"])
+        # backtracking puede elegir otros bloques, pero no programa menos grupos
+        self.assertGreaterEqual(
+            resultados["backtracking"]["stats"]["grupos_programados"], referencia["stats"]["grupos_programados"]
+        )
+        for resultado in resultados.values():
+            self.assertSinCruces(resultado["horario_propuesto"])
+
+    def test_simular_no_escribe_horarios(self):
+        ScheduleGeneratorService(periodo=self.periodo, motor="numpy").simular()
+        self.assertFalse(HorariosAsignados.objects.filter(periodo=self.periodo).exists())
+
+    def test_mejora_sube_el_puntaje_sin_romper_restricciones(self):
+        base = ScheduleGeneratorService(periodo=self.periodo, motor="numpy", semilla=7).simular()
+        generador = ScheduleGeneratorService(periodo=self.periodo, motor="numpy", semilla=7, segundos_mejora=0.5)
+        mejorado = generador.simular()
+
+        stats = mejorado["stats"]
+        self.assertGreater(stats["puntaje_final"], stats["puntaje_inicial"])
+        self.assertGreater(stats["movimientos_aceptados"], 0)
+        # Las mismas sesiones de los mismos grupos, solo en otros bloques (o con otro docente apto)
+        self.assertEqual(stats["grupos_programados"], base["stats"]["grupos_programados"])
+        self.assertEqual(
+            sorted(clase["grupo"] for clase in mejorado["horario_propuesto"]),
+            sorted(clase["grupo"] for clase in base["horario_propuesto"])
+        )
+        self.assertSinCruces(mejorado["horario_propuesto"])
+        disponibles = set(DisponibilidadDocentes.objects.filter(periodo=self.periodo, esta_disponible=True).values_list(
+            'docente_id', 'dia_semana', 'bloque_horario_id'
+        ))
+        grupos = {grupo.grupo_id: grupo for grupo in generador.grupos_a_programar}
+        for clase in mejorado["horario_propuesto"]:
+            grupo = grupos[clase["grupo"]]
+            self.assertIn((clase["docente"], clase["dia_semana"], clase["bloque_horario"]), disponibles)
+            self.assertIn(clase["docente"], {docente.docente_id for docente in generador._docentes_candidatos(grupo)})
+            self.assertIn(
+                clase["espacio"], {espacio.espacio_id for espacio in generador._espacios_candidatos(grupo, grupo.materia)}
+            )
+
+    def test_indice_de_espacios_poda_sin_perder_candidatos(self):
+        EspaciosFisicos.objects.filter(pk=EspaciosFisicos.objects.order_by('pk').values('pk')[:1]).update(capacidad=None)
+        generador = ScheduleGeneratorService(periodo=self.periodo, motor="numpy")
+        generador._iniciar_presupuesto()
+        generador._get_data_needed()
+
+        podados, sin_capacidad = 0, 0
+        for grupo in generador.grupos_a_programar:
+            candidatos = generador._espacios_candidatos(grupo, grupo.materia)
+            # Los mismos espacios que revisar uno por uno, del más chico al más grande y sin capacidad al final
+            self.assertEqual(
+                {espacio.espacio_id for espacio in candidatos},
+                {espacio.espacio_id for espacio in generador.espacios_disponibles
+                 if generador._cumple_restricciones_espacio(espacio, grupo.materia, grupo)}
+            )
+            capacidades = [espacio.capacidad for espacio in candidatos]
+            conocidas = [capacidad for capacidad in capacidades if capacidad is not None]
+            self.assertEqual(conocidas, sorted(conocidas))
+            self.assertEqual(capacidades[:len(conocidas)], conocidas)
+            podados += len(generador.espacios_disponibles) - len(candidatos)
+            sin_capacidad += len(capacidades) - len(conocidas)
+        self.assertGreater(podados, 0)
+        self.assertGreater(sin_capacidad, 0)
+
+    def test_metricas_por_fase(self):
+        generador = ScheduleGeneratorService(periodo=self.periodo, motor="numpy")
+        with override_settings(HORARIOS_REGISTRAR_METRICAS=True), \
+                self.assertLogs('apps.scheduling.service.schedule_generator', 'INFO') as registro, \
+                CaptureQueriesContext(connection) as capturadas:
+            stats = generador.generar_horarios_automaticos()["stats"]
+
+        fases = stats["fases"]
+        principales = ["carga_datos", "busqueda", "persistencia"]
+        self.assertEqual([fase for fase in fases if '.' not in fase], principales)
+        self.assertIn("carga_datos.disponibilidad", fases)
+        for medida in fases.values():
+            self.assertLessEqual({"segundos", "segundos_cpu", "consultas_sql", "segundos_sql"}, set(medida))
+        # Todas las consultas de la generación caen en alguna fase principal; la búsqueda no consulta la BD
+        self.assertEqual(sum(fases[fase]["consultas_sql"] for fase in principales), len(capturadas))
+        self.assertEqual(fases["busqueda"]["consultas_sql"], 0)
+        for clave in ("candidatos_evaluados", "conflictos_detectados"):
+            self.assertEqual(fases["busqueda"][clave], stats[clave])
+        self.assertEqual(list(stats["presupuesto_por_fase"]), principales)
+        self.assertEqual(stats["presupuesto_segundos"], generador.time_budget_seconds)
+        self.assertFalse(stats["presupuesto_agotado"])
+
+        # Con HORARIOS_REGISTRAR_METRICAS las mismas stats salen en una línea JSON del log
+        evento = json.loads(registro.records[-1].getMessage())
+        self.assertEqual((evento["evento"], evento["operacion"]), ("metricas_generacion_horarios", "generacion"))
+        self.assertEqual(evento["stats"]["fases"], fases)
+
+    def test_presupuestos_no_finitos_se_rechazan(self):
+        for valor in ("nan", "inf", float("inf"), "-inf"):
+            with self.assertRaises(ValueError):
+                ScheduleGeneratorService(periodo=self.periodo, time_budget_seconds=valor)
+            with self.assertRaises(ValueError):
+                ScheduleGeneratorService(periodo=self.periodo, segundos_mejora=valor)
+
+    def test_simulacion_acotada_a_la_peticion(self):
+        cliente, url = APIClient(), URL_ACCIONES + 'simular-horario/'
+        for datos in ({"time_budget_seconds": "nan"}, {"time_budget_seconds": "inf"}, {"time_budget_seconds": 0},
+                      {"arranques": 50}, {"semillas": list(range(10))}):
+            respuesta = cliente.post(url, {"periodo_id": self.periodo.pk, "motor": "numpy", **datos}, format='json')
+            self.assertEqual(respuesta.status_code, 400, datos)
+
+        # procesos del cuerpo se ignora: la simulación no arranca procesos hijos
+        with mock.patch('apps.scheduling.views.ScheduleGeneratorService', wraps=ScheduleGeneratorService) as servicio:
+            respuesta = cliente.post(url, {"periodo_id": self.periodo.pk, "motor": "numpy", "procesos": 8, "arranques": 2}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(servicio.call_args.kwargs["procesos"], 1)
+
+
+class RestriccionesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.periodo = crear_periodo_sintetico(semilla=1, **ESCALA_PRUEBAS)
+
+    def test_restricciones_compiladas_bloquean_slots(self):
+        base = ScheduleGeneratorService(periodo=self.periodo, motor="numpy").simular()["horario_propuesto"]
+        turnos = dict(BloquesHorariosDefinicion.objects.values_list('bloque_def_id', 'turno'))
+        espacio = Counter(clase["espacio"] for clase in base).most_common(1)[0][0]
+        docente = Counter(clase["docente"] for clase in base).most_common(1)[0][0]
+        # Sin las restricciones el horario sí usa esos slots
+        self.assertTrue(any(clase["dia_semana"] == 1 for clase in base))
+        self.assertTrue(any(clase["espacio"] == espacio and turnos[clase["bloque_horario"]] == 'M' for clase in base))
+        self.assertTrue(any(clase["docente"] == docente and turnos[clase["bloque_horario"]] != 'T' for clase in base))
+
+        for codigo, tipo, entidad, valor in (
+            ("SIN-LUNES", 'PERIODO', None, "NO_DIAS=1"),
+            ("AULA-SIN-MANANA", 'AULA', espacio, "NO_TURNOS=M"),
+            ("DOCENTE-TARDE", 'DOCENTE', docente, "SOLO_TURNOS=T"),
+            # Guardada sin pasar por el serializer: se ignora y se informa
+            ("INVALIDA", 'GLOBAL', None, "NO_HORAS=8"),
+        ):
+            ConfiguracionRestricciones.objects.create(
+                codigo_restriccion=codigo, descripcion=codigo, tipo_aplicacion=tipo, entidad_id_1=entidad,
+                valor_parametro=valor, periodo_aplicable=self.periodo
+            )
+        resultado = ScheduleGeneratorService(periodo=self.periodo, motor="numpy").simular()
+
+        horario = resultado["horario_propuesto"]
+        self.assertTrue(horario)
+        for clase in horario:
+            self.assertNotEqual(clase["dia_semana"], 1)
+            if clase["espacio"] == espacio:
+                self.assertNotEqual(turnos[clase["bloque_horario"]], 'M')
+            if clase["docente"] == docente:
+                self.assertEqual(turnos[clase["bloque_horario"]], 'T')
+        self.assertEqual(resultado["stats"]["restricciones_invalidas"], 1)
+        self.assertTrue(any(c.startswith("Restricción INVALIDA ignorada") for c in resultado["unresolved_conflicts"]))
+
+    def test_valor_parametro_invalido_se_rechaza(self):
+        cliente = APIClient()
+        url = '/api/scheduling/configuracion-restricciones/'
+        datos = {"codigo_restriccion": "R1", "descripcion": "R1", "tipo_aplicacion": 'GLOBAL', "periodo_aplicable": self.periodo.pk}
+        # TIPO_ESPACIO solo vale en restricciones de tipo MATERIA
+        for valor in ("NO_DIAS=", "NO_HORAS=8", "NO_TURNOS=X", "NO_DIAS=lunes", "TIPO_ESPACIO=1", ""):
+            respuesta = cliente.post(url, {**datos, "valor_parametro": valor}, format='json')
+            self.assertEqual(respuesta.status_code, 400, valor)
+            self.assertIn('valor_parametro', respuesta.data)
+        # Las de entidad exigen entidad_id_1
+        respuesta = cliente.post(url, {**datos, "tipo_aplicacion": 'DOCENTE', "valor_parametro": "NO_DIAS=1"}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(ConfiguracionRestricciones.objects.exists())
+
+        respuesta = cliente.post(url, {**datos, "valor_parametro": "no_dias=6,7; solo_turnos=m,t"}, format='json')
+        self.assertEqual(respuesta.status_code, 201)
+
+
+class SnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.periodo = crear_periodo_sintetico(semilla=1, **ESCALA_PRUEBAS)
+
+    def test_exportar_resolver_e_importar(self):
+        esperado = ScheduleGeneratorService(periodo=self.periodo, motor="numpy", semilla=3).simular()["horario_propuesto"]
+        with tempfile.TemporaryDirectory() as directorio:
+            snapshot = os.path.join(directorio, 'periodo.snapshot.json.gz')
+            resultado = os.path.join(directorio, 'resultado.json')
+            call_command('exportar_snapshot', self.periodo.pk, snapshot, stdout=StringIO())
+            # El solver sin BD no hace consultas
+            with CaptureQueriesContext(connection) as capturadas:
+                call_command('resolver_snapshot', snapshot, resultado, '--motor', 'numpy', '--semilla', '3', stdout=StringIO())
+            self.assertEqual(len(capturadas), 0)
+            call_command('importar_resultado_snapshot', resultado, stdout=StringIO())
+
+            # El mismo horario que la generación contra la BD
+            guardado = HorariosAsignados.objects.filter(periodo=self.periodo)
+            self.assertEqual(
+                sorted(guardado.values_list('grupo_id', 'docente_id', 'espacio_id', 'dia_semana', 'bloque_horario_id')),
+                sorted((c["grupo"], c["docente"], c["espacio"], c["dia_semana"], c["bloque_horario"]) for c in esperado)
+            )
+
+            # Un resultado que referencia un grupo borrado no se importa, y el horario guardado no cambia
+            Grupos.objects.filter(pk=esperado[0]["grupo"]).delete()
+            antes = set(guardado.values_list('pk', flat=True))
+            with self.assertRaises(CommandError):
+                call_command('importar_resultado_snapshot', resultado, stdout=StringIO())
+            self.assertEqual(set(guardado.values_list('pk', flat=True)), antes)
+
+
+class ParalelismoTests(TestCase):
+    """procesos > 1 arranca procesos hijos (spawn); cpu_count se fija para que corran también en máquinas de un núcleo."""
+
+    def setUp(self):
+        parche = mock.patch('os.cpu_count', return_value=4)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def assertSinCruces(self, horario):
+        for entidad in ("docente", "espacio", "grupo"):
+            slots = [(clase[entidad], clase["dia_semana"], clase["bloque_horario"]) for clase in horario]
+            self.assertEqual(len(slots), len(set(slots)), f"{entidad} con dos clases en el mismo bloque")
+
+    def test_subproblemas_disjuntos_dan_el_mismo_horario(self):
+        # Dos escenarios sintéticos en un mismo periodo: especialidades, docentes y bloques propios, y cada materia
+        # en las aulas de su escenario, así que no comparten ningún recurso
+        periodo = crear_periodo_sintetico(semilla=1, **ESCALA_PRUEBAS)
+        otro = crear_periodo_sintetico(semilla=2, **ESCALA_PRUEBAS)
+        Grupos.objects.filter(periodo=otro).update(periodo=periodo, codigo_grupo=Concat(Value('B-'), 'codigo_grupo'))
+        DisponibilidadDocentes.objects.filter(periodo=otro).update(periodo=periodo)
+        for prefijo in (periodo.nombre_periodo, otro.nombre_periodo):
+            Materias.objects.filter(codigo_materia__startswith=prefijo, requiere_tipo_espacio_especifico=None).update(
+                requiere_tipo_espacio_especifico=TiposEspacio.objects.get(nombre_tipo_espacio=f"{prefijo} Aula")
+            )
+
+        secuencial = ScheduleGeneratorService(periodo=periodo, motor="numpy").simular()
+        paralelo = ScheduleGeneratorService(periodo=periodo, motor="numpy", procesos=2).simular()
+
+        self.assertGreaterEqual(paralelo["stats"]["componentes_independientes"], 2)
+        self.assertEqual(paralelo["stats"]["particiones"], 2)
+        self.assertNotIn("grupos_reintentados", paralelo["stats"])
+        orden = lambda horario: sorted(tuple(clase.values()) for clase in horario)
+        self.assertEqual(orden(paralelo["horario_propuesto"]), orden(secuencial["horario_propuesto"]))
+        for clave in ("grupos_programados", "grupos_no_programados", "asignaciones_exitosas", "motivos_no_programados"):
+            self.assertEqual(paralelo["stats"][clave], secuencial["stats"][clave])
+
+    def test_recursos_compartidos_se_particionan_por_unidad(self):
+        periodo = crear_periodo_sintetico(semilla=1, **ESCALA_PRUEBAS)
+        secuencial = ScheduleGeneratorService(periodo=periodo, motor="numpy").simular()
+        generador = ScheduleGeneratorService(periodo=periodo, motor="numpy", procesos=2)
+        paralelo = generador.simular()
+
+        stats = paralelo["stats"]
+        self.assertEqual(stats["componentes_independientes"], 1)
+        self.assertEqual(stats["particiones"], 2)
+        self.assertSinCruces(paralelo["horario_propuesto"])
+        self.assertEqual(stats["asignaciones_exitosas"], len(paralelo["horario_propuesto"]))
+        self.assertEqual(stats["grupos_programados"] + stats["grupos_no_programados"], len(generador.grupos_a_programar))
+        self.assertEqual(len(paralelo["diagnosticos"]), stats["grupos_no_programados"])
+        # Los incompletos de cada partición se reintentan con todos los recursos: casi no se pierde calidad
+        self.assertGreaterEqual(stats["grupos_programados"], 0.9 * secuencial["stats"]["grupos_programados"])
+
+        # Cada partición usa solo sus recursos: ningún docente ni espacio queda en dos
+        particiones = generador._particiones_por_unidad(list(generador.grupos_a_programar))
+        for posicion in (1, 2):
+            recursos = [r for particion in particiones for r in particion[posicion]]
+            self.assertEqual(len(recursos), len(set(recursos)))
+
+    def test_multi_arranque_determinista_y_con_el_mejor_puntaje(self):
+        periodo = crear_periodo_sintetico(semilla=1, **ESCALA_PRUEBAS)
+        semillas = [11, 22, 33, 44]
+        resultados = [
+            ScheduleGeneratorService(periodo=periodo, motor="numpy", semillas=semillas, procesos=procesos).simular()
+            for procesos in (1, 1, 2)
+        ]
+        # Las mismas semillas dan el mismo horario, en este proceso o en procesos hijos
+        for otro in resultados[1:]:
+            self.assertEqual(otro["horario_propuesto"], resultados[0]["horario_propuesto"])
+            self.assertEqual(otro["stats"]["arranques"], resultados[0]["stats"]["arranques"])
+
+        stats = resultados[0]["stats"]
+        self.assertEqual([arranque["semilla"] for arranque in stats["arranques"]], semillas)
+        ganador = next(arranque for arranque in stats["arranques"] if arranque["semilla"] == stats["semilla_ganadora"])
+        # Más grupos programados y, a igualdad, más puntaje
+        clave = lambda arranque: (arranque["grupos_programados"], arranque["puntaje"])
+        self.assertEqual(clave(ganador), max(clave(arranque) for arranque in stats["arranques"]))
+        self.assertEqual(ganador["grupos_programados"], stats["grupos_programados"])
+        self.assertEqual(ganador["asignaciones"], len(resultados[0]["horario_propuesto"]))
+        # El horario elegido es el de la semilla ganadora corrida sola
+        solo = ScheduleGeneratorService(periodo=periodo, motor="numpy", semillas=[ganador["semilla"]]).simular()
+        self.assertEqual(solo["horario_propuesto"], resultados[0]["horario_propuesto"])
+        self.assertSinCruces(resultados[0]["horario_propuesto"])
+
+    def test_proceso_hijo_con_varias_particiones(self):
+        # Lo que hace un proceso hijo que recibe dos particiones seguidas, en este mismo proceso
+        periodo = crear_periodo_sintetico(semilla=2, docentes=30, grupos=60, espacios=10, bloques=30)
+        generador = ScheduleGeneratorService(periodo=periodo, motor="numpy")
+        generador._iniciar_presupuesto()
+        generador._get_data_needed()
+        grupos = list(generador.grupos_a_programar)
+        decomposition._iniciar_proceso(decomposition._problema(generador, grupos))
+
+        # Segunda partición: los grupos que quedan a medias en la secuencial; la primera, todos los demás
+        parciales = {
+            d["grupo_id"] for d in ScheduleGeneratorService(periodo=periodo, motor="numpy").simular()["diagnosticos"]
+            if d["sesiones_asignadas"]
+        }
+        self.assertTrue(parciales)
+        particiones = (
+            [i for i, g in enumerate(grupos) if g.grupo_id not in parciales],
+            [i for i, g in enumerate(grupos) if g.grupo_id in parciales],
+        )
+        for indices in particiones:
+            asignaciones, _, _, diagnosticos = decomposition._resolver_particion(indices, None, None)
+            # Cada diagnóstico cuenta las sesiones asignadas en su propia partición
+            for diagnostico in diagnosticos:
+                self.assertEqual(
+                    diagnostico["sesiones_asignadas"], sum(1 for a in asignaciones if a[0] == diagnostico["grupo_id"])
+                )
+        self.assertTrue(any(d["sesiones_asignadas"] for d in diagnosticos))
+
+
+class EdicionHorariosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.periodo = crear_periodo_sintetico(semilla=1, **ESCALA_PRUEBAS)
+        ScheduleGeneratorService(periodo=cls.periodo, motor="numpy").generar_horarios_automaticos()
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def guardado(self):
+        return set(HorariosAsignados.objects.filter(periodo=self.periodo).values_list(
+            'horario_id', 'docente_id', 'espacio_id', 'dia_semana', 'bloque_horario_id'
+        ))
+
+    def intercambio_valido(self):
+        """Dos clases de distinto grupo, docente y espacio que pueden intercambiar día, bloque y espacio."""
+        validator = ConflictValidatorService(periodo=self.periodo)
+        horarios = list(HorariosAsignados.objects.filter(periodo=self.periodo).order_by('pk'))
+        for a, b in combinations(horarios, 2):
+            if a.grupo_id == b.grupo_id or a.docente_id == b.docente_id or a.espacio_id == b.espacio_id:
+                continue
+            propuestas = validator.cargar_cambios([
+                {'horario_id': a.pk, 'espacio': b.espacio_id, 'dia_semana': b.dia_semana, 'bloque_horario': b.bloque_horario_id},
+                {'horario_id': b.pk, 'espacio': a.espacio_id, 'dia_semana': a.dia_semana, 'bloque_horario': a.bloque_horario_id},
+            ])
+            if not any(validator.validar_propuestas(propuestas)):
+                return a, b
+        self.fail("El escenario no tiene ningún intercambio válido")
+
+    def test_validar_cambios_valida_el_lote_junto(self):
+        a, b = self.intercambio_valido()
+        mitad = {'horario_id': a.pk, 'espacio': b.espacio_id, 'dia_semana': b.dia_semana, 'bloque_horario': b.bloque_horario_id}
+        otra_mitad = {'horario_id': b.pk, 'espacio': a.espacio_id, 'dia_semana': a.dia_semana, 'bloque_horario': a.bloque_horario_id}
+
+        # Media mudanza: choca con la clase guardada que sigue en ese espacio y bloque
+        respuesta = self.client.post(
+            URL_HORARIOS + 'validar-cambios/', {'periodo_id': self.periodo.pk, 'cambios': [mitad]}, format='json'
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertFalse(respuesta.data['valido'])
+        self.assertIn('espacio_conflict', [c['type'] for c in respuesta.data['resultados'][0]['conflictos']])
+
+        # El intercambio completo libera ese bloque dentro del mismo lote
+        respuesta = self.client.post(
+            URL_HORARIOS + 'validar-cambios/', {'periodo_id': self.periodo.pk, 'cambios': [mitad, otra_mitad]}, format='json'
+        )
+        self.assertTrue(respuesta.data['valido'])
+        self.assertEqual(respuesta.data['total_conflictos'], 0)
+
+        # Dos propuestas del lote en el mismo espacio y bloque chocan entre sí, y se informa en ambas
+        nueva = {'grupo': a.grupo_id, 'docente': a.docente_id, 'espacio': a.espacio_id,
+                 'dia_semana': a.dia_semana, 'bloque_horario': a.bloque_horario_id}
+        validator = ConflictValidatorService(periodo=self.periodo)
+        conflictos = validator.validar_propuestas(validator.cargar_cambios([{'horario_id': a.pk}, nueva]))
+        for i, otra in ((0, 1), (1, 0)):
+            lote = [c for c in conflictos[i] if c['type'] == 'espacio_lote_conflict']
+            self.assertEqual([c['propuestas'] for c in lote], [[otra]])
+
+    def test_consultas_de_validacion_no_crecen_con_el_lote(self):
+        horarios = list(HorariosAsignados.objects.filter(periodo=self.periodo).order_by('pk'))
+        for cantidad in (1, 10):
+            validator = ConflictValidatorService(periodo=self.periodo)
+            propuestas = validator.cargar_cambios([
+                {'horario_id': horario.pk, 'dia_semana': otro.dia_semana}
+                for horario, otro in zip(horarios[:cantidad], reversed(horarios))
+            ])
+            # Bloques y restricciones (solo la primera vez) y la ocupación relacionada en un UNION ALL
+            with CaptureQueriesContext(connection) as capturadas:
+                validator.validar_propuestas(propuestas)
+            self.assertEqual(len(capturadas), 3)
+            with CaptureQueriesContext(connection) as capturadas:
+                validator.validar_propuestas(propuestas)
+            self.assertEqual(len(capturadas), 1)
+
+    def test_regeneracion_incremental_conserva_los_grupos_no_afectados(self):
+        # El docente de una clase deja de estar disponible en ese bloque
+        horario = HorariosAsignados.objects.filter(periodo=self.periodo).order_by('pk').first()
+        DisponibilidadDocentes.objects.filter(
+            docente=horario.docente, periodo=self.periodo, dia_semana=horario.dia_semana, bloque_horario=horario.bloque_horario
+        ).update(esta_disponible=False)
+        antes = self.guardado()
+
+        resultado = ScheduleGeneratorService(periodo=self.periodo, motor="numpy").regenerar_incremental(
+            docentes=[horario.docente_id]
+        )
+
+        despues = self.guardado()
+        self.assertEqual(resultado["stats"]["asignaciones_liberadas"], 1)
+        # Solo se borra la clase inválida; las demás filas siguen iguales (mismo id, docente, espacio y bloque)
+        self.assertEqual({fila[0] for fila in antes - despues}, {horario.pk})
+        self.assertEqual(resultado["stats"]["asignaciones_conservadas"], len(antes) - 1)
+        # El grupo de la clase liberada se reubica, y el docente ya no tiene clase en el bloque no disponible
+        nuevas = HorariosAsignados.objects.filter(pk__in={fila[0] for fila in despues - antes})
+        self.assertEqual(len(nuevas), resultado["stats"]["asignaciones_exitosas"])
+        self.assertIn(horario.grupo_id, {nueva.grupo_id for nueva in nuevas})
+        self.assertFalse(HorariosAsignados.objects.filter(
+            periodo=self.periodo, docente=horario.docente, dia_semana=horario.dia_semana, bloque_horario=horario.bloque_horario
+        ).exists())
+
+    def test_aplicar_intercambio(self):
+        a, b = self.intercambio_valido()
+        respuesta = self.client.post(URL_HORARIOS + 'aplicar-movimientos/', {
+            'periodo_id': self.periodo.pk,
+            'movimientos': [{'tipo': 'intercambiar', 'horario_id': a.pk, 'con_horario_id': b.pk}],
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.data['aplicado'])
+        self.assertEqual(len(respuesta.data['horarios']), 2)
+
+        nuevo_a, nuevo_b = HorariosAsignados.objects.get(pk=a.pk), HorariosAsignados.objects.get(pk=b.pk)
+        for antes, despues in ((a, nuevo_b), (b, nuevo_a)):
+            self.assertEqual(
+                (despues.espacio_id, despues.dia_semana, despues.bloque_horario_id),
+                (antes.espacio_id, antes.dia_semana, antes.bloque_horario_id)
+            )
+        # Cada clase conserva su grupo y su docente
+        self.assertEqual((nuevo_a.grupo_id, nuevo_a.docente_id), (a.grupo_id, a.docente_id))
+
+    def test_aplicar_movimientos_revierte_todo_si_alguno_choca(self):
+        a, b = self.intercambio_valido()
+        c = HorariosAsignados.objects.filter(periodo=self.periodo).exclude(pk__in=(a.pk, b.pk)).first()
+        antes = self.guardado()
+
+        # El intercambio es válido, pero mover c al espacio y bloque que a conserva no lo es: no se guarda nada
+        respuesta = self.client.post(URL_HORARIOS + 'aplicar-movimientos/', {
+            'periodo_id': self.periodo.pk,
+            'movimientos': [
+                {'tipo': 'intercambiar', 'horario_id': a.pk, 'con_horario_id': b.pk},
+                {'tipo': 'mover', 'horario_id': c.pk, 'espacio': b.espacio_id, 'dia_semana': b.dia_semana,
+                 'bloque_horario': b.bloque_horario_id},
+            ],
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(respuesta.data['aplicado'])
+        conflictos = {r['horario_id']: r['conflictos'] for r in respuesta.data['resultados']}
+        self.assertTrue(conflictos[c.pk])
+        self.assertEqual(self.guardado(), antes)
+
+        # Entrada inválida: 400 sin tocar nada
+        respuesta = self.client.post(URL_HORARIOS + 'aplicar-movimientos/', {
+            'periodo_id': self.periodo.pk, 'movimientos': [{'tipo': 'mover', 'horario_id': a.pk}, {'tipo': 'mover', 'horario_id': a.pk}],
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(self.guardado(), antes)
+
+
+class ListadoHorariosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.periodo = crear_periodo_sintetico(semilla=1, **ESCALA_PRUEBAS)
+        ScheduleGeneratorService(periodo=cls.periodo, motor="numpy").generar_horarios_automaticos()
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def test_paginacion_por_cursor_recorre_todo_sin_repetir(self):
+        ids, url, paginas = [], f'{URL_HORARIOS}?periodo={self.periodo.pk}&page_size=25', 0
+        while url:
+            respuesta = self.client.get(url)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertNotIn('count', respuesta.data)
+            self.assertLessEqual(len(respuesta.data['results']), 25)
+            ids += [fila['horario_id'] for fila in respuesta.data['results']]
+            url, paginas = respuesta.data['next'], paginas + 1
+        esperados = list(HorariosAsignados.objects.filter(periodo=self.periodo).order_by('pk').values_list('pk', flat=True))
+        self.assertGreater(paginas, 1)
+        self.assertEqual(ids, esperados)
+
+    def test_fields_y_expand(self):
+        respuesta = self.client.get(URL_HORARIOS, {'periodo': self.periodo.pk, 'fields': 'horario_id,docente_nombre'})
+        self.assertEqual(respuesta.status_code, 200)
+        fila = respuesta.data['results'][0]
+        self.assertEqual(set(fila), {'horario_id', 'docente_nombre'})
+        docente = HorariosAsignados.objects.get(pk=fila['horario_id']).docente
+        self.assertEqual(fila['docente_nombre'], str(docente))
+        # Igual que Docentes.__str__ también sin código
+        Docentes.objects.filter(pk=docente.pk).update(codigo_docente=None)
+        docente.refresh_from_db()
+        respuesta = self.client.get(f"{URL_HORARIOS}{fila['horario_id']}/", {'fields': 'docente_nombre'})
+        self.assertEqual(respuesta.data['docente_nombre'], str(docente))
+
+        respuesta = self.client.get(URL_HORARIOS, {'periodo': self.periodo.pk, 'fields': 'horario_id', 'expand': 'docente,espacio'})
+        fila = respuesta.data['results'][0]
+        self.assertEqual(set(fila), {'horario_id', 'docente_detalle', 'espacio_detalle'})
+        horario = HorariosAsignados.objects.get(pk=fila['horario_id'])
+        self.assertEqual(fila['docente_detalle']['docente_id'], horario.docente_id)
+
+        for parametros in ({'fields': 'horario_id,no_existe'}, {'expand': 'materia'}):
+            self.assertEqual(self.client.get(URL_HORARIOS, {'periodo': self.periodo.pk, **parametros}).status_code, 400)
+
+    def test_filtros_por_materia_y_carrera(self):
+        horario = HorariosAsignados.objects.filter(periodo=self.periodo).select_related('grupo').first()
+        for filtro, valor in (('grupo__materia', horario.grupo.materia_id), ('grupo__carrera', horario.grupo.carrera_id)):
+            respuesta = self.client.get(URL_HORARIOS, {'periodo': self.periodo.pk, filtro: valor, 'page_size': 500})
+            esperados = HorariosAsignados.objects.filter(periodo=self.periodo, **{filtro: valor}).order_by('pk')
+            self.assertEqual([fila['horario_id'] for fila in respuesta.data['results']], list(esperados.values_list('pk', flat=True)))
+
+        grilla = self.client.get(URL_HORARIOS + 'grilla/', {'periodo': self.periodo.pk, 'carrera': horario.grupo.carrera_id}).data
+        self.assertEqual(
+            sorted(clase['horario_id'] for clase in grilla['clases']),
+            sorted(HorariosAsignados.objects.filter(
+                periodo=self.periodo, grupo__carrera=horario.grupo.carrera_id
+            ).values_list('pk', flat=True))
+        )
+
+    def test_consultas_no_crecen_con_la_pagina(self):
+        consultas = []
+        for page_size in (5, 100):
+            with CaptureQueriesContext(connection) as capturadas:
+                respuesta = self.client.get(URL_HORARIOS, {
+                    'periodo': self.periodo.pk, 'page_size': page_size, 'expand': 'grupo,docente,espacio,bloque_horario'
+                })
+            self.assertEqual(len(respuesta.data['results']), page_size)
+            consultas.append(len(capturadas))
+        self.assertEqual(consultas[0], consultas[1])
+
+    def test_grilla_se_invalida_al_cambiar_el_horario(self):
+        horario = HorariosAsignados.objects.filter(periodo=self.periodo).first()
+        parametros = {'periodo': self.periodo.pk, 'docente': horario.docente_id}
+
+        primera = self.client.get(URL_HORARIOS + 'grilla/', parametros).data
+        self.assertIn(horario.pk, [clase['horario_id'] for clase in primera['clases']])
+        # La segunda lectura sale de la caché: solo se consulta la versión (y que el periodo exista)
+        with CaptureQueriesContext(connection) as capturadas:
+            self.assertEqual(self.client.get(URL_HORARIOS + 'grilla/', parametros).data, primera)
+        self.assertEqual(len(capturadas), 2)
+
+        self.assertEqual(self.client.delete(f'{URL_HORARIOS}{horario.pk}/').status_code, 204)
+        despues = self.client.get(URL_HORARIOS + 'grilla/', parametros).data
+        self.assertEqual(despues['version'], primera['version'] + 1)
+        self.assertNotIn(horario.pk, [clase['horario_id'] for clase in despues['clases']])
+
+        # Una regeneración completa también invalida las grillas del periodo
+        ScheduleGeneratorService(periodo=self.periodo, motor="numpy").generar_horarios_automaticos()
+        self.assertGreater(self.client.get(URL_HORARIOS + 'grilla/', parametros).data['version'], despues['version'])
+
+        self.assertEqual(self.client.get(URL_HORARIOS + 'grilla/', {'periodo': self.periodo.pk}).status_code, 400)
+
+
+class TrabajosGeneracionTests(TestCase):
+    """Estados de los trabajos. Encolar solo crea el trabajo: en las pruebas no corre ningún worker."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.periodo = crear_periodo_sintetico(semilla=1, **ESCALA_PRUEBAS)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_un_solo_trabajo_activo_por_periodo(self):
+        trabajo, creado = encolar_generacion(self.periodo, {"motor": "numpy"})
+        self.assertTrue(creado)
+        self.assertEqual(trabajo.estado, 'PENDIENTE')
+        self.assertEqual(encolar_generacion(self.periodo, {"motor": "numpy"}), (trabajo, False))
+
+        respuesta = self.client.post(URL_ACCIONES + 'generar-horario-automatico/', {'periodo_id': self.periodo.pk}, format='json')
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(respuesta.data['trabajo_id'], trabajo.trabajo_id)
+
+        # La restricción única cubre también a quien no pase por encolar_generacion
+        with self.assertRaises(IntegrityError):
+            TrabajosGeneracionHorario.objects.create(periodo=self.periodo, parametros={}, estado='EN_PROCESO')
+
+    def test_cancelar_y_reintentar(self):
+        trabajo, _ = encolar_generacion(self.periodo, {"motor": "numpy"})
+
+        respuesta = self.client.post(f'{URL_TRABAJOS}{trabajo.trabajo_id}/cancelar/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['estado'], 'CANCELADO')
+        self.assertIsNone(trabajo_activo(self.periodo))
+        self.assertEqual(self.client.post(f'{URL_TRABAJOS}{trabajo.trabajo_id}/cancelar/').status_code, 409)
+
+        respuesta = self.client.post(f'{URL_TRABAJOS}{trabajo.trabajo_id}/reintentar/')
+        self.assertEqual(respuesta.status_code, 202)
+        nuevo = TrabajosGeneracionHorario.objects.get(pk=respuesta.data['trabajo_id'])
+        self.assertEqual((nuevo.estado, nuevo.parametros), ('PENDIENTE', trabajo.parametros))
+        # Con el reintento en curso no se encola otro
+        self.assertEqual(self.client.post(f'{URL_TRABAJOS}{trabajo.trabajo_id}/reintentar/').status_code, 409)
+
+        TrabajosGeneracionHorario.objects.filter(pk=nuevo.pk).update(estado='COMPLETADO')
+        nuevo.refresh_from_db()
+        with self.assertRaises(ValueError):
+            reintentar_trabajo(nuevo)
+        self.assertEqual(self.client.post(f'{URL_TRABAJOS}{nuevo.pk}/reintentar/').status_code, 400)
+
+    def test_trabajo_sin_latido_se_da_por_fallido(self):
+        trabajo, _ = encolar_generacion(self.periodo, {"motor": "numpy"})
+        viejo = timezone.now() - datetime.timedelta(seconds=generation_jobs.LATIDO_VENCIDO + 1)
+        TrabajosGeneracionHorario.objects.filter(pk=trabajo.pk).update(estado='EN_PROCESO', fecha_latido=viejo)
+
+        self.assertIsNone(trabajo_activo(self.periodo))
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.mensaje_error), ('ERROR', MENSAJE_VENCIDO))
+        # El periodo queda libre para una generación nueva
+        self.assertTrue(encolar_generacion(self.periodo, {"motor": "numpy"})[1])
+
+    def test_trabajo_pendiente_espera_al_worker_sin_vencer(self):
+        trabajo, _ = encolar_generacion(self.periodo, {"motor": "numpy"})
+        viejo = timezone.now() - datetime.timedelta(seconds=generation_jobs.LATIDO_VENCIDO + 1)
+        TrabajosGeneracionHorario.objects.filter(pk=trabajo.pk).update(fecha_creacion=viejo, fecha_latido=viejo)
+
+        self.assertEqual(trabajo_activo(self.periodo), trabajo)
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'PENDIENTE')
+
+    def test_reporte_de_progreso_detiene_un_trabajo_cancelado(self):
+        trabajo, _ = encolar_generacion(self.periodo, {"motor": "numpy"})
+        TrabajosGeneracionHorario.objects.filter(pk=trabajo.pk).update(estado='EN_PROCESO')
+        reporte = generation_jobs._ReporteProgreso(trabajo.pk)
+
+        reporte('asignacion', 10, {"grupos_programados": 1})
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.fase, trabajo.porcentaje), ('asignacion', 10))
+
+        self.assertTrue(cancelar_trabajo(trabajo.pk))
+        with self.assertRaises(TrabajoInterrumpido):
+            reporte('mejora', 50, {})
+
+
+class EjecucionTrabajosTests(TransactionTestCase):
+    """_ejecutar_trabajo cierra la conexión al terminar, así que corre fuera de la transacción de TestCase."""
+
+    def setUp(self):
+        self.periodo = crear_periodo_sintetico(semilla=1, **ESCALA_PRUEBAS)
+
+    def test_trabajo_pendiente_termina_completado(self):
+        trabajo = TrabajosGeneracionHorario.objects.create(periodo=self.periodo, parametros={"motor": "numpy"})
+        generation_jobs._ejecutar_trabajo(trabajo.pk)
+
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.fase, trabajo.porcentaje), ('COMPLETADO', 'completado', 100))
+        self.assertIsNotNone(trabajo.fecha_inicio)
+        self.assertEqual(
+            HorariosAsignados.objects.filter(periodo=self.periodo).count(), trabajo.estadisticas['asignaciones_exitosas']
+        )
+
+    def test_worker_ejecuta_los_pendientes_y_termina(self):
+        trabajo, _ = encolar_generacion(self.periodo, {"motor": "numpy"})
+        salida = StringIO()
+        call_command('procesar_trabajos_generacion', '--una-vez', stdout=salida)
+
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'COMPLETADO')
+        self.assertIn(str(trabajo.pk), salida.getvalue())
+        self.assertIsNone(generation_jobs.procesar_siguiente_trabajo())
+
+    def test_trabajo_cancelado_en_cola_no_se_ejecuta(self):
+        trabajo = TrabajosGeneracionHorario.objects.create(periodo=self.periodo, parametros={"motor": "numpy"})
+        cancelar_trabajo(trabajo.pk)
+        generation_jobs._ejecutar_trabajo(trabajo.pk)
+
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'CANCELADO')
+        self.assertIsNone(trabajo.fecha_inicio)
+        self.assertFalse(HorariosAsignados.objects.filter(periodo=self.periodo).exists())
+
+    def test_parametros_invalidos_terminan_en_error(self):
+        trabajo = TrabajosGeneracionHorario.objects.create(periodo=self.periodo, parametros={"motor": "no_existe"})
+        with self.assertLogs(generation_jobs.logger, 'ERROR'):
+            generation_jobs._ejecutar_trabajo(trabajo.pk)
+
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'ERROR')
+        self.assertTrue(trabajo.mensaje_error)
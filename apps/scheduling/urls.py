@@ -8,6 +8,7 @@ router.register(r'bloques-horarios', views.BloquesHorariosDefinicionViewSet)
 router.register(r'disponibilidad-docentes', views.DisponibilidadDocentesViewSet)
 router.register(r'horarios-asignados', views.HorariosAsignadosViewSet)
 router.register(r'configuracion-restricciones', views.ConfiguracionRestriccionesViewSet)
+router.register(r'trabajos-generacion', views.TrabajosGeneracionHorarioViewSet)
 # Para la generación de horarios (no es un ModelViewSet estándar)
 router.register(r'acciones-horario', views.GeneracionHorarioView, basename='acciones-horario')
 
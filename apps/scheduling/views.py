@@ -2,17 +2,25 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.db import models
+from rest_framework.exceptions import ValidationError
+from django.db import models, transaction, IntegrityError
 from apps.scheduling import models
 from django_filters.rest_framework import DjangoFilterBackend # Para filtrado avanzado
-from .models import Grupos, BloquesHorariosDefinicion, DisponibilidadDocentes, HorariosAsignados, ConfiguracionRestricciones
+from .models import Grupos, BloquesHorariosDefinicion, DisponibilidadDocentes, HorariosAsignados, ConfiguracionRestricciones, TrabajosGeneracionHorario
 from .serializers import (
     GruposSerializer, BloquesHorariosDefinicionSerializer, DisponibilidadDocentesSerializer,
-    HorariosAsignadosSerializer, ConfiguracionRestriccionesSerializer
+    HorariosAsignadosSerializer, HorariosAsignadosPlanoSerializer, ConfiguracionRestriccionesSerializer,
+    TrabajosGeneracionHorarioSerializer
 )
+from .pagination import PaginacionCursorPK
+from .filters import HorariosAsignadosFilter
 # Importar servicios
 from .service.schedule_generator import ScheduleGeneratorService
-from .service.conflict_validator import ConflictValidatorService
+from .service.generation_jobs import encolar_generacion, trabajo_activo, cancelar_trabajo, reintentar_trabajo
+from .service.conflict_validator import ConflictValidatorService, CAMPOS_CAMBIO
+from .service.bulk_edit import aplicar_movimientos
+from .service.timetable_grid import grilla_semanal, registrar_cambio_horario, TIPOS_GRILLA
+from .service.scenario import validar_escenario, presupuesto_simulacion, arranques_simulacion
 from apps.academic_setup.models import PeriodoAcademico # Para la acción de generar
 
 class GruposViewSet(viewsets.ModelViewSet):
@@ -39,6 +47,7 @@ class DisponibilidadDocentesViewSet(viewsets.ModelViewSet):
     #permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['docente', 'periodo', 'dia_semana', 'esta_disponible']
+    pagination_class = PaginacionCursorPK # Sin COUNT(*) ni OFFSET: páginas profundas igual de rápidas
 
     # RU15: Permitir subir horarios disponibles de docentes en formato Excel
     @action(detail=False, methods=['post'], url_path='cargar-disponibilidad-excel')
@@ -68,23 +77,145 @@ class HorariosAsignadosViewSet(viewsets.ModelViewSet):
     #permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     # RU07: Visualización de horarios por diferentes criterios
-    filterset_fields = ['periodo', 'docente', 'espacio', 'grupo', 'grupo__materia', 'grupo__carrera', 'dia_semana']
+    filterset_class = HorariosAsignadosFilter # periodo, docente, espacio, grupo, grupo__materia, grupo__carrera, dia_semana
+    pagination_class = PaginacionCursorPK # Sin COUNT(*) ni OFFSET: páginas profundas igual de rápidas
+
+    # Lecturas con la representación plana (?fields=, ?expand=); las escrituras siguen con la anidada
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve'):
+            return HorariosAsignadosPlanoSerializer
+        return HorariosAsignadosSerializer
+
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve'):
+            campos, expandir = HorariosAsignadosPlanoSerializer.opciones(self.request.query_params)
+            return HorariosAsignadosPlanoSerializer.preparar_queryset(HorariosAsignados.objects.all(), campos, expandir)
+        return super().get_queryset()
 
     # RD09: Permitir modificaciones manuales sobre los horarios generados automáticamente.
     # El ModelViewSet ya lo permite con PUT/PATCH. Se pueden añadir validaciones extra.
 
     def perform_create(self, serializer):
         # RD10: Notificar sobre conflictos (o prevenirlos)
-        # Podríamos llamar al validador de conflictos aquí antes de guardar
-        # validator = ConflictValidatorService()
-        # conflicts = validator.validate_assignment(serializer.validated_data)
-        # if conflicts:
-        #    raise serializers.ValidationError(conflicts)
-        serializer.save()
+        self._validar_conflictos(serializer)
+        self._guardar(serializer)
 
     def perform_update(self, serializer):
-        # Similar validación para updates
-        serializer.save()
+        # La fila editada no choca consigo misma; en PATCH los campos omitidos conservan su valor
+        self._validar_conflictos(serializer)
+        self._guardar(serializer)
+
+    def _validar_conflictos(self, serializer):
+        """Rechaza la asignación con todos sus conflictos (cruces, disponibilidad, carga, capacidad, tipo de espacio)."""
+        datos = dict(serializer.validated_data)
+        instancia = serializer.instance
+        if instancia is not None:
+            if all(datos.get(campo, getattr(instancia, campo)) == getattr(instancia, campo) for campo in CAMPOS_CAMBIO + ('periodo',)):
+                return # Solo cambian estado u observaciones: la asignación no se mueve
+            for campo in CAMPOS_CAMBIO + ('periodo',):
+                datos.setdefault(campo, getattr(instancia, campo))
+        validator = ConflictValidatorService(periodo=datos['periodo'])
+        conflictos = validator.validate_all_constraints(datos, excluir_horario_id=instancia.pk if instancia else None)
+        if conflictos:
+            raise ValidationError({"conflictos": conflictos})
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            registrar_cambio_horario(instance.periodo_id)
+
+    def _guardar(self, serializer):
+        # Si la edición cambia el periodo, las grillas de ambos quedan desactualizadas
+        periodo_previo = serializer.instance.periodo_id if serializer.instance is not None else None
+        try:
+            with transaction.atomic():
+                horario = serializer.save()
+                registrar_cambio_horario(horario.periodo_id, periodo_previo)
+        except IntegrityError:
+            # Otra petición ocupó el bloque entre la validación y el guardado (restricciones únicas)
+            raise ValidationError({"conflictos": [
+                {"type": "integridad", "message": "El docente, el espacio o el grupo ya tiene una clase en este bloque."}
+            ]})
+
+    # Validación en lote: varios cambios (altas o ediciones) se validan juntos, también entre sí, sin guardar nada
+    @action(detail=False, methods=['post'], url_path='validar-cambios')
+    def validar_cambios(self, request):
+        periodo_id = request.data.get('periodo_id')
+        if not periodo_id:
+            return Response({"error": "Se requiere el ID del período académico."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            periodo = PeriodoAcademico.objects.get(pk=periodo_id)
+        except PeriodoAcademico.DoesNotExist:
+            return Response({"error": "Período académico no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+        validator = ConflictValidatorService(periodo=periodo)
+        try:
+            propuestas = validator.cargar_cambios(request.data.get('cambios'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        conflictos = validator.validar_propuestas(propuestas)
+        return Response({
+            "valido": not any(conflictos),
+            "total_conflictos": sum(len(c) for c in conflictos),
+            "resultados": [
+                {"indice": i, "horario_id": propuesta['horario_id'], "conflictos": conflictos_propuesta}
+                for i, (propuesta, conflictos_propuesta) in enumerate(zip(propuestas, conflictos))
+            ]
+        }, status=status.HTTP_200_OK)
+
+    # Grilla semanal de un docente, espacio, grupo o carrera: una consulta, en caché hasta que cambie el periodo
+    @action(detail=False, methods=['get'], url_path='grilla')
+    def grilla(self, request):
+        periodo_id = request.query_params.get('periodo')
+        if not periodo_id:
+            return Response({"error": "Se requiere el ID del período académico (?periodo=)."}, status=status.HTTP_400_BAD_REQUEST)
+        entidades = {tipo: request.query_params.get(tipo) for tipo in TIPOS_GRILLA if request.query_params.get(tipo)}
+        if len(entidades) != 1:
+            return Response(
+                {"error": f"Indique exactamente uno de: {', '.join(TIPOS_GRILLA)}."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        (tipo, entidad_id), = entidades.items()
+        try:
+            periodo_id, entidad_id = int(periodo_id), int(entidad_id)
+        except ValueError:
+            return Response({"error": "El período y la entidad deben ser IDs numéricos."}, status=status.HTTP_400_BAD_REQUEST)
+        if not PeriodoAcademico.objects.filter(pk=periodo_id).exists():
+            return Response({"error": "Período académico no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(grilla_semanal(periodo_id, tipo, entidad_id), status=status.HTTP_200_OK)
+
+    # Movimientos e intercambios en bloque: se validan juntos y se guardan todos en una transacción o ninguno
+    @action(detail=False, methods=['post'], url_path='aplicar-movimientos')
+    def aplicar_movimientos(self, request):
+        periodo_id = request.data.get('periodo_id')
+        if not periodo_id:
+            return Response({"error": "Se requiere el ID del período académico."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            periodo = PeriodoAcademico.objects.get(pk=periodo_id)
+        except PeriodoAcademico.DoesNotExist:
+            return Response({"error": "Período académico no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            aplicado, resultados = aplicar_movimientos(periodo, request.data.get('movimientos'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except IntegrityError:
+            # Otra petición ocupó un bloque de destino entre la validación y el guardado; no se aplicó nada
+            return Response({"aplicado": False, "conflictos": [
+                {"type": "integridad", "message": "Un docente, espacio o grupo ya tiene una clase en un bloque de destino."}
+            ]}, status=status.HTTP_400_BAD_REQUEST)
+
+        respuesta = {
+            "aplicado": aplicado,
+            "total_conflictos": sum(len(r["conflictos"]) for r in resultados),
+            "resultados": resultados,
+        }
+        if not aplicado:
+            return Response(respuesta, status=status.HTTP_400_BAD_REQUEST)
+        horarios = self.get_queryset().filter(pk__in=[r["horario_id"] for r in resultados])
+        respuesta["horarios"] = self.get_serializer(horarios, many=True).data
+        return Response(respuesta, status=status.HTTP_200_OK)
 
 
 class ConfiguracionRestriccionesViewSet(viewsets.ModelViewSet):
@@ -93,6 +224,45 @@ class ConfiguracionRestriccionesViewSet(viewsets.ModelViewSet):
     permission_classes = [AllowAny]  #Permite acceso sin autenticación
     #permission_classes = [permissions.IsAuthenticated]
 
+# Estado de las generaciones encoladas (fase, porcentaje, stats parciales y resultado final)
+class TrabajosGeneracionHorarioViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = TrabajosGeneracionHorario.objects.select_related('periodo').all()
+    serializer_class = TrabajosGeneracionHorarioSerializer
+    permission_classes = [AllowAny]  #Permite acceso sin autenticación
+    #permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['periodo', 'estado']
+
+    # Cancela un trabajo pendiente o en proceso; uno en proceso se detiene antes de guardar el horario
+    @action(detail=True, methods=['post'], url_path='cancelar')
+    def cancelar(self, request, pk=None):
+        trabajo = self.get_object()
+        if not cancelar_trabajo(trabajo.trabajo_id):
+            return Response({
+                "error": f"El trabajo #{trabajo.trabajo_id} ya terminó ({trabajo.get_estado_display()})."
+            }, status=status.HTTP_409_CONFLICT)
+        trabajo.refresh_from_db()
+        return Response(self.get_serializer(trabajo).data, status=status.HTTP_200_OK)
+
+    # Vuelve a encolar, como un trabajo nuevo, una generación fallida (p. ej. por un reinicio) o cancelada
+    @action(detail=True, methods=['post'], url_path='reintentar')
+    def reintentar(self, request, pk=None):
+        trabajo = self.get_object()
+        try:
+            nuevo, creado = reintentar_trabajo(trabajo)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not creado:
+            return Response({
+                "error": f"Ya hay una generación en curso para {trabajo.periodo.nombre_periodo}.",
+                "trabajo_id": nuevo.trabajo_id
+            }, status=status.HTTP_409_CONFLICT)
+        return Response({
+            "message": f"Generación de horarios para {trabajo.periodo.nombre_periodo} encolada de nuevo.",
+            "trabajo_id": nuevo.trabajo_id,
+            "estado": nuevo.estado
+        }, status=status.HTTP_202_ACCEPTED)
+
 # Vista para la Generación de Horarios
 class GeneracionHorarioView(viewsets.ViewSet): # O APIView
     permission_classes = [AllowAny]  #Permite acceso sin autenticación
@@ -110,22 +280,125 @@ class GeneracionHorarioView(viewsets.ViewSet): # O APIView
         except PeriodoAcademico.DoesNotExist:
             return Response({"error": "Período académico no encontrado."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Aquí llamarías a tu servicio de generación de horarios
-        generator_service = ScheduleGeneratorService(periodo=periodo)
+        parametros = {
+            "motor": request.data.get('motor', 'referencia'),
+            "procesos": request.data.get('procesos', 1),
+            "segundos_mejora": request.data.get('segundos_mejora', 0),
+            "semilla": request.data.get('semilla'),
+            # AQ02: tiempo máximo de la generación; al agotarse se guarda el mejor horario encontrado
+            "time_budget_seconds": request.data.get('time_budget_seconds'),
+            # Bloques consecutivos por sesión (p. ej. laboratorios de varias horas seguidas)
+            "max_bloques_por_sesion": request.data.get('max_bloques_por_sesion', 1),
+            # Multi-arranque: N búsquedas con órdenes aleatorios reproducibles (o las semillas indicadas)
+            "arranques": request.data.get('arranques', 1),
+            "semillas": request.data.get('semillas'),
+        }
         try:
-            # El servicio podría devolver estadísticas, conflictos no resueltos, etc.
-            resultado = generator_service.generar_horarios_automaticos()
-            # RD10: El servicio debe notificar sobre conflictos detectados.
-            # El resultado podría incluir una lista de conflictos.
+            # Valida los parámetros antes de encolar (construir el servicio no consulta la BD)
+            ScheduleGeneratorService(periodo=periodo, **parametros)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # La generación la ejecuta un worker aparte (procesar_trabajos_generacion); el avance se consulta en
+        # trabajos-generacion/<trabajo_id>/
+        # RD10: el trabajo terminado incluye las estadísticas, los conflictos no resueltos y el motivo de cada grupo sin programar.
+        trabajo, creado = encolar_generacion(periodo, parametros)
+        if not creado:
+            return Response({
+                "error": f"Ya hay una generación en curso para {periodo.nombre_periodo}.",
+                "trabajo_id": trabajo.trabajo_id
+            }, status=status.HTTP_409_CONFLICT)
+        return Response({
+            "message": f"Generación de horarios para {periodo.nombre_periodo} encolada.",
+            "trabajo_id": trabajo.trabajo_id,
+            "estado": trabajo.estado
+        }, status=status.HTTP_202_ACCEPTED)
+
+    # Regeneración incremental: solo reubica las asignaciones invalidadas por un cambio puntual
+    @action(detail=False, methods=['post'], url_path='regenerar-incremental')
+    def regenerar_incremental(self, request):
+        periodo_id = request.data.get('periodo_id')
+        if not periodo_id:
+            return Response({"error": "Se requiere el ID del período académico."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            periodo = PeriodoAcademico.objects.get(pk=periodo_id)
+        except PeriodoAcademico.DoesNotExist:
+            return Response({"error": "Período académico no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+        # Ids de las entidades cambiadas: {"docentes": [...], "espacios": [...], "grupos": [...], "bloques": [...]}
+        cambios = {}
+        for clave in ('docentes', 'espacios', 'grupos', 'bloques'):
+            ids = request.data.get(clave) or []
+            try:
+                if not isinstance(ids, (list, tuple)):
+                    raise TypeError
+                cambios[clave] = [int(i) for i in ids]
+            except (TypeError, ValueError):
+                return Response({"error": f"'{clave}' debe ser una lista de IDs."}, status=status.HTTP_400_BAD_REQUEST)
+        if not any(cambios.values()):
+            return Response({"error": "Indique al menos una entidad cambiada (docentes, espacios, grupos o bloques)."}, status=status.HTTP_400_BAD_REQUEST)
+
+        en_curso = trabajo_activo(periodo)
+        if en_curso:
             return Response({
-                "message": f"Proceso de generación de horarios para {periodo.nombre_periodo} completado.",
-                "stats": resultado.get('stats', {}),
-                "unresolved_conflicts": resultado.get('unresolved_conflicts', [])
-            }, status=status.HTTP_200_OK)
-        except Exception as e:
-            # Loggear el error real
-            print(f"Error en generación de horario: {e}")
-            return Response({"error": f"Ocurrió un error durante la generación: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                "error": f"Ya hay una generación en curso para {periodo.nombre_periodo}.",
+                "trabajo_id": en_curso.trabajo_id
+            }, status=status.HTTP_409_CONFLICT)
+
+        try:
+            generator_service = ScheduleGeneratorService(periodo=periodo, motor=request.data.get('motor', 'referencia'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        resultado = generator_service.regenerar_incremental(**cambios)
+        return Response({
+            "message": f"Horario de {periodo.nombre_periodo} actualizado.",
+            "stats": resultado.get('stats', {}),
+            "unresolved_conflicts": resultado.get('unresolved_conflicts', []),
+            "diagnosticos": resultado.get('diagnosticos', [])
+        }, status=status.HTTP_200_OK)
+
+    # Simulación (what-if): genera con cambios hipotéticos sin modificar el horario guardado
+    @action(detail=False, methods=['post'], url_path='simular-horario')
+    def simular_horario(self, request):
+        periodo_id = request.data.get('periodo_id')
+        if not periodo_id:
+            return Response({"error": "Se requiere el ID del período académico."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            periodo = PeriodoAcademico.objects.get(pk=periodo_id)
+        except PeriodoAcademico.DoesNotExist:
+            return Response({"error": "Período académico no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+        escenario = request.data.get('escenario')
+        try:
+            validar_escenario(escenario)
+            arranques_simulacion(request.data.get('arranques', 1), request.data.get('semillas'))
+            generator_service = ScheduleGeneratorService(
+                periodo=periodo,
+                motor=request.data.get('motor', 'referencia'),
+                # Sin procesos hijos dentro de la petición: una simulación usa un solo núcleo
+                procesos=1,
+                segundos_mejora=request.data.get('segundos_mejora', 0),
+                semilla=request.data.get('semilla'),
+                # Corre dentro de la petición: el presupuesto se acota a unos segundos
+                time_budget_seconds=presupuesto_simulacion(request.data.get('time_budget_seconds')),
+                max_bloques_por_sesion=request.data.get('max_bloques_por_sesion', 1),
+                arranques=request.data.get('arranques', 1),
+                semillas=request.data.get('semillas'),
+            )
+            # Los ids inexistentes en el escenario se detectan al aplicarlo; la simulación no escribe nada
+            resultado = generator_service.simular(escenario)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "message": f"Simulación del horario de {periodo.nombre_periodo} (no se guardaron cambios).",
+            "stats": resultado.get('stats', {}),
+            "unresolved_conflicts": resultado.get('unresolved_conflicts', []),
+            "diagnosticos": resultado.get('diagnosticos', []),
+            "horario_propuesto": resultado.get('horario_propuesto', []),
+            "diferencia": resultado.get('diferencia', {})
+        }, status=status.HTTP_200_OK)
 
     # RU16: Crear y modificar horarios manualmente (ya cubierto por HorariosAsignadosViewSet)
 
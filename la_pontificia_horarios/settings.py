@@ -185,3 +185,8 @@ CORS_ALLOWED_ORIGINS = [
 # O para ser más permisivo durante el desarrollo (no recomendado para producción):
 # CORS_ORIGIN_ALLOW_ALL = True
 CORS_ALLOW_CREDENTIALS = True
+
+
+# Generación de horarios: registrar en el log (logger apps.scheduling.service.schedule_generator) una línea JSON
+# con las métricas por fase de cada generación (tiempo, CPU, consultas SQL, candidatos evaluados, conflictos)
+HORARIOS_REGISTRAR_METRICAS = False